@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+How long it takes to make a new interpreter, or reset one
+
+Run from the top of the repository:
+
+    python benchmarks/construction.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import iarm.arm
+
+
+def main(number=10000):
+    print("Arm() construction")
+    times = timeit.repeat(lambda: iarm.arm.Arm(1024, False), number=number, repeat=5)
+    print("    {:.1f} usec per interpreter (best of 5, {} each)".format(min(times) / number * 1e6, number))
+
+    print("Arm.reset()")
+    interp = iarm.arm.Arm(1024, False)
+    times = timeit.repeat(interp.reset, number=number, repeat=5)
+    print("    {:.1f} usec per reset (best of 5, {} each)".format(min(times) / number * 1e6, number))
+
+    print("Arm() construction and evaluating a short program")
+    program = """
+ MOVS R0, #10
+ MOVS R1, #0
+loop ADDS R1, R1, R0
+ SUBS R0, R0, #1
+ BNE loop
+"""
+
+    def construct_and_evaluate():
+        interp = iarm.arm.Arm(1024, False)
+        interp.evaluate(program)
+        interp.run()
+
+    number = number // 10
+    times = timeit.repeat(construct_and_evaluate, number=number, repeat=5)
+    print("    {:.1f} usec per interpreter (best of 5, {} each)".format(min(times) / number * 1e6, number))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,34 +1,157 @@
 #!/usr/bin/env python3
 
+import difflib
+import heapq
+import itertools
 import iarm.exceptions
 import iarm.arm_instructions as instructions
+import iarm.dispatch
+import iarm.intrinsics
+import iarm.lanes
+import iarm.semihosting
 import warnings
 
+EXC_RETURN_HANDLER = 0xFFFFFFF1  # Branching to these in an exception handler returns from the exception
+EXC_RETURN_THREAD = 0xFFFFFFF9
+_event_order = itertools.count()  # Keeps events at the same cycle in the order they were scheduled
+MAX_DECODED = 2**16  # The decode cache is emptied when it holds this many lines
+
 
 class Arm(instructions.DataMovement, instructions.Arithmetic,
           instructions.Logic, instructions.Shift, instructions.Memory,
           instructions.ConditionalBranch, instructions.UnconditionalBranch,
           instructions.Misc, instructions.Directives):
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, batch_blocks=False, **kwargs):
+        """
+        :param batch_blocks: Should straight line code be called in basic blocks (see iarm.dispatch) instead of one instruction at a time
+        """
         super().__init__(32, 16, 8, *args, **kwargs)
+        self.source = []  # The (instruction, parameters) each entry in the program was made from
+        self.references = {}  # Program index to the labels (and their values) that instruction was linked with
+        self.cells = {}  # Cell given to evaluate to (first program index, index after the last, parsed lines)
+        self._program_labels = set()  # Labels that point into the program, not memory
+        self._resolved_labels = {}  # Labels looked up while decoding the current instruction
+        self._batch_blocks = batch_blocks
+        self._blocks = {}  # Batched basic blocks keyed by the program index they start at
+        self._decoded = {}  # (instruction, parameters, equates version) to a list of (decoded instruction, labels it resolved)
+        self.cycles = 0  # How many instructions have run, used as the clock by timers
+        self.events = []  # Heap of (cycle, order, callback) for things that happen at a set time
+        self._stop = None  # The cycle the running stretch stops at, lowered to cut it short
+        self.event_register = False  # Set by SEV and exception returns, WFE does not wait while it is set
+        self.nvic = None  # The interrupt controller, if one is attached
+        self.semihosting = iarm.semihosting.Semihosting()  # Handles BKPT #0xAB, output goes to the console
+        self.intrinsics = {}  # Label to the iarm.intrinsics.Intrinsic that `BL label` calls instead
         self.register.link('PC', 'R15')
         self.register.link('LR', 'R14')
         self.register.link('SP', 'R13')
         self.register.link('FP', 'R7') # TODO this could be R7 in THUMB mode and R11 in ARM mode
+        self.register.watch('APSR', self.update_APSR)
         self.register['PC'] = 1  # PC points to the next instruction in THUMB mode
         # http://infocenter.arm.com/help/index.jsp?topic=/com.arm.doc.dui0473f/Babbdajb.html
+        self.register['SP'] = self._memory_size  # The stack grows down from the top of memory
 
-    def evaluate(self, code):
+    def reset(self, keep_program=False):
+        """
+        Put the interpreter back the way it was when it was made, which is much faster than making a new one
+        Settings like `generate_random` and `batch_blocks` are kept. Peripherals, bound functions,
+        the semihosting settings, and memory put in place of the default are all dropped.
+        :param keep_program: Keep the decoded program, its labels, equates, and the constants
+            it put in memory so it can be run again from the start with different inputs.
+            The memory, peripherals, bound functions, and semihosting settings it runs with are kept as well
+        :return:
+        """
+        super().reset(keep_program)
+        if not keep_program:
+            self.source = []
+            self.references = {}
+            self.cells = {}
+            self._program_labels = set()
+            self._blocks = {}
+            self.nvic = None
+            self.semihosting = iarm.semihosting.Semihosting()
+            if self.intrinsics:
+                bound = tuple(self.intrinsics)
+                self.intrinsics = {}
+                self.link(labels=bound)  # Forget the decoded calls to them
+        self.register['PC'] = 1
+        self.register['SP'] = self._memory_size
+        self.cycles = 0
+        self.events = []
+        self.event_register = False
+        self.semihosting.reset()
+
+    def fork(self):
+        """
+        Make a copy of the interpreter that carries on from where this one is
+        Memory is shared page by page until one of them writes to it,
+        so setting up once and forking for every set of inputs is cheap.
+        Instructions hold on to the interpreter they were decoded for, so the program is decoded again,
+        which takes time in proportion to the length of the program. For many runs of a long program,
+        `reset(keep_program=True)` on one interpreter avoids decoding it again.
+        Peripherals (and the NVIC and SysTick events that come with them) are not copied,
+        forking an interpreter with peripherals attached raises a ValueError.
+        :return: The new Arm
+        """
+        other = super().fork()
+        other.register.watch('APSR', other.update_APSR)
+        other.source = list(self.source)
+        other.references = dict(self.references)
+        other.cells = dict(self.cells)
+        other._program_labels = set(self._program_labels)
+        other._blocks = {}
+        other._decoded = {}  # Decoded instructions hold on to the interpreter they were decoded for
+        other.events = []  # Anything scheduled was scheduled by and for this interpreter
+        other.semihosting = self.semihosting.fork()
+        other.intrinsics = dict(self.intrinsics)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # Anything worth warning about was warned about the first time
+            other.program = [other.decode(op, params) for op, params in self.source]
+        return other
+
+    def attach(self, peripheral):
+        """
+        Map a peripheral's registers into memory at its base address
+        Batched blocks are made again, loads and stores end blocks once a peripheral is attached.
+        :param peripheral: An iarm.peripherals.Peripheral
+        :return:
+        """
+        super().attach(peripheral)
+        self._blocks.clear()
+
+    def evaluate(self, code, cell=None):
+        """
+        Decode code and add it to the end of the program
+        :param code: The code
+        :param cell: Where the code came from, like the id of a notebook cell. Evaluating the same cell again replaces
+            the code it added last time instead of adding another copy. Only lines that changed are decoded again,
+            and everything after the cell is moved to make room.
+        :return:
+        """
         parsed = self.parse_lines(code)
+        if cell in self.cells:
+            start, end, old = self.cells[cell]
+        else:
+            start = end = len(self.program)
+            old = []
+        unchanged = self._unchanged_lines(old, parsed) if old else set()
 
         # Find all labels (don't need to have them point to anything yet
-        temp_labels = {line[0]: None for line in parsed if line[0]}
+        temp_labels = {line[0]: None for line in parsed if line[0] and line[0] not in self.labels}
+        saved_labels = dict(self.labels)
         self.labels.update(temp_labels)  # These will exist eventually in this code block
 
+        def roll_back():
+            # Put the labels back the way they were
+            self.labels.clear()
+            self.labels.update(saved_labels)
+
         # Validate the code and get back a function to execute that instruction
         program = []
+        source = []
+        references = {}
         labels = {}
+        data_labels = set()  # Labels on directives, which do not point into the program
         line_counter = 0
         for line in parsed:
             line_counter += 1  # TODO this doesnt seem to include lines with new lines
@@ -38,67 +161,421 @@ class Arm(instructions.DataMovement, instructions.Arithmetic,
             op = op.replace('.', '')  # GCC puts . infront of some stuff, lets just get rid of it
 
             if not op and params.strip():
+                roll_back()
                 raise iarm.exceptions.ParsingError("Parameters found but no instruction; {}".format(line))
 
             # Set the label to the next instruction
             if label:
                 # TODO how to integrate directives and instructions
-                # TODO this doesnt take care of labels that are not jumps (like DCD)
-                labels[label] = len(self.program) + len(program)
+                labels[label] = start + len(program)
 
             # First, see if op is a directive
             # TODO raise an error if a directive is not where it should be
             if op in self.directives:
+                if label:
+                    data_labels.add(label)
+                if line_counter - 1 in unchanged:
+                    # It already ran when the cell was evaluated before, running it again would allocate more memory
+                    if label:
+                        labels[label] = self.labels.get(label)
+                    continue
                 try:
                     self.directives[op](label, params)  # Directives are run immediately
-                    labels.update(self.labels)  # TODO find better way to keep these up to date so they are not over written by the `self.labels.update(labels)` step
+                    if label:
+                        labels[label] = self.labels[label]  # Directives like DCD set their label to memory
                     continue
                 except iarm.exceptions.EndOfProgram as e:
                     warnings.warn(str(e))
                     continue
                 except Exception as e:
-                    [self.labels.pop(i, None) for i in temp_labels]  # Clean up the added labels
+                    roll_back()
                     e.args = ("Line {}; Error on '{}': ".format(line_counter, label + ' ' + op + ' ' + params),) + e.args
                     raise
 
             # Next,
             # If the op lookup fails, it was a bad instruction
             if op:
-                try:
-                    func = self.ops[op]
-                except KeyError as e:
-                    [self.labels.pop(i, None) for i in temp_labels]  # Clean up the added labels
+                if op not in self.ops:
+                    roll_back()
                     raise iarm.exceptions.ValidationError("Line {}; Error on '{}': Instruction '{}' does not exist".format(line_counter, label + ' ' + op + ' ' + params, op))
 
                 # Run the instruction, if it raised an error, roll back the labels
                 try:
-                    instruction = func(params)
+                    instruction = self.decode(op, params)
                 except Exception as e:
                     # TODO We may have a key error, or something other than an IarmError
-                    [self.labels.pop(i, None) for i in temp_labels]  # Clean up the added labels
+                    roll_back()
                     e.args = ("Line {}; Error on '{}': ".format(line_counter, label + ' ' + op + ' ' + params),) + e.args
                     raise
                 else:
+                    if self._resolved_labels:
+                        references[start + len(program)] = self._resolved_labels
                     program.append(instruction)  # It validated, add it to the temp instruction list
+                    source.append((op, params))
 
         # Code block was successfully validated, update the main program
-        self.program += program
+        if cell in self.cells:
+            self._remove_cell(cell, labels, len(program))
+        self.program[start:start] = program
+        self.source[start:start] = source
+        self.references.update(references)
         self.labels.update(labels)
+        self._program_labels.update(label for label in labels if label not in data_labels)
+        self._program_labels.difference_update(data_labels)
+        if cell is not None:
+            self.cells[cell] = (start, start + len(program), parsed)
+        self.link()
 
         if not self._postpone_execution:
             self.run()
 
+    def _unchanged_lines(self, old, parsed):
+        """
+        Find the lines of a cell that are the same as when it was evaluated before
+
+        Unchanged instructions are decoded again, which finds them in the decode cache unless an equate
+        or label they use changed. Unchanged directives are not run again.
+        :param old: The parsed lines from before
+        :param parsed: The parsed lines now
+        :return: The index in `parsed` of each line that did not change
+        """
+        # Usually only a few lines in one place changed, so only diff what is between the lines that match at each end
+        limit = min(len(old), len(parsed))
+        head = 0
+        while head < limit and old[head] == parsed[head]:
+            head += 1
+        tail = 0
+        while tail < limit - head and old[-1 - tail] == parsed[-1 - tail]:
+            tail += 1
+        unchanged = set(range(head))
+        unchanged.update(range(len(parsed) - tail, len(parsed)))
+        matcher = difflib.SequenceMatcher(None, old[head:len(old) - tail], parsed[head:len(parsed) - tail], autojunk=False)
+        unchanged.update(head + b + i for a, b, size in matcher.get_matching_blocks() for i in range(size))
+        return unchanged
+
+    def _remove_cell(self, cell, labels, length):
+        """
+        Take the code a cell added before out of the program, and move everything after it to make room for
+        the new code
+        :param cell: The cell
+        :param labels: The labels the new code defines
+        :param length: How many instructions the new code has
+        :return:
+        """
+        start, end, old = self.cells.pop(cell)
+        shift = length - (end - start)
+        del self.program[start:end]
+        del self.source[start:end]
+        self.references = {index + shift if index >= end else index: resolved
+                           for index, resolved in self.references.items() if not start <= index < end}
+        for name, (other_start, other_end, other_parsed) in self.cells.items():
+            if other_start >= end:
+                self.cells[name] = (other_start + shift, other_end + shift, other_parsed)
+        for label, op, params in old:
+            if label and label not in labels:
+                self.labels.pop(label, None)  # It is not in the cell any more
+                self._program_labels.discard(label)
+        # Labels that point into the program after the cell move with it
+        for label in self._program_labels:
+            value = self.labels.get(label)
+            if value is not None and value >= end and label not in labels:
+                self.labels[label] = value + shift
+        if end <= self.registers[self.PC] - 1 <= end + len(self.program) - start:
+            self.registers[self.PC] += shift
+
+    def link(self, labels=()):
+        """
+        Decode again any instruction that was linked against a label that has since been defined or moved
+
+        Instructions look up their labels once when they are decoded so they do not have to at run time.
+        Each one is checked against the values it resolved (see `resolve_label`), which also catches
+        a name that was not defined yet turning out to be an equate.
+        :param labels: Labels that changed in some other way, every instruction linked against them is decoded again
+        """
+        if labels:
+            for decoded in self._decoded.values():
+                decoded[:] = [entry for entry in decoded if not any(label in entry[1] for label in labels)]
+        symbol_value = self._symbol_value
+        for index, resolved in self.references.items():
+            if (all(symbol_value(label) == value for label, value in resolved.items())
+                    and not any(label in resolved for label in labels)):
+                continue
+            op, params = self.source[index]
+            try:
+                self.program[index] = self.decode(op, params)
+            except Exception as e:
+                e.args = ("Error linking '{}': ".format(op + ' ' + params),) + e.args
+                raise
+            self.references[index] = self._resolved_labels
+        self._blocks.clear()  # Blocks hold on to the old instructions
+
+    def decode(self, op, params):
+        """
+        Decode one instruction, or find it in the decode cache
+
+        Lines that were decoded before with the same equates version, and whose labels still have the same values,
+        get the same decoded instruction back. The cache is kept when the interpreter is reset, so evaluating
+        the same code again (rerunning a notebook, or the next submission in a pool) is mostly lookups.
+        Equates get a new version every time they change, so that only holds for code without equates.
+        The labels the instruction resolved are left in `_resolved_labels`.
+        :param op: The instruction
+        :param params: Its parameters
+        :return: The decoded instruction
+        """
+        key = (op, params, self.equates.version)
+        decoded = self._decoded.get(key)
+        if decoded is None:
+            if len(self._decoded) >= MAX_DECODED:
+                self._decoded.clear()
+            decoded = self._decoded[key] = []
+        symbol_value = self._symbol_value
+        # A forward reference is decoded before and after its label is defined, so keep both
+        for instruction, resolved in decoded:
+            if all(symbol_value(label) == value for label, value in resolved.items()):
+                self._resolved_labels = dict(resolved)
+                return instruction
+        self._resolved_labels = {}
+        instruction = self.ops[op](params)
+        if len(decoded) >= 4:
+            del decoded[0]
+        decoded.append((instruction, dict(self._resolved_labels)))
+        return instruction
+
     def run(self, steps=float('inf')):
         """
         Run to the current end of the program or a number of steps
+        Instructions are run in stretches up to the next scheduled event, so nothing is checked between instructions.
+        :return:
+        """
+        end = self.cycles + steps
+        try:
+            while True:
+                stop = min(end, self.events[0][0]) if self.events else end
+                if self._batch_blocks:
+                    self.run_blocks(stop - self.cycles)
+                    stop = min(end, self.events[0][0]) if self.events else end  # The blocks may have scheduled something
+                if self._run_until(stop):
+                    # The program ran out, unless it branched to an EXC_RETURN value to return from an exception
+                    if not self._exception_return():
+                        return
+                elif self.cycles >= end:
+                    return
+                else:
+                    self._fire_events()
+        finally:
+            # Output is handed over in bulk, whatever stopped the program
+            self.semihosting.flush()
+            for peripheral in self.peripherals:
+                peripheral.flush()
+
+    def _run_until(self, stop):
+        """
+        Run one instruction at a time until `cycles` reaches stop or the program runs out
+        :param stop: The cycle to stop at
+        :return: True if the program ran out
+        """
+        registers = self.registers
+        PC = self.PC
+        program = self.program
+        # While an instruction runs, `cycles` is how many instructions ran before it.
+        # `schedule` can lower the stop, and `charge` adds to the cycles, so both are checked every time
+        if self.cycles >= stop:
+            return False
+        self._stop = stop
+        try:
+            while True:
+                if len(program) <= (registers[PC] - 1):
+                    return True
+                program[registers[PC] - 1]()
+                registers[PC] += 1
+                self.cycles += 1
+                if self.cycles >= self._stop:
+                    return False
+        finally:
+            self._stop = None
+
+    def schedule(self, cycle, callback):
+        """
+        Call callback once `cycles` reaches cycle, between two instructions
+        If the program is running, the current instruction is finished first.
+        :param cycle: When to call it
+        :param callback: A function that takes no arguments
+        :return:
+        """
+        heapq.heappush(self.events, (cycle, next(_event_order), callback))
+        if self._stop is not None and cycle < self._stop:
+            # Stop the running stretch in time for this event, at the earliest after the current instruction
+            self._stop = cycle
+
+    def idle(self):
+        """
+        Skip the clock forward to the next scheduled event, for instructions that wait for something to happen
+        Raises EndOfProgram if nothing is scheduled, since nothing could ever wake it up.
+        Waiting instructions are always run on their own, never in the middle of a batched block.
+        :return:
+        """
+        if not self.events:
+            raise iarm.exceptions.EndOfProgram("Waiting with nothing scheduled to wake up")
+        wake = self.events[0][0]
+        if self._stop is not None:
+            wake = min(wake, self._stop)  # Running out of steps also ends the wait
+        # The wait is charged as extra cycles on this instruction, the run loop counts the instruction itself
+        self.charge(max(0, wake - self.cycles - 1))
+
+    def charge(self, cycles):
+        """
+        Count extra cycles for the instruction that is running, for things that take longer than one instruction
+        :param cycles: How many cycles to add
+        :return:
+        """
+        self.cycles += cycles
+
+    def bind(self, label, function, cycles=1):
+        """
+        Call a Python function instead of the routine at a label when the program does `BL label`
+        See iarm.intrinsics for how the function is called.
+        :param label: The label, it does not have to exist in the program
+        :param function: Called with the interpreter and R0 - R3, returns R0, a tuple for R0, R1, ..., or None
+        :param cycles: How many instructions a call counts as
+        :return:
+        """
+        label = label.upper()  # Labels are kept in upper case
+        self.intrinsics[label] = iarm.intrinsics.Intrinsic(function, cycles)
+        self.link(labels=(label,))
+
+    def unbind(self, label):
+        """
+        Go back to running the routine at a label
+        :param label: The label given to bind
+        :return:
+        """
+        label = label.upper()
+        del self.intrinsics[label]
+        self.link(labels=(label,))
+
+    def bind_library(self, cycles=1):
+        """
+        Bind every routine in iarm.intrinsics.LIBRARY, like `__aeabi_uidiv` and `memcpy`
+        :param cycles: How many instructions a call counts as
+        :return:
+        """
+        for label, function in iarm.intrinsics.LIBRARY.items():
+            self.intrinsics[label.upper()] = iarm.intrinsics.Intrinsic(function, cycles)
+        self.link(labels=[label.upper() for label in iarm.intrinsics.LIBRARY])
+
+    def _fire_events(self):
+        events = self.events
+        while events and events[0][0] <= self.cycles:
+            _, _, callback = heapq.heappop(events)
+            callback()
+
+    def enter_exception(self, number, handler):
+        """
+        Take an exception, stacking the registers the handler may change
+        :param number: The exception number, which goes in the IPSR
+        :param handler: The program index of the handler
         :return:
         """
-        while len(self.program) > (self.register['PC'] - 1):
-            steps -= 1
-            if steps < 0:
-                break
-            self.program[self.register['PC'] - 1]()
-            self.register['PC'] += 1
+        registers = self.registers
+        self.update_APSR()
+        xpsr = registers[self.APSR] | registers[self.IPSR] | registers[self.EPSR]
+        sp = registers[self.SP]
+        if sp % 8:
+            # The stack frame is always 8 byte aligned, bit 9 of the stacked xPSR says it was moved
+            sp -= 4
+            xpsr |= 1 << 9
+        sp = (sp - 32) & self._mask
+        frame = (registers[0], registers[1], registers[2], registers[3], registers[12], registers[self.LR],
+                 registers[self.PC], xpsr)
+        for i, value in enumerate(frame):
+            self.memory.write_word(sp + 4 * i, value)
+        registers[self.SP] = sp
+        registers[self.LR] = EXC_RETURN_HANDLER if registers[self.IPSR] else EXC_RETURN_THREAD
+        registers[self.IPSR] = number
+        registers[self.PC] = handler + 1
+
+    def _exception_return(self):
+        """
+        Unstack the registers if the program branched to an EXC_RETURN value
+        :return: True if it did
+        """
+        registers = self.registers
+        exc_return = registers[self.PC] - 1
+        if exc_return not in (EXC_RETURN_HANDLER, EXC_RETURN_THREAD) or not registers[self.IPSR]:
+            return False
+        number = registers[self.IPSR]
+        sp = registers[self.SP]
+        r0, r1, r2, r3, r12, lr, pc, xpsr = (self.memory.read_word(sp + 4 * i) for i in range(8))
+        registers[0], registers[1], registers[2], registers[3], registers[12] = r0, r1, r2, r3, r12
+        registers[self.LR] = lr
+        registers[self.PC] = pc
+        self.discard_flags()
+        registers[self.APSR] = xpsr & 0xF0000000
+        registers[self.IPSR] = xpsr & 0x3F
+        registers[self.SP] = (sp + 32 + (4 if xpsr & (1 << 9) else 0)) & self._mask
+        self.event_register = True
+        if self.nvic is not None:
+            self.nvic.returned(number)
+        return True
+
+    def run_blocks(self, steps=float('inf')):
+        """
+        Run whole basic blocks until the end of the program or until the next block
+        needs more steps than are left
+        :return: The number of steps left
+        """
+        registers = self.registers
+        PC = self.PC
+        stop = self.cycles + steps
+        self._stop = stop  # Waiting instructions wake up by here at the latest
+        try:
+            while len(self.program) > (registers[PC] - 1):
+                start = registers[PC] - 1
+                try:
+                    block, length = self._blocks[start]
+                except KeyError:
+                    block, length = self._blocks[start] = iarm.dispatch.batch_block(self, start)
+                if self.cycles + length > stop:
+                    break
+                before = self.cycles
+                # Only the last instruction in a block can see the time, so it is given the time it runs at
+                self.cycles += length - 1
+                try:
+                    block()
+                except Exception as e:
+                    # Point the PC at the instruction that failed, like running one instruction at a time would
+                    failed = iarm.dispatch.failed_instruction(block, start, length, e.__traceback__)
+                    registers[PC] = failed + 1
+                    self.cycles = before + failed - start
+                    raise
+                registers[PC] += 1
+                self.cycles += 1
+                if self.events and self.events[0][0] <= self.cycles:
+                    break  # Something happened in the block that needs handling before the next one
+        finally:
+            self._stop = None
+        return stop - self.cycles
+
+    def run_lanes(self, registers=None, memory=None, lanes=None, steps=float('inf')):
+        """
+        Run the program once for each set of starting values, all at the same time
+        Every lane starts from the current PC, registers, and memory unless they are given.
+        The interpreter itself is not changed. Needs numpy.
+        :param registers: Register name to a value or list of values, one for each lane
+        :param memory: Starting memory for every lane, or an array of shape (lanes, memory size)
+        :param lanes: How many lanes to run, if it cannot be worked out from registers or memory
+        :param steps: The most instructions any one lane will run
+        :return: The finished iarm.lanes.Lanes, with `register`, `memory`, and `faults` for every lane
+        """
+        return iarm.lanes.Lanes(self, registers, memory, lanes).run(steps)
+
+    @property
+    def batch_blocks(self):
+        return self._batch_blocks
+
+    @batch_blocks.setter
+    def batch_blocks(self, value):
+        self._batch_blocks = value
 
     def print_status_bits(self):
         print("N: {} Z: {} C: {} V: {}".format(
@@ -1,8 +1,19 @@
+import collections
 import re
 import iarm.exceptions
 import iarm.cpu
 import warnings
 
+# An operand after it has been classified. `kind` is one of the _Meta operand kinds,
+# `value` is the register number or immediate value (None for anything else), and `text` is the operand uppercased
+_Operand = collections.namedtuple('_Operand', ['kind', 'value', 'text'])
+
+# Operand text to its _Operand, and (shape, parameters) to the operands get_parameters found or the error
+# it raised. Shared by every interpreter since neither ever changes. Cleared when they get too big
+_operands = {}
+_shaped = {}
+_MAX_CACHED = 2**16
+
 
 class _Meta(iarm.cpu.RegisterCpu):
     """
@@ -10,12 +21,46 @@ class _Meta(iarm.cpu.RegisterCpu):
     """
     REGISTER_NUMBER = r'(\d+)'
     IMMEDIATE_NUMBER = r'(0[xX][0-9a-zA-Z]+|2_\d+|-?\d+)'
-    REGISTER_REGEX = r'^[rR]({})|fp|sp|lr|LR|SP|FP$'.format(REGISTER_NUMBER)
+    REGISTER_REGEX = r'^(?:R{}|FP|SP|LR|PC)$'.format(REGISTER_NUMBER)
     IMMEDIATE_REGEX = r'^#{}$'.format(IMMEDIATE_NUMBER)
     ONE_PARAMETER = r'\s*([^\s,]*)(,\s*[^\s,]*)*\s*'
     TWO_PARAMETER_COMMA_SEPARATED = r'\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*'
     THREE_PARAMETER_COMMA_SEPARATED = r'\s*([^\s,]*),\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*'
+    TWO_PARAMETER_WITH_BRACKETS = r'\s*([^\s,]*),\s*\[([^\s,]*)\](,\s*[^\s,]*)*\s*'
+    THREE_PARAMETER_WITH_BRACKETS = r'\s*([^\s,]*),\s*\[([^\s,]*),\s*([^\s,]*)\](,\s*[^\s,]*)*\s*'
+    # The patterns above are not run as a regex, `split_operands` splits the parameters and these say
+    # how many operands to expect and whether all but the first are in brackets
+    _SHAPES = {
+        ONE_PARAMETER: (1, False),
+        TWO_PARAMETER_COMMA_SEPARATED: (2, False),
+        THREE_PARAMETER_COMMA_SEPARATED: (3, False),
+        TWO_PARAMETER_WITH_BRACKETS: (2, True),
+        THREE_PARAMETER_WITH_BRACKETS: (3, True),
+    }
+    _REGISTER = re.compile(REGISTER_REGEX)
+    _IMMEDIATE = re.compile(IMMEDIATE_REGEX)
+    _REGISTER_ALIASES = {'SP': 13, 'LR': 14, 'PC': 15, 'FP': 7}  # TODO FP could be 7 or 11 depending on THUMB and ARM mode http://www.keil.com/support/man/docs/armcc/armcc_chr1359124947957.htm
+
+    # Operand kinds
+    REGISTER = 'register'
+    IMMEDIATE = 'immediate'
+    OTHER = 'other'  # Labels, =literals, and anything else the instructions pick apart themselves
     WHITESPACE = r' \t\r\f\v'  # No newline
+    SPECIAL_REGISTERS = ('APSR', 'IPSR', 'EPSR', 'PRIMASK', 'FAULTMASK', 'BASEPRI', 'CONTROL')
+
+    # Where registers live in the register list, R0 - R15 are their own number
+    SP = 13
+    LR = 14
+    PC = 15
+    APSR = 16
+    IPSR = 17
+    EPSR = 18
+    PRIMASK = 19
+
+    # Flags are worked out when they are read, not when they are set.
+    # These hold what the last flag setting instruction did until then
+    _nz_result = None  # The result N and Z come from
+    _cv_operation = None  # (oper_1, oper_2, result, type) that C and V come from
 
     def parse_lines(self, code):
         """
@@ -39,16 +84,92 @@ class _Meta(iarm.cpu.RegisterCpu):
         res = [(label.upper(), instruction.upper(), parameters.strip()) for (label, instruction, parameters) in res]
         return res
 
+    def split_operands(self, parameters):
+        """
+        Split the parameters at the commas that are not in brackets or braces
+
+        `R0, [R1, #4]` is split into `R0` and `[R1, #4]`
+        :param parameters: The parameters of one line
+        :return: A list of the operands, with white space stripped
+        """
+        if '[' not in parameters and '{' not in parameters:
+            return [operand.strip() for operand in parameters.split(',')]
+        operands = []
+        depth = 0
+        start = 0
+        for i, character in enumerate(parameters):
+            if character in '[{':
+                depth += 1
+            elif character in ']}':
+                depth -= 1
+            elif character == ',' and not depth:
+                operands.append(parameters[start:i].strip())
+                start = i + 1
+        operands.append(parameters[start:].strip())
+        return operands
+
+    def resolve_equates(self, operand):
+        """
+        Put the value of any equate in place of its name
+
+        Only whole names are looked up in the equates, so `#SIZE`, `=SIZE`, and `[R0, #SIZE]` use the equate SIZE
+        but `#SIZE2` and `SIZE_LOOP` do not. Equates are looked up, not searched for, so having
+        hundreds of them costs nothing extra.
+        :param operand: One operand, with white space stripped
+        :return: The operand with the equates replaced
+        """
+        equates = self.equates
+        if not equates:
+            return operand
+        if operand[:1] in ('[', '{') and operand[-1:] in (']', '}'):
+            inner = operand[1:-1].split(',')
+            return operand[0] + ', '.join(self.resolve_equates(i.strip()) for i in inner) + operand[-1]
+        prefix = operand[:1] if operand[:1] in ('#', '=') else ''
+        value = equates.get(operand[len(prefix):].upper())
+        if value is None:
+            return operand
+        return prefix + str(value)
+
+    def operand(self, text):
+        """
+        Classify one operand as a register, an immediate, or something else, for the `is_` and `check_` helpers
+
+        Each distinct operand is only classified once, after that this is a dictionary lookup.
+        Register numbers are not checked against the number of registers here
+        :param text: The operand, like `R1`, `#4`, or `label`
+        :return: An _Operand
+        """
+        try:
+            return _operands[text]
+        except KeyError:
+            pass
+        upper = text.upper()
+        match = self._REGISTER.match(upper)
+        if match is not None:
+            number = match.group(1)
+            result = _Operand(self.REGISTER, int(number) if number else self._REGISTER_ALIASES[upper], upper)
+        elif self._IMMEDIATE.match(upper):
+            try:
+                value = self.convert_to_integer(upper[1:])
+            except ValueError:
+                value = None  # Looks like a number but is not one, like #0xFG. check_immediate raises the ValueError
+            result = _Operand(self.IMMEDIATE, value, upper)
+        else:
+            result = _Operand(self.OTHER, None, upper)
+        if len(_operands) >= _MAX_CACHED:
+            _operands.clear()
+        _operands[text] = result
+        return result
+
     def is_register(self, R):
         """
         Is R a register.
 
-        Finds out by doing a regex match for R and a number
         Does not check if the register is within range
         :param R: The parameter to check
         :return: True if the parameter is a register
         """
-        return re.search(self.REGISTER_REGEX, R) is not None
+        return self.operand(R).kind == self.REGISTER
 
     def is_immediate(self, I):
         """
@@ -59,7 +180,7 @@ class _Meta(iarm.cpu.RegisterCpu):
         :param I: The parameter to check
         :return: True if the parameter is an immediate
         """
-        return re.search(self.IMMEDIATE_REGEX, I) is not None
+        return self.operand(I).kind == self.IMMEDIATE
 
     def check_parameter(self, arg):
         """
@@ -86,22 +207,9 @@ class _Meta(iarm.cpu.RegisterCpu):
         :return: The number of the register
         """
         self.check_parameter(arg)
-        match = re.search(self.REGISTER_REGEX, arg)
-        if match is None:
+        kind, r_num, _ = self.operand(arg)
+        if kind != self.REGISTER:
             raise iarm.exceptions.RuleError("Parameter {} is not a register".format(arg))
-        try:
-            r_num = int(match.groups()[0])
-        except ValueError:
-            r_num = int(match.groups()[0], 16)
-        except TypeError:
-            if arg in 'lr|LR':
-                return 14
-            elif arg in 'sp|SP':
-                return 13
-            elif arg in 'fp|FP':
-                return 7 ## TODO this could be 7 or 11 depending on THUMB and ARM mode http://www.keil.com/support/man/docs/armcc/armcc_chr1359124947957.htm
-            else:
-                raise
         if r_num > self._max_registers:
             raise iarm.exceptions.RuleError(
                 "Register {} is greater than defined registers of {}".format(arg, self._max_registers))
@@ -118,10 +226,12 @@ class _Meta(iarm.cpu.RegisterCpu):
         :return: The value of the immediate
         """
         self.check_parameter(arg)
-        match = re.search(self.IMMEDIATE_REGEX, arg)
-        if match is None:
+        kind, value, text = self.operand(arg)
+        if kind != self.IMMEDIATE:
             raise iarm.exceptions.RuleError("Parameter {} is not an immediate".format(arg))
-        return self.convert_to_integer(match.groups()[0])
+        if value is None:
+            return self.convert_to_integer(text[1:])
+        return value
 
     def convert_to_integer(self, str):
         if str.startswith('0x') or str.startswith('0X'):
@@ -241,20 +351,56 @@ class _Meta(iarm.cpu.RegisterCpu):
     def get_parameters(self, regex_exp, parameters):
         """
         Given a regex expression and the string with the paramers,
-        either return a regex match object or raise an exception if the regex
-        did not find a match
+        either return the operands it picks out or raise an exception if they do not fit
+
+        The shared patterns (like TWO_PARAMETER_COMMA_SEPARATED) are not run as a regex,
+        the parameters are split once with `split_operands` and checked against the shape of the pattern.
+        Any other regex is matched as it is.
         :param regex_exp:
         :param parameters:
-        :return:
-        """
-        # TODO find a better way to do the equate replacement
-        for rep in self.equates:
-            parameters = parameters.replace(rep, str(self.equates[rep]))
-        match = re.match(regex_exp, parameters)
-        if not match:
-            raise iarm.exceptions.ParsingError("Parameters are None, did you miss a comma?")
-
-        return match.groups()
+        :return: The operands, and then any extra operands (or None)
+        """
+        shape = self._SHAPES.get(regex_exp)
+        if shape is None:
+            match = re.match(regex_exp, parameters)
+            if not match:
+                raise iarm.exceptions.ParsingError("Parameters are None, did you miss a comma?")
+            return tuple(None if i is None else self.resolve_equates(i) for i in match.groups())
+
+        key = (shape, parameters)
+        result = _shaped.get(key)
+        if result is None:
+            result = self._get_shaped_parameters(shape, parameters)
+            if len(_shaped) >= _MAX_CACHED:
+                _shaped.clear()
+            _shaped[key] = result
+        if isinstance(result, str):
+            raise iarm.exceptions.ParsingError(result)
+        if self.equates:
+            *found, extra = result
+            return tuple(self.resolve_equates(i) for i in found) + (extra,)
+        return result
+
+    def _get_shaped_parameters(self, shape, parameters):
+        """
+        Pick out the operands for one of the shared patterns
+        :param shape: (How many operands, whether all but the first are in brackets)
+        :param parameters:
+        :return: The operands and then any extra operands (or None), or the message for a ParsingError
+        """
+        count, bracketed = shape
+        operands = self.split_operands(parameters)
+        if bracketed and len(operands) >= 2 and operands[1].startswith('[') and operands[1].endswith(']'):
+            found = [operands[0]] + [i.strip() for i in operands[1][1:-1].split(',')]
+            extra = operands[2:]
+        elif bracketed:
+            found = None
+        else:
+            found = operands[:count]
+            extra = operands[count:]
+        if found is None or len(found) != count or any(i.split()[1:] for i in found):
+            return "Parameters are None, did you miss a comma?"
+        return tuple(found) + (''.join(', ' + i for i in extra) if extra else None,)
 
     def get_one_parameter(self, regex_exp, parameters):
         """
@@ -310,6 +456,9 @@ class _Meta(iarm.cpu.RegisterCpu):
         :param value: If value evaulates to true, it is set, cleared otherwise
         :return:
         """
+        if self._nz_result is not None or self._cv_operation is not None:
+            self.update_APSR()
+
         if flag == 'N':
             bit = 31
         elif flag == 'Z':
@@ -322,9 +471,9 @@ class _Meta(iarm.cpu.RegisterCpu):
             raise AttributeError("Flag {} does not exist in the APSR".format(flag))
 
         if value:
-            self.register['APSR'] |= (1 << bit)
+            self.registers[self.APSR] |= (1 << bit)
         else:
-            self.register['APSR'] -= (1 << bit) if (self.register['APSR'] & (1 << bit)) else 0
+            self.registers[self.APSR] &= ~(1 << bit)
 
     def rule_special_registers(self, arg):
         """Raises an exception if the register is not a special register"""
@@ -399,34 +548,90 @@ class _Meta(iarm.cpu.RegisterCpu):
             self.set_APSR_flag_to_value('V', 0)
 
     def set_NZ_flags(self, result):
-        self.set_N_flag(result)
-        self.set_Z_flag(result)
+        # Most flags are overwritten before they are ever looked at,
+        # so only remember the result and work out the flags if they are read
+        self._nz_result = result
 
     def set_NZCV_flags(self, oper_1, oper_2, result, _type):
-        self.set_NZ_flags(result)
-        self.set_C_flag(oper_1, oper_2, result, _type)
-        self.set_V_flag(oper_1, oper_2, result, _type)
+        self._nz_result = result
+        self._cv_operation = (oper_1, oper_2, result, _type)
+
+    def update_APSR(self):
+        """
+        Write the flags from the last flag setting instruction into the APSR
+        Anything that reads the APSR directly needs to call this first
+        :return:
+        """
+        result, self._nz_result = self._nz_result, None
+        operation, self._cv_operation = self._cv_operation, None
+        if result is not None:
+            self.set_N_flag(result)
+            self.set_Z_flag(result)
+        if operation is not None:
+            self.set_C_flag(*operation)
+            self.set_V_flag(*operation)
+
+    def discard_flags(self):
+        """
+        Forget the flags from the last flag setting instruction, used when the whole APSR is overwritten
+        :return:
+        """
+        self._nz_result = None
+        self._cv_operation = None
 
     def rule_R0_thru_R14(self, arg):
         if arg not in ('LR', 'R14', 'SP', 'R13'):
             self.check_arguments(general_purpose_registers=(arg,))
 
     def is_N_set(self):
-        return True if (self.register['APSR'] & (1 << 31)) else False
+        if self._nz_result is not None:
+            return True if (self._nz_result & (1 << self._bit_width - 1)) else False
+        return True if (self.registers[self.APSR] & (1 << 31)) else False
 
     def is_Z_set(self):
-        return True if (self.register['APSR'] & (1 << 30)) else False
+        if self._nz_result is not None:
+            return self._nz_result == 0
+        return True if (self.registers[self.APSR] & (1 << 30)) else False
 
     def is_C_set(self):
-        return True if (self.register['APSR'] & (1 << 29)) else False
+        if self._cv_operation is not None:
+            self.update_APSR()
+        return True if (self.registers[self.APSR] & (1 << 29)) else False
 
     def is_V_set(self):
-        return True if (self.register['APSR'] & (1 << 28)) else False
+        if self._cv_operation is not None:
+            self.update_APSR()
+        return True if (self.registers[self.APSR] & (1 << 28)) else False
 
     def rule_label_exists(self, arg):
         if (arg not in self.labels) and (arg != '.'):
             warnings.warn("Label {} does not exist yet".format(arg), iarm.exceptions.LabelDoesNotExist)
 
+    def resolve_label(self, label):
+        """
+        Get the value of a label while an instruction is being decoded
+
+        The label and its value are remembered so the instruction can be
+        linked again if the label is defined, moved, or turns out to be an equate later on
+        :param label: The label to look up
+        :return: The value of the label, or None if it does not exist yet
+        """
+        value = self._symbol_value(label)
+        self._resolved_labels[label] = value
+        return value
+
+    def _symbol_value(self, name):
+        """
+        The value of a name when linking, the label by that name or else the equate
+        Linking and the decode cache compare what `resolve_label` remembered against this
+        :param name: The label or equate
+        :return: Its value, or None if it is neither
+        """
+        value = self.labels.get(name)
+        if value is None:
+            value = self.equates.get(name)
+        return value
+
     def match_first_two_parameters(self, Ra, Rb):
         if Ra != Rb:
             raise iarm.exceptions.RuleError("First parameter {} does not match second parameter {}".format(Ra, Rb))
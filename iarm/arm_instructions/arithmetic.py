@@ -22,15 +22,15 @@ class Arithmetic(_Meta):
 
         self.check_arguments(low_registers=(Ra, Rc))
         self.match_first_two_parameters(Ra, Rb)
+        Ra, Rc = self.check_register(Ra), self.check_register(Rc)
 
         # ADCS Ra, Ra, Rb
         def ADCS_func():
             # TODO need to rethink the set_NZCV with the C flag
-            oper_1 = self.register[Ra]
-            oper_2 = self.register[Rc]
-            self.register[Ra] = oper_1 + oper_2
-            self.register[Ra] += 1 if self.is_C_set() else 0
-            self.set_NZCV_flags(oper_1, oper_2, self.register[Ra], 'add')
+            oper_1 = self.registers[Ra]
+            oper_2 = self.registers[Rc]
+            self.registers[Ra] = (oper_1 + oper_2 + (1 if self.is_C_set() else 0)) & self._mask
+            self.set_NZCV_flags(oper_1, oper_2, self.registers[Ra], 'add')
 
         return ADCS_func
 
@@ -59,9 +59,10 @@ class Arithmetic(_Meta):
             self.check_arguments(any_registers=(Rx, Ry, Rz))
             if Rx != Ry:
                 raise iarm.exceptions.RuleError("Second parameter {} does not equal first parameter {}". format(Ry, Rx))
+            Rx, Rz = self.check_register(Rx), self.check_register(Rz)
 
             def ADD_func():
-                self.register[Rx] = self.register[Ry] + self.register[Rz]
+                self.registers[Rx] = (self.registers[Rx] + self.registers[Rz]) & self._mask
         else:
             if Rx == 'SP':
                 # ADD SP, SP, #imm9_4
@@ -73,9 +74,11 @@ class Arithmetic(_Meta):
                 self.check_arguments(any_registers=(Rx,), imm10_4=(Rz,))
                 if Ry not in ('SP', 'PC'):
                     raise iarm.exceptions.RuleError("Second parameter {} is not SP or PC".format(Ry))
+            Rx, Ry = self.check_register(Rx), self.check_register(Ry)
+            imm = self.convert_to_integer(Rz[1:])
 
             def ADD_func():
-                self.register[Rx] = self.register[Ry] + self.convert_to_integer(Rz[1:])
+                self.registers[Rx] = (self.registers[Ry] + imm) & self._mask
 
         return ADD_func
 
@@ -101,31 +104,34 @@ class Arithmetic(_Meta):
         if self.is_register(Rc):
             # ADDS Ra, Rb, Rc
             self.check_arguments(low_registers=(Ra, Rb, Rc))
+            Ra, Rb, Rc = self.check_register(Ra), self.check_register(Rb), self.check_register(Rc)
 
             def ADDS_func():
-                oper_1 = self.register[Rb]
-                oper_2 = self.register[Rc]
-                self.register[Ra] = self.register[Rb] + self.register[Rc]
-                self.set_NZCV_flags(oper_1, oper_2, self.register[Ra], 'add')
+                oper_1 = self.registers[Rb]
+                oper_2 = self.registers[Rc]
+                self.registers[Ra] = (oper_1 + oper_2) & self._mask
+                self.set_NZCV_flags(oper_1, oper_2, self.registers[Ra], 'add')
         elif Ra == Rb:
             # ADDS Ra, Ra, #imm8
             self.check_arguments(low_registers=(Ra,), imm8=(Rc,))
             self.match_first_two_parameters(Ra, Rb)
+            Ra = self.check_register(Ra)
+            oper_2 = self.convert_to_integer(Rc[1:])
 
             def ADDS_func():
-                oper_1 = self.register[Ra]
-                oper_2 = self.convert_to_integer(Rc[1:])
-                self.register[Ra] = self.register[Ra] + oper_2
-                self.set_NZCV_flags(oper_1, oper_2, self.register[Ra], 'add')
+                oper_1 = self.registers[Ra]
+                self.registers[Ra] = (oper_1 + oper_2) & self._mask
+                self.set_NZCV_flags(oper_1, oper_2, self.registers[Ra], 'add')
         else:
             # ADDS Ra, Rb, #imm3
             self.check_arguments(low_registers=(Ra, Rb), imm3=(Rc,))
+            Ra, Rb = self.check_register(Ra), self.check_register(Rb)
+            oper_2 = self.convert_to_integer(Rc[1:])
 
             def ADDS_func():
-                oper_1 = self.register[Rb]
-                oper_2 = self.convert_to_integer(Rc[1:])
-                self.register[Ra] = self.register[Rb] + oper_2
-                self.set_NZCV_flags(oper_1, oper_2, self.register[Ra], 'add')
+                oper_1 = self.registers[Rb]
+                self.registers[Ra] = (oper_1 + oper_2) & self._mask
+                self.set_NZCV_flags(oper_1, oper_2, self.registers[Ra], 'add')
 
         return ADDS_func
 
@@ -140,11 +146,12 @@ class Arithmetic(_Meta):
         Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        Ra, Rb = self.check_register(Ra), self.check_register(Rb)
 
         # CMN Ra, Rb
         def CMN_func():
-            self.set_NZCV_flags(self.register[Ra], self.register[Rb],
-                                self.register[Ra] + self.register[Rb], 'add')
+            self.set_NZCV_flags(self.registers[Ra], self.registers[Rb],
+                                self.registers[Ra] + self.registers[Rb], 'add')
 
         return CMN_func
 
@@ -161,18 +168,20 @@ class Arithmetic(_Meta):
         if self.is_register(Rn):
             # CMP Rm, Rn
             self.check_arguments(R0_thru_R14=(Rm, Rn))
+            Rm, Rn = self.check_register(Rm), self.check_register(Rn)
 
             def CMP_func():
-                self.set_NZCV_flags(self.register[Rm], self.register[Rn],
-                                    self.register[Rm] - self.register[Rn], 'sub')
+                self.set_NZCV_flags(self.registers[Rm], self.registers[Rn],
+                                    self.registers[Rm] - self.registers[Rn], 'sub')
         else:
             # CMP Rm, #imm8
             self.check_arguments(R0_thru_R14=(Rm,), imm8=(Rn,))
+            Rm = self.check_register(Rm)
+            tmp = self.convert_to_integer(Rn[1:])
 
             def CMP_func():
-                tmp = self.convert_to_integer(Rn[1:])
-                self.set_NZCV_flags(self.register[Rm], tmp,
-                                    self.register[Rm] - tmp, 'sub')
+                self.set_NZCV_flags(self.registers[Rm], tmp,
+                                    self.registers[Rm] - tmp, 'sub')
 
         return CMP_func
 
@@ -190,11 +199,12 @@ class Arithmetic(_Meta):
         self.check_arguments(low_registers=(Ra, Rb, Rc))
         if Ra != Rc:
             raise iarm.exceptions.RuleError("Third parameter {} is not the same as the first parameter {}".format(Rc, Ra))
+        Ra, Rb = self.check_register(Ra), self.check_register(Rb)
 
         # MULS Ra, Rb, Ra
         def MULS_func():
-            self.register[Ra] = self.register[Rb] * self.register[Rc]
-            self.set_NZ_flags(self.register[Ra])
+            self.registers[Ra] = (self.registers[Rb] * self.registers[Ra]) & self._mask
+            self.set_NZ_flags(self.registers[Ra])
 
         return MULS_func
 
@@ -230,12 +240,13 @@ class Arithmetic(_Meta):
         self.check_arguments(low_registers=(Ra, Rb))
         if Rc != '#0':
             raise iarm.exceptions.RuleError("Third parameter {} is not #0".format(Rc))
+        Ra, Rb = self.check_register(Ra), self.check_register(Rb)
         # RSBS Ra, Rb, #0
 
         def RSBS_func():
-            oper_2 = self.register[Rb]
-            self.register[Ra] = 0 - self.register[Rb]
-            self.set_NZCV_flags(0, oper_2, self.register[Ra], 'sub')
+            oper_2 = self.registers[Rb]
+            self.registers[Ra] = (0 - oper_2) & self._mask
+            self.set_NZCV_flags(0, oper_2, self.registers[Ra], 'sub')
 
         return RSBS_func
 
@@ -259,14 +270,15 @@ class Arithmetic(_Meta):
 
         self.check_arguments(low_registers=(Ra, Rb, Rc))
         self.match_first_two_parameters(Ra, Rb)
+        Ra, Rc = self.check_register(Ra), self.check_register(Rc)
 
         # SBCS Ra, Ra, Rb
         def SBCS_func():
             # TODO does setting the flags work here?
-            oper_1 = self.register[Rb]
-            oper_2 = self.register[Rc] + (1 if self.is_C_set() else 0)
-            self.register[Ra] = self.register[Rb] - oper_2
-            self.set_NZCV_flags(oper_1, oper_2, self.register[Ra], 'sub')
+            oper_1 = self.registers[Ra]
+            oper_2 = self.registers[Rc] + (1 if self.is_C_set() else 0)
+            self.registers[Ra] = (oper_1 - oper_2) & self._mask
+            self.set_NZCV_flags(oper_1, oper_2, self.registers[Ra], 'sub')
 
         return SBCS_func
 
@@ -292,9 +304,11 @@ class Arithmetic(_Meta):
         if Rb != 'SP':
             raise iarm.exceptions.RuleError("Second parameter {} is not equal to SP".format(Rb))
 
+        imm = self.convert_to_integer(Rc[1:])
+
         # SUB SP, SP, #imm9_4
         def SUB_func():
-            self.register[Ra] = self.register[Rb] - self.convert_to_integer(Rc[1:])
+            self.registers[self.SP] = (self.registers[self.SP] - imm) & self._mask
 
         return SUB_func
 
@@ -320,28 +334,26 @@ class Arithmetic(_Meta):
         if self.is_register(Rc):
             # SUBS Ra, Rb, Rc
             self.check_arguments(low_registers=(Ra, Rb, Rc))
+            Ra, Rb, Rc = self.check_register(Ra), self.check_register(Rb), self.check_register(Rc)
 
             def SUBS_func():
-                oper_1 = self.register[Rb]
-                oper_2 = self.register[Rc]
-                self.register[Ra] = self.register[Rb] - self.register[Rc]
-                self.set_NZCV_flags(oper_1, oper_2, self.register[Ra], 'sub')
+                oper_1 = self.registers[Rb]
+                oper_2 = self.registers[Rc]
+                self.registers[Ra] = (oper_1 - oper_2) & self._mask
+                self.set_NZCV_flags(oper_1, oper_2, self.registers[Ra], 'sub')
         else:
             if Ra == Rb:
                 # SUBS Ra, Ra, #imm8
                 self.check_arguments(low_registers=(Ra,), imm8=(Rc,))
-
-                def SUBS_func():
-                    oper_1 = self.register[Ra]
-                    self.register[Ra] = self.register[Ra] - self.convert_to_integer(Rc[1:])
-                    self.set_NZCV_flags(oper_1, self.convert_to_integer(Rc[1:]), self.register[Ra], 'sub')
             else:
                 # SUBS Ra, Rb, #imm3
                 self.check_arguments(low_registers=(Ra, Rb), imm3=(Rc,))
+            Ra, Rb = self.check_register(Ra), self.check_register(Rb)
+            oper_2 = self.convert_to_integer(Rc[1:])
 
-                def SUBS_func():
-                    oper_1 = self.register[Rb]
-                    self.register[Ra] = self.register[Rb] - self.convert_to_integer(Rc[1:])
-                    self.set_NZCV_flags(oper_1, self.convert_to_integer(Rc[1:]), self.register[Ra], 'sub')
+            def SUBS_func():
+                oper_1 = self.registers[Rb]
+                self.registers[Ra] = (oper_1 - oper_2) & self._mask
+                self.set_NZCV_flags(oper_1, oper_2, self.registers[Ra], 'sub')
 
         return SUBS_func
@@ -1,3 +1,4 @@
+import iarm.exceptions
 from ._meta import _Meta
 
 
@@ -11,11 +12,14 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        target = self.resolve_label(label)
 
         # BCC label
         def BCC_func():
             if not self.is_C_set():
-                self.register['PC'] = self.labels[label]
+                if target is None:
+                    raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+                self.registers[self.PC] = target
 
         return BCC_func
 
@@ -28,11 +32,14 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        target = self.resolve_label(label)
 
         # BCS label
         def BCS_func():
             if self.is_C_set():
-                self.register['PC'] = self.labels[label]
+                if target is None:
+                    raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+                self.registers[self.PC] = target
 
         return BCS_func
 
@@ -45,11 +52,14 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        target = self.resolve_label(label)
 
         # BEQ label
         def BEQ_func():
             if self.is_Z_set():
-                self.register['PC'] = self.labels[label]
+                if target is None:
+                    raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+                self.registers[self.PC] = target
 
         return BEQ_func
 
@@ -62,11 +72,14 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        target = self.resolve_label(label)
 
         # BGE label
         def BGE_func():
             if self.is_N_set() == self.is_V_set():
-                self.register['PC'] = self.labels[label]
+                if target is None:
+                    raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+                self.registers[self.PC] = target
 
         return BGE_func
 
@@ -79,11 +92,14 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        target = self.resolve_label(label)
 
         # BGT label
         def BGT_func():
             if (self.is_N_set() == self.is_V_set()) and not self.is_Z_set():
-                self.register['PC'] = self.labels[label]
+                if target is None:
+                    raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+                self.registers[self.PC] = target
 
         return BGT_func
 
@@ -96,11 +112,14 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        target = self.resolve_label(label)
 
         # BHI label
         def BHI_func():
             if self.is_C_set() and not self.is_Z_set():
-                self.register['PC'] = self.labels[label]
+                if target is None:
+                    raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+                self.registers[self.PC] = target
 
         return BHI_func
 
@@ -113,11 +132,14 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        target = self.resolve_label(label)
 
         # BHS label
         def BHS_func():
             if self.is_C_set():
-                self.register['PC'] = self.labels[label]
+                if target is None:
+                    raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+                self.registers[self.PC] = target
 
         return BHS_func
 
@@ -130,11 +152,14 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        target = self.resolve_label(label)
 
         # BLE label
         def BLE_func():
             if self.is_Z_set() or (self.is_N_set() != self.is_V_set()):
-                self.register['PC'] = self.labels[label]
+                if target is None:
+                    raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+                self.registers[self.PC] = target
 
         return BLE_func
 
@@ -147,11 +172,14 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        target = self.resolve_label(label)
 
         # BLO label
         def BLO_func():
             if not self.is_C_set():
-                self.register['PC'] = self.labels[label]
+                if target is None:
+                    raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+                self.registers[self.PC] = target
 
         return BLO_func
 
@@ -164,11 +192,14 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        target = self.resolve_label(label)
 
         # BLS label
         def BLS_func():
             if (not self.is_C_set()) or self.is_Z_set():
-                self.register['PC'] = self.labels[label]
+                if target is None:
+                    raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+                self.registers[self.PC] = target
 
         return BLS_func
 
@@ -181,11 +212,14 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        target = self.resolve_label(label)
 
         # BLT label
         def BLT_func():
             if self.is_N_set() != self.is_V_set():
-                self.register['PC'] = self.labels[label]
+                if target is None:
+                    raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+                self.registers[self.PC] = target
 
         return BLT_func
 
@@ -198,11 +232,14 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        target = self.resolve_label(label)
 
         # BMI label
         def BMI_func():
             if self.is_N_set():
-                self.register['PC'] = self.labels[label]
+                if target is None:
+                    raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+                self.registers[self.PC] = target
 
         return BMI_func
 
@@ -215,11 +252,14 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        target = self.resolve_label(label)
 
         # BNE label
         def BNE_func():
             if not self.is_Z_set():
-                self.register['PC'] = self.labels[label]
+                if target is None:
+                    raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+                self.registers[self.PC] = target
 
         return BNE_func
 
@@ -232,11 +272,14 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        target = self.resolve_label(label)
 
         # BPL label
         def BPL_func():
             if not self.is_N_set():
-                self.register['PC'] = self.labels[label]
+                if target is None:
+                    raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+                self.registers[self.PC] = target
 
         return BPL_func
 
@@ -249,11 +292,14 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        target = self.resolve_label(label)
 
         # BVC label
         def BVC_func():
             if not self.is_V_set():
-                self.register['PC'] = self.labels[label]
+                if target is None:
+                    raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+                self.registers[self.PC] = target
 
         return BVC_func
 
@@ -266,10 +312,13 @@ class ConditionalBranch(_Meta):
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(label_exists=(label,))
+        target = self.resolve_label(label)
 
         # BVS label
         def BVS_func():
             if self.is_V_set():
-                self.register['PC'] = self.labels[label]
+                if target is None:
+                    raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+                self.registers[self.PC] = target
 
         return BVS_func
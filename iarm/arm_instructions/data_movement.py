@@ -18,9 +18,10 @@ class DataMovement(_Meta):
         Rx, Ry = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(any_registers=(Rx, Ry))
+        Rx, Ry = self.check_register(Rx), self.check_register(Ry)
 
         def MOV_func():
-            self.register[Rx] = self.register[Ry]
+            self.registers[Rx] = self.registers[Ry]
 
         return MOV_func
 
@@ -36,21 +37,24 @@ class DataMovement(_Meta):
 
         if self.is_immediate(Rb):
             self.check_arguments(low_registers=[Ra], imm8=[Rb])
+            Ra = self.check_register(Ra)
+            imm = self.convert_to_integer(Rb[1:])
 
             def MOVS_func():
-                self.register[Ra] = self.convert_to_integer(Rb[1:])
+                self.registers[Ra] = imm
 
                 # Set N and Z status flags
-                self.set_NZ_flags(self.register[Ra])
+                self.set_NZ_flags(imm)
 
             return MOVS_func
         elif self.is_register(Rb):
             self.check_arguments(low_registers=(Ra, Rb))
+            Ra, Rb = self.check_register(Ra), self.check_register(Rb)
 
             def MOVS_func():
-                self.register[Ra] = self.register[Rb]
+                self.registers[Ra] = self.registers[Rb]
 
-                self.set_NZ_flags(self.register[Ra])
+                self.set_NZ_flags(self.registers[Ra])
 
             return MOVS_func
         else:
@@ -66,15 +70,22 @@ class DataMovement(_Meta):
         Rj, Rspecial = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(LR_or_general_purpose_registers=(Rj,), special_registers=(Rspecial,))
+        Rj = self.check_register(Rj)
+
+        # TODO add combination registers IEPSR, IAPSR, and EAPSR
+        # TODO needs to use APSR, IPSR, EPSR, IEPSR, IAPSR, EAPSR, PSR, MSP, PSP, PRIMASK, or CONTROL.
+        # http://infocenter.arm.com/help/index.jsp?topic=/com.arm.doc.dui0553a/CHDBIBGJ.html
+        if Rspecial == 'PSR':
+            def MRS_func():
+                self.update_APSR()
+                self.registers[Rj] = self.registers[self.APSR] | self.registers[self.IPSR] | self.registers[self.EPSR]
+        else:
+            Rspecial = self.register.index(Rspecial)
 
-        def MRS_func():
-            # TODO add combination registers IEPSR, IAPSR, and EAPSR
-            # TODO needs to use APSR, IPSR, EPSR, IEPSR, IAPSR, EAPSR, PSR, MSP, PSP, PRIMASK, or CONTROL.
-            # http://infocenter.arm.com/help/index.jsp?topic=/com.arm.doc.dui0553a/CHDBIBGJ.html
-            if Rspecial == 'PSR':
-                self.register[Rj] = self.register['APSR'] | self.register['IPSR'] | self.register['EPSR']
-            else:
-                self.register[Rj] = self.register[Rspecial]
+            def MRS_func():
+                if Rspecial == self.APSR:
+                    self.update_APSR()
+                self.registers[Rj] = self.registers[Rspecial]
 
         return MRS_func
 
@@ -83,11 +94,12 @@ class DataMovement(_Meta):
         MSR Rspecial, Rj
 
         Copy the value of Rj to Rspecial
-        Rspecial can be APSR, IPSR, or EPSR
+        Rspecial can be APSR, IPSR, EPSR, or PRIMASK
         """
         Rspecial, Rj = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(LR_or_general_purpose_registers=(Rj,), special_registers=(Rspecial,))
+        Rj = self.check_register(Rj)
 
         def MSR_func():
             # TODO add combination registers IEPSR, IAPSR, and EAPSR
@@ -95,7 +107,12 @@ class DataMovement(_Meta):
             # TODO update N Z C V flags
             if Rspecial in ('PSR', 'APSR'):
                 # PSR ignores writes to IPSR and EPSR
-                self.register['APSR'] = self.register[Rj]
+                self.discard_flags()
+                self.registers[self.APSR] = self.registers[Rj]
+            elif Rspecial == 'PRIMASK':
+                self.registers[self.PRIMASK] = self.registers[Rj] & 1
+                if self.nvic is not None:
+                    self.schedule(self.cycles, self.nvic.check)  # Unmasking can let a pending exception in
             else:
                 # Do nothing
                 pass
@@ -112,10 +129,11 @@ class DataMovement(_Meta):
         Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        Ra, Rb = self.check_register(Ra), self.check_register(Rb)
 
         def MVNS_func():
-            self.register[Ra] = ~self.register[Rb]
-            self.set_NZ_flags(self.register[Ra])
+            self.registers[Ra] = ~self.registers[Rb] & self._mask
+            self.set_NZ_flags(self.registers[Ra])
 
         return MVNS_func
 
@@ -128,12 +146,13 @@ class DataMovement(_Meta):
         Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        Ra, Rb = self.check_register(Ra), self.check_register(Rb)
 
         def REV_func():
-            self.register[Ra] = ((self.register[Rb] & 0xFF000000) >> 24) | \
-                                ((self.register[Rb] & 0x00FF0000) >> 8) | \
-                                ((self.register[Rb] & 0x0000FF00) << 8) | \
-                                ((self.register[Rb] & 0x000000FF) << 24)
+            self.registers[Ra] = ((self.registers[Rb] & 0xFF000000) >> 24) | \
+                                 ((self.registers[Rb] & 0x00FF0000) >> 8) | \
+                                 ((self.registers[Rb] & 0x0000FF00) << 8) | \
+                                 ((self.registers[Rb] & 0x000000FF) << 24)
 
         return REV_func
 
@@ -146,10 +165,11 @@ class DataMovement(_Meta):
         Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        Ra, Rb = self.check_register(Ra), self.check_register(Rb)
 
         def REV16_func():
-            self.register[Ra] = ((self.register[Rb] & 0xFF00FF00) >> 8) | \
-                                ((self.register[Rb] & 0x00FF00FF) << 8)
+            self.registers[Ra] = ((self.registers[Rb] & 0xFF00FF00) >> 8) | \
+                                 ((self.registers[Rb] & 0x00FF00FF) << 8)
 
         return REV16_func
 
@@ -160,15 +180,16 @@ class DataMovement(_Meta):
         Reverse the byte order in the lower half word in Rb and store the result in Ra.
         If the result of the result is signed, then sign extend
         """
-        Ra, Rb = self.get_two_parameters(r'\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*', params)
+        Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        Ra, Rb = self.check_register(Ra), self.check_register(Rb)
 
         def REVSH_func():
-            self.register[Ra] = ((self.register[Rb] & 0x0000FF00) >> 8) | \
-                                ((self.register[Rb] & 0x000000FF) << 8)
-            if self.register[Ra] & (1 << 15):
-                self.register[Ra] |= 0xFFFF0000
+            self.registers[Ra] = ((self.registers[Rb] & 0x0000FF00) >> 8) | \
+                                 ((self.registers[Rb] & 0x000000FF) << 8)
+            if self.registers[Ra] & (1 << 15):
+                self.registers[Ra] |= 0xFFFF0000
 
         return REVSH_func
 
@@ -178,15 +199,16 @@ class DataMovement(_Meta):
 
         Sign extend the byte in Rb and store the result in Ra
         """
-        Ra, Rb = self.get_two_parameters(r'\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*', params)
+        Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        Ra, Rb = self.check_register(Ra), self.check_register(Rb)
 
         def SXTB_func():
-            if self.register[Rb] & (1 << 7):
-                self.register[Ra] = 0xFFFFFF00 + (self.register[Rb] & 0xFF)
+            if self.registers[Rb] & (1 << 7):
+                self.registers[Ra] = 0xFFFFFF00 + (self.registers[Rb] & 0xFF)
             else:
-                self.register[Ra] = (self.register[Rb] & 0xFF)
+                self.registers[Ra] = (self.registers[Rb] & 0xFF)
 
         return SXTB_func
 
@@ -196,15 +218,16 @@ class DataMovement(_Meta):
 
         Sign extend the half word in Rb and store the result in Ra
         """
-        Ra, Rb = self.get_two_parameters(r'\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*', params)
+        Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        Ra, Rb = self.check_register(Ra), self.check_register(Rb)
 
         def SXTH_func():
-            if self.register[Rb] & (1 << 15):
-                self.register[Ra] = 0xFFFF0000 + (self.register[Rb] & 0xFFFF)
+            if self.registers[Rb] & (1 << 15):
+                self.registers[Ra] = 0xFFFF0000 + (self.registers[Rb] & 0xFFFF)
             else:
-                self.register[Ra] = (self.register[Rb] & 0xFFFF)
+                self.registers[Ra] = (self.registers[Rb] & 0xFFFF)
 
         return SXTH_func
 
@@ -214,12 +237,13 @@ class DataMovement(_Meta):
 
         Zero extend the byte in Rb and store the result in Ra
         """
-        Ra, Rb = self.get_two_parameters(r'\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*', params)
+        Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        Ra, Rb = self.check_register(Ra), self.check_register(Rb)
 
         def UXTB_func():
-            self.register[Ra] = (self.register[Rb] & 0xFF)
+            self.registers[Ra] = (self.registers[Rb] & 0xFF)
 
         return UXTB_func
 
@@ -229,11 +253,12 @@ class DataMovement(_Meta):
 
         Zero extend the half word in Rb and store the result in Ra
         """
-        Ra, Rb = self.get_two_parameters(r'\s*([^\s,]*),\s*([^\s,]*)(,\s*[^\s,]*)*\s*', params)
+        Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        Ra, Rb = self.check_register(Ra), self.check_register(Rb)
 
         def UXTH_func():
-            self.register[Ra] = (self.register[Rb] & 0xFFFF)
+            self.registers[Ra] = (self.registers[Rb] & 0xFFFF)
 
         return UXTH_func
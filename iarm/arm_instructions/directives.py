@@ -1,7 +1,55 @@
 import iarm.exceptions
+import iarm.memory
 from ._meta import _Meta
 import warnings
 import inspect
+import types
+
+
+class Equates(dict):
+    """
+    The equates, with a version that changes when they do
+
+    Instructions are decoded with the equates, so decoded instructions are
+    cached against the version (see Arm.decode). Every change gives a new version,
+    and having no equates is always version 0.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._version = 1  # Counts changes, only used while there are equates
+
+    @property
+    def version(self):
+        return self._version if self else 0
+
+    # Anything that changes the equates moves on to the next version
+    def __setitem__(self, key, value):
+        self._version += 1
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self._version += 1
+        super().__delitem__(key)
+
+    def clear(self):
+        self._version += 1
+        super().clear()
+
+    def pop(self, *args):
+        self._version += 1
+        return super().pop(*args)
+
+    def popitem(self):
+        self._version += 1
+        return super().popitem()
+
+    def setdefault(self, key, default=None):
+        self._version += 1
+        return super().setdefault(key, default)
+
+    def update(self, *args, **kwargs):
+        self._version += 1
+        super().update(*args, **kwargs)
 
 
 class Directives(_Meta):
@@ -11,20 +59,71 @@ class Directives(_Meta):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.equates = {}
-        self.directives = {}
+        self.equates = Equates()
+        self.directives = {name: types.MethodType(func, self) for name, func in self._directive_functions.items()}
         self.space_pointer = 0  # Refers to a place in memory
+        self.sram_pointer = None  # Where SPACE allocates from when memory has an SRAM region, found when first needed
         self.title = ""
+        self._constants = []  # (address, bytes) written by DCD, DCH, and DCB, put back when the program is kept on reset
 
-        # Get all instructions and rules
-        for obj in inspect.getmembers(self, predicate=inspect.ismethod):
-            # Is returned in the form of (method name, method)
-            name = obj[0]
-            method = obj[1]
-
+    @classmethod
+    def _build_tables(cls):
+        super()._build_tables()
+        cls._directive_functions = {}
+        for name, func in inspect.getmembers(cls, predicate=inspect.isfunction):
             # Directives are defiined by starting with 'directive_'
             if str.startswith(name, 'directive_'):
-                self.directives[name[len('directive_'):]] = method
+                cls._directive_functions[name[len('directive_'):]] = func
+
+    def reset(self, keep_program=False):
+        super().reset(keep_program)
+        self.discard_flags()
+        if keep_program:
+            for address, data in self._constants:
+                self.memory.load(address, data)
+        else:
+            # Equates and the space pointer were used to decode the program, keep them with it.
+            # The same equates are kept and cleared so their version keeps counting up past what was cached
+            self.equates.clear()
+            self.space_pointer = 0
+            self.sram_pointer = None
+            self.title = ""
+            self._constants = []
+
+    def fork(self):
+        other = super().fork()
+        other.equates = Equates(self.equates)
+        other._constants = list(self._constants)
+        other.directives = {name: types.MethodType(func, other) for name, func in self._directive_functions.items()}
+        return other
+
+    def _load_constant(self, data):
+        """
+        Put a constant in memory at the space pointer, even if that memory is read only
+        :param data: The bytes of the constant
+        :return:
+        """
+        self.memory.load(self.space_pointer, data)
+        self._constants.append((self.space_pointer, data))
+
+    def _allocate_space(self, size):
+        """
+        Find room for SPACE, which the program writes to
+        If memory is a map with an SRAM region (see iarm.memory.cortex_m0_map) the room is taken from SRAM,
+        so constants can stay in read only flash. Otherwise it comes from the space pointer, which the constants use as well.
+        :param size: How many bytes to allocate
+        :return: The address of the first byte
+        """
+        if self.sram_pointer is None:
+            try:
+                self.sram_pointer = self.memory.named('sram').start
+            except (AttributeError, KeyError):
+                address = self.space_pointer
+                self.space_pointer += size
+                return address
+        address = self.sram_pointer
+        self.sram_pointer += size
+        return address
 
     def directive_TTL(self, label, params):
         self.title = params
@@ -37,14 +136,14 @@ class Directives(_Meta):
         """
         label   EQU value
 
-        Set an equate. Equates are used as text replacement and will replace the label with the value set
+        Set an equate. An operand that is the label (or #label, or =label) is replaced with the value set
+        The value can be another equate
         """
         # TODO do a check on params
-        # TODO figure out how to do equates
         # TODO can equates work on other things besides parameters (like instructions?)
         # TODO equates can use labels + offsets
         # TODO check if the equate label exists as a label already
-        self.equates[label] = params
+        self.equates[label] = self.equates.get(params.upper(), params)
 
     def directive_AREA(self, label, params):
         # TODO do something
@@ -64,7 +163,7 @@ class Directives(_Meta):
         """
         label   SPACE num
 
-        Allocate space on the stack. `num` is the number of bytes to allocate
+        Allocate space in memory the program can write to. `num` is the number of bytes to allocate
         """
         # TODO allow equations
 
@@ -75,10 +174,9 @@ class Directives(_Meta):
             warnings.warn("Unknown parameters; {}".format(params))
             return
 
-        self.labels[label] = self.space_pointer
         if params in self.equates:
             params = self.equates[params]
-        self.space_pointer += self.convert_to_integer(params)
+        self.labels[label] = self._allocate_space(self.convert_to_integer(params))
 
     def directive_END(self, label, params):
         """
@@ -95,7 +193,6 @@ class Directives(_Meta):
 
         Allocate a word space in read only memory for the value or list of values
         """
-        # TODO make this read only
         # TODO check for param size
         # TODO can take any length comma separated values (VAL DCD 1, 0x2, 3, 4
 
@@ -113,8 +210,7 @@ class Directives(_Meta):
         self.labels[label] = self.space_pointer
         if params in self.equates:
             params = self.equates[params]
-        for i in range(4):
-            self.memory[self.space_pointer + i] = (self.convert_to_integer(params) >> (8*i)) & 0xFF
+        self._load_constant(iarm.memory.WORD.pack(self.convert_to_integer(params) & 0xFFFFFFFF))
         self.space_pointer += 4
 
     def directive_DCH(self, label, params):
@@ -123,7 +219,6 @@ class Directives(_Meta):
 
         Allocate a half word space in read only memory for the value or list of values
         """
-        # TODO make this read only
         # TODO check for word size
 
         # Align address
@@ -132,8 +227,7 @@ class Directives(_Meta):
         self.labels[label] = self.space_pointer
         if params in self.equates:
             params = self.equates[params]
-        for i in range(2):
-            self.memory[self.space_pointer + i] = (self.convert_to_integer(params) >> (8 * i)) & 0xFF
+        self._load_constant(iarm.memory.HALFWORD.pack(self.convert_to_integer(params) & 0xFFFF))
         self.space_pointer += 2
 
     def directive_DCB(self, label, params):
@@ -142,12 +236,11 @@ class Directives(_Meta):
 
         Allocate a byte space in read only memory for the value or list of values
         """
-        # TODO make this read only
         # TODO check for byte size
         self.labels[label] = self.space_pointer
         if params in self.equates:
             params = self.equates[params]
-        self.memory[self.space_pointer] = self.convert_to_integer(params) & 0xFF
+        self._load_constant(bytes((self.convert_to_integer(params) & 0xFF,)))
         self.space_pointer += 1
 
     def directive_OPT(self, label, params):
@@ -24,11 +24,12 @@ class Logic(_Meta):
 
         self.check_arguments(low_registers=(Ra, Rc))
         self.match_first_two_parameters(Ra, Rb)
+        Ra, Rc = self.check_register(Ra), self.check_register(Rc)
 
         # ANDS Ra, Ra, Rb
         def ANDS_func():
-            self.register[Ra] = self.register[Ra] & self.register[Rc]
-            self.set_NZ_flags(self.register[Ra])
+            self.registers[Ra] = self.registers[Ra] & self.registers[Rc]
+            self.set_NZ_flags(self.registers[Ra])
 
         return ANDS_func
 
@@ -53,11 +54,12 @@ class Logic(_Meta):
 
         self.check_arguments(low_registers=(Ra, Rc))
         self.match_first_two_parameters(Ra, Rb)
+        Ra, Rc = self.check_register(Ra), self.check_register(Rc)
 
         # BICS Ra, Ra, Rb
         def BICS_func():
-            self.register[Ra] = self.register[Ra] & (~self.register[Rc])
-            self.set_NZ_flags(self.register[Ra])
+            self.registers[Ra] = self.registers[Ra] & ~self.registers[Rc]
+            self.set_NZ_flags(self.registers[Ra])
 
         return BICS_func
 
@@ -82,11 +84,12 @@ class Logic(_Meta):
 
         self.check_arguments(low_registers=(Ra, Rc))
         self.match_first_two_parameters(Ra, Rb)
+        Ra, Rc = self.check_register(Ra), self.check_register(Rc)
 
         # EORS Ra, Ra, Rb
         def EORS_func():
-            self.register[Ra] = self.register[Ra] ^ self.register[Rc]
-            self.set_NZ_flags(self.register[Ra])
+            self.registers[Ra] = self.registers[Ra] ^ self.registers[Rc]
+            self.set_NZ_flags(self.registers[Ra])
 
         return EORS_func
 
@@ -111,11 +114,12 @@ class Logic(_Meta):
 
         self.check_arguments(low_registers=(Ra, Rc))
         self.match_first_two_parameters(Ra, Rb)
+        Ra, Rc = self.check_register(Ra), self.check_register(Rc)
 
         # ORRS Ra, Ra, Rb
         def ORRS_func():
-            self.register[Ra] = self.register[Ra] | self.register[Rc]
-            self.set_NZ_flags(self.register[Ra])
+            self.registers[Ra] = self.registers[Ra] | self.registers[Rc]
+            self.set_NZ_flags(self.registers[Ra])
 
         return ORRS_func
 
@@ -130,9 +134,10 @@ class Logic(_Meta):
         Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_COMMA_SEPARATED, params)
 
         self.check_arguments(low_registers=(Ra, Rb))
+        Ra, Rb = self.check_register(Ra), self.check_register(Rb)
 
         def TST_func():
-            result = self.register[Ra] & self.register[Rb]
+            result = self.registers[Ra] & self.registers[Rb]
             self.set_NZ_flags(result)
 
         return TST_func
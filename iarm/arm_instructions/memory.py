@@ -4,8 +4,6 @@ from ._meta import _Meta
 
 
 class Memory(_Meta):
-    THREE_PARAMETER_WITH_BRACKETS = r'\s*([^\s,]*),\s*\[([^\s,]*),\s*([^\s,]*)\](,\s*[^\s,]*)*\s*'
-
     def ADR(self, params):
         """
         ADR Ra, [PC, #imm10_4]
@@ -23,18 +21,24 @@ class Memory(_Meta):
 
             # TODO the address must be within 1020 bytes of current PC
             self.check_arguments(low_registers=(Ra,), label_exists=(label,))
+            Ra = self.check_register(Ra)
+            address = self.resolve_label(label)
 
             def ADR_func():
-                self.register[Ra] = self.labels[label]  # TODO is this correct?
+                if address is None:
+                    raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+                self.registers[Ra] = address  # TODO is this correct?
 
             return ADR_func
 
         self.check_arguments(low_registers=(Ra,), imm10_4=(Rc,))
         if Rb != 'PC':
             raise iarm.exceptions.IarmError("Second position argument is not PC: {}".format(Rb))
+        Ra = self.check_register(Ra)
+        imm = self.convert_to_integer(Rc[1:])
 
         def ADR_func():
-            self.register[Ra] = self.register[Rb] + self.convert_to_integer(Rc[1:])
+            self.registers[Ra] = (self.registers[self.PC] + imm) & self._mask
 
         return ADR_func
 
@@ -46,18 +50,18 @@ class Memory(_Meta):
         """
         # TODO what registers can be stored?
         # TODO add the load multiple with Ra in RLoList
-        Ra, RLoList = self.get_two_parameters(r'\s*([^\s,]*)!,\s*{(.*)}(.*)', params).split(',')
+        Ra, RLoList = self.get_two_parameters(r'\s*([^\s,]*)!,\s*{(.*)}(.*)', params)
         RLoList = RLoList.split(',')
         RLoList = [i.strip() for i in RLoList]
 
         self.check_arguments(low_registers=[Ra] + RLoList)
+        Ra = self.check_register(Ra)
+        RLoList = [self.check_register(i) for i in RLoList]
 
         def LDM_func():
             for i in range(len(RLoList)):
-                for j in range(4):
-                    self.memory[self.register[Ra] + 4*i + j] = ((self.register[RLoList[i]] >> (8 * j)) & 0xFF)
-                    self.register[RLoList[i]] = self.memory[self.register[Ra] + (4 * i) + j]
-            self.register[Ra] += 4*len(RLoList)
+                self.registers[RLoList[i]] = self.memory.read_word(self.registers[Ra] + (4 * i))
+            self.registers[Ra] = (self.registers[Ra] + 4*len(RLoList)) & self._mask
 
         return LDM_func
 
@@ -87,7 +91,7 @@ class Memory(_Meta):
                 # TODO while ARMv6-M (Cortex-M0+) is a Von Neumann architeture. Instructions will not be decompiled
                 self.check_arguments(low_registers=(Ra,))
                 if label_name in self.labels:
-                    label_value = self.labels[label_name]
+                    label_value = self.resolve_label(label_name)
                 elif label_name in self.equates:
                     label_value = self.equates[label_name]
                 else:
@@ -95,7 +99,7 @@ class Memory(_Meta):
                         label_value = int(self.convert_to_integer(label_name))
                     except ValueError:
                         warnings.warn(iarm.exceptions.LabelDoesNotExist("Label `{}` does not exist or is not a parsable number. If it is a label, make sure it exists before running".format(label_name)))
-                        label_value = None
+                        label_value = self.resolve_label(label_name)
 
                 if label_value is not None and int(label_value) % 4 != 0:
                     # Make sure we are word aligned
@@ -106,54 +110,31 @@ class Memory(_Meta):
                 if Rb == 'SP' or Rb == 'R13':
                     self.check_arguments(low_registers=(Ra,))
                 else:
-                    self.check_arguments(low_registers=(Ra, label_name))
+                    self.check_arguments(low_registers=(Ra, Rb))
+                Ra, Rb = self.check_register(Ra), self.check_register(Rb)
 
                 def LDR_func():
-                    if self.memory[Rb] % 4 != 0:
+                    if self.registers[Rb] % 4 != 0:
                         raise iarm.exceptions.HardFault(
-                            "Memory access not word aligned; Register: {}  Immediate: {}".format(self.register[Rb],
-                                                                                                 self.convert_to_integer(
-                                                                                                     Rc[1:])))
-                    self.register[Ra] = 0
-                    for i in range(4):
-                        self.register[Ra] |= (self.memory[self.register[Rb] + i] << (8 * i))
+                            "Memory access not word aligned; Register: {}".format(self.registers[Rb]))
+                    self.registers[Ra] = self.memory.read_word(self.registers[Rb])
                 return LDR_func
             else:
                 self.check_arguments(low_registers=(Ra,), label_exists=(label_name,))
-                try:
-                    label_value = self.labels[label_name]
+                label_value = self.resolve_label(label_name)
+                if label_value is not None:
                     if label_value >= 1024:
                         raise iarm.exceptions.IarmError("Label {} has value {} and is greater than 1020".format(label_name, label_value))
                     if label_value % 4 != 0:
                         raise iarm.exceptions.IarmError("Label {} has value {} and is not word aligned".format(label_name, label_value))
-                except KeyError:
-                    # Label doesn't exist, nothing we can do about that except maybe raise an exception now,
-                    # But we're avoiding that elsewhere, might as well avoid it here too
-                    pass
+
+            Ra = self.check_register(Ra)
 
             def LDR_func():
-                nonlocal label_value
-                # Since we can get a label that didn't exist in the creation step, We need to check it here
-                # TODO is there a way for label_value to not exist?
+                # The label is resolved when linking, if it is still None then it never got allocated
                 if label_value is None:
-                    # Try to get it again
-                    if label_name in self.labels:
-                        label_value = self.labels[label_name]
-                    elif label_name in self.equates:
-                        label_value = self.equates[label_name]
-
-                    # If it is still None, then it never got allocated
-                    if label_value is None:
-                        raise iarm.exceptions.IarmError("label `{}` does not exist. Was space allocated?".format(label_name))
-                    # It does exist, make sure its word aligned
-                    if int(label_value) % 4 != 0:
-                        raise iarm.exceptions.IarmError("Memory access not word aligned; Immediate: {}".format(int(label_value)))
-
-                try:
-                    self.register[Ra] = int(label_value)
-                except ValueError:
-                    # TODO Can we even get to this path now?
-                    self.register[Ra] = self.labels[label_name]
+                    raise iarm.exceptions.IarmError("label `{}` does not exist. Was space allocated?".format(label_name))
+                self.registers[Ra] = int(label_value)
 
             return LDR_func
 
@@ -162,27 +143,27 @@ class Memory(_Meta):
                 self.check_arguments(low_registers=(Ra,), imm10_4=(Rc,))
             else:
                 self.check_arguments(low_registers=(Ra, Rb), imm7_4=(Rc,))
+            Ra, Rb = self.check_register(Ra), self.check_register(Rb)
+            imm = self.convert_to_integer(Rc[1:])
 
             def LDR_func():
                 # TODO does memory read up?
-                if (self.register[Rb] + self.convert_to_integer(Rc[1:])) % 4 != 0:
-                    raise iarm.exceptions.HardFault("Memory access not word aligned; Register: {}  Immediate: {}".format(self.register[Rb], self.convert_to_integer(Rc[1:])))
-                self.register[Ra] = 0
-                for i in range(4):
-                    self.register[Ra] |= (self.memory[self.register[Rb] + self.convert_to_integer(Rc[1:]) + i] << (8 * i))
+                address = self.registers[Rb] + imm
+                if address % 4 != 0:
+                    raise iarm.exceptions.HardFault("Memory access not word aligned; Register: {}  Immediate: {}".format(self.registers[Rb], imm))
+                self.registers[Ra] = self.memory.read_word(address)
         else:
             self.check_arguments(low_registers=(Ra, Rb, Rc))
+            Ra, Rb, Rc = self.check_register(Ra), self.check_register(Rb), self.check_register(Rc)
 
             def LDR_func():
                 # TODO does memory read up?
-                if (self.register[Rb] + self.register[Rc]) % 4 != 0:
+                address = self.registers[Rb] + self.registers[Rc]
+                if address % 4 != 0:
                     raise iarm.exceptions.HardFault(
-                        "Memory access not word aligned; Register: {}  Immediate: {}".format(self.register[Rb],
-                                                                                             self.convert_to_integer(
-                                                                                                 Rc[1:])))
-                self.register[Ra] = 0
-                for i in range(4):
-                    self.register[Ra] |= (self.memory[self.register[Rb] + self.register[Rc] + i] << (8 * i))
+                        "Memory access not word aligned; Register: {}  Register: {}".format(self.registers[Rb],
+                                                                                            self.registers[Rc]))
+                self.registers[Ra] = self.memory.read_word(address)
 
         return LDR_func
 
@@ -198,19 +179,22 @@ class Memory(_Meta):
             Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_WITH_BRACKETS, params)
         except iarm.exceptions.ParsingError:
             # LDRB Rn, [Rk] translates to an offset of zero
-            Ra, Rb = self.get_two_parameters(r'\s*([^\s,]*),\s*\[([^\s,]*)\](,\s*[^\s,]*)*\s*', params)
+            Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_WITH_BRACKETS, params)
             Rc = '#0'
 
         if self.is_immediate(Rc):
             self.check_arguments(low_registers=(Ra, Rb), imm5=(Rc,))
+            Ra, Rb = self.check_register(Ra), self.check_register(Rb)
+            imm = self.convert_to_integer(Rc[1:])
 
             def LDRB_func():
-                self.register[Ra] = self.memory[self.register[Rb] + self.convert_to_integer(Rc[1:])]
+                self.registers[Ra] = self.memory[self.registers[Rb] + imm]
         else:
             self.check_arguments(low_registers=(Ra, Rb, Rc))
+            Ra, Rb, Rc = self.check_register(Ra), self.check_register(Rb), self.check_register(Rc)
 
             def LDRB_func():
-                self.register[Ra] = self.memory[self.register[Rb] + self.register[Rc]]
+                self.registers[Ra] = self.memory[self.registers[Rb] + self.registers[Rc]]
 
         return LDRB_func
 
@@ -226,34 +210,33 @@ class Memory(_Meta):
             Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_WITH_BRACKETS, params)
         except iarm.exceptions.ParsingError:
             # LDRB Rn, [Rk] translates to an offset of zero
-            Ra, Rb = self.get_two_parameters(r'\s*([^\s,]*),\s*\[([^\s,]*)\](,\s*[^\s,]*)*\s*', params)
+            Ra, Rb = self.get_two_parameters(self.TWO_PARAMETER_WITH_BRACKETS, params)
             Rc = '#0'
 
         if self.is_immediate(Rc):
             self.check_arguments(low_registers=(Ra, Rb), imm6_2=(Rc,))
+            Ra, Rb = self.check_register(Ra), self.check_register(Rb)
+            imm = self.convert_to_integer(Rc[1:])
 
             def LDRH_func():
                 # TODO does memory read up?
-                if (self.register[Rb]) % 2 != 0:
+                if (self.registers[Rb]) % 2 != 0:
                     raise iarm.exceptions.HardFault(
-                        "Memory access not half word aligned; Register: {}  Immediate: {}".format(self.register[Rb],
-                                                                                                  self.convert_to_integer(
-                                                                                                      Rc[1:])))
-                self.register[Ra] = 0
-                for i in range(2):
-                    self.register[Ra] |= (self.memory[self.register[Rb] + self.convert_to_integer(Rc[1:]) + i] << (8 * i))
+                        "Memory access not half word aligned; Register: {}  Immediate: {}".format(self.registers[Rb],
+                                                                                                  imm))
+                self.registers[Ra] = self.memory.read_halfword(self.registers[Rb] + imm)
         else:
             self.check_arguments(low_registers=(Ra, Rb, Rc))
+            Ra, Rb, Rc = self.check_register(Ra), self.check_register(Rb), self.check_register(Rc)
 
             def LDRH_func():
                 # TODO does memory read up?
-                if (self.register[Rb] + self.register[Rc]) % 2 != 0:
+                address = self.registers[Rb] + self.registers[Rc]
+                if address % 2 != 0:
                     raise iarm.exceptions.HardFault(
-                        "Memory access not half word aligned; Register: {}  Immediate: {}".format(self.register[Rb],
-                                                                                                  self.register[Rc]))
-                self.register[Ra] = 0
-                for i in range(2):
-                    self.register[Ra] |= (self.memory[self.register[Rb] + self.register[Rc] + i] << (8 * i))
+                        "Memory access not half word aligned; Register: {}  Immediate: {}".format(self.registers[Rb],
+                                                                                                  self.registers[Rc]))
+                self.registers[Ra] = self.memory.read_halfword(address)
 
         return LDRH_func
 
@@ -268,13 +251,14 @@ class Memory(_Meta):
         Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_WITH_BRACKETS, params)
 
         self.check_arguments(low_registers=(Ra, Rb, Rc))
+        Ra, Rb, Rc = self.check_register(Ra), self.check_register(Rb), self.check_register(Rc)
 
         def LDRSB_func():
             # TODO does memory read up?
-            self.register[Ra] = 0
-            self.register[Ra] |= self.memory[self.register[Rb] + self.register[Rc]]
-            if self.register[Ra] & (1 << 7):
-                self.register[Ra] |= (0xFFFFFF << 8)
+            value = self.memory[self.registers[Rb] + self.registers[Rc]]
+            if value & (1 << 7):
+                value |= (0xFFFFFF << 8)
+            self.registers[Ra] = value
 
         return LDRSB_func
 
@@ -289,18 +273,19 @@ class Memory(_Meta):
         Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_WITH_BRACKETS, params)
 
         self.check_arguments(low_registers=(Ra, Rb, Rc))
+        Ra, Rb, Rc = self.check_register(Ra), self.check_register(Rb), self.check_register(Rc)
 
         def LDRSH_func():
             # TODO does memory read up?
-            if (self.register[Rb] + self.register[Rc]) % 2 != 0:
+            address = self.registers[Rb] + self.registers[Rc]
+            if address % 2 != 0:
                 raise iarm.exceptions.HardFault(
-                    "Memory access not half word aligned\nR{}: {}\nR{}: {}".format(Rb, self.register[Rb],
-                                                                                   Rc, self.register[Rc]))
-            self.register[Ra] = 0
-            for i in range(2):
-                self.register[Ra] |= (self.memory[self.register[Rb] + self.register[Rc] + i] << (8 * i))
-            if self.register[Ra] & (1 << 15):
-                self.register[Ra] |= (0xFFFF << 16)
+                    "Memory access not half word aligned\nR{}: {}\nR{}: {}".format(Rb, self.registers[Rb],
+                                                                                   Rc, self.registers[Rc]))
+            value = self.memory.read_halfword(address)
+            if value & (1 << 15):
+                value |= (0xFFFF << 16)
+            self.registers[Ra] = value
 
         return LDRSH_func
 
@@ -318,18 +303,12 @@ class Memory(_Meta):
         # TODO PUSH should reverse the list, not POP
         RPopList = self.get_one_parameter(r'\s*{(.*)}(.*)', params).split(',')
         RPopList.reverse()
-        RPopList = [i.strip() for i in RPopList]
+        RPopList = [self.check_register(i.strip()) for i in RPopList]
 
         def POP_func():
             for register in RPopList:
-                # Get 4 bytes
-                value = 0
-                for i in range(4):
-                    # TODO use memory width instead of constants
-                    value |= self.memory[self.register['SP'] + i] << (8 * i)
-
-                self.register[register] = value
-                self.register['SP'] += 4
+                self.registers[register] = self.memory.read_word(self.registers[self.SP])
+                self.registers[self.SP] = (self.registers[self.SP] + 4) & self._mask
 
         return POP_func
 
@@ -343,16 +322,12 @@ class Memory(_Meta):
         # TODO what registers are allowed to PUSH to? Low registers and LR
         # TODO PUSH should reverse the list, not POP
         RPushList = self.get_one_parameter(r'\s*{(.*)}(.*)', params).split(',')
-        RPushList = [i.strip() for i in RPushList]
-        # TODO should we make sure the register exists? probably not
+        RPushList = [self.check_register(i.strip()) for i in RPushList]
 
         def PUSH_func():
             for register in RPushList:
-                self.register['SP'] -= 4
-
-                for i in range(4):
-                    # TODO is this the same as with POP?
-                    self.memory[self.register['SP'] + i] = ((self.register[register] >> (8 * i)) & 0xFF)
+                self.registers[self.SP] = (self.registers[self.SP] - 4) & self._mask
+                self.memory.write_word(self.registers[self.SP], self.registers[register])
 
         return PUSH_func
 
@@ -363,17 +338,18 @@ class Memory(_Meta):
         Store multiple registers into memory
         """
         # TODO what registers can be stored?
-        Ra, RLoList = self.get_two_parameters(r'\s*([^\s,]*)!,\s*{(.*)}(.*)', params).split(',')
+        Ra, RLoList = self.get_two_parameters(r'\s*([^\s,]*)!,\s*{(.*)}(.*)', params)
         RLoList = RLoList.split(',')
         RLoList = [i.strip() for i in RLoList]
 
         self.check_arguments(low_registers=[Ra] + RLoList)
+        Ra = self.check_register(Ra)
+        RLoList = [self.check_register(i) for i in RLoList]
 
         def STM_func():
             for i in range(len(RLoList)):
-                for j in range(4):
-                    self.memory[self.register[Ra] + 4*i + j] = ((self.register[RLoList[i]] >> (8 * j)) & 0xFF)
-            self.register[Ra] += 4*len(RLoList)
+                self.memory.write_word(self.registers[Ra] + 4*i, self.registers[RLoList[i]])
+            self.registers[Ra] = (self.registers[Ra] + 4*len(RLoList)) & self._mask
 
         return STM_func
 
@@ -393,16 +369,17 @@ class Memory(_Meta):
                 self.check_arguments(low_registers=(Ra,), imm10_4=(Rc,))
             else:
                 self.check_arguments(low_registers=(Ra, Rb), imm7_4=(Rc,))
+            Ra, Rb = self.check_register(Ra), self.check_register(Rb)
+            imm = self.convert_to_integer(Rc[1:])
 
             def STR_func():
-                for i in range(4):
-                    self.memory[self.register[Rb] + self.convert_to_integer(Rc[1:]) + i] = ((self.register[Ra] >> (8 * i)) & 0xFF)
+                self.memory.write_word(self.registers[Rb] + imm, self.registers[Ra])
         else:
             self.check_arguments(low_registers=(Ra, Rb, Rc))
+            Ra, Rb, Rc = self.check_register(Ra), self.check_register(Rb), self.check_register(Rc)
 
             def STR_func():
-                for i in range(4):
-                    self.memory[self.register[Rb] + self.register[Rc] + i] = ((self.register[Ra] >> (8 * i)) & 0xFF)
+                self.memory.write_word(self.registers[Rb] + self.registers[Rc], self.registers[Ra])
 
         return STR_func
 
@@ -418,14 +395,17 @@ class Memory(_Meta):
 
         if self.is_immediate(Rc):
             self.check_arguments(low_registers=(Ra, Rb), imm5=(Rc,))
+            Ra, Rb = self.check_register(Ra), self.check_register(Rb)
+            imm = self.convert_to_integer(Rc[1:])
 
             def STRB_func():
-                self.memory[self.register[Rb] + self.convert_to_integer(Rc[1:])] = (self.register[Ra] & 0xFF)
+                self.memory[self.registers[Rb] + imm] = (self.registers[Ra] & 0xFF)
         else:
             self.check_arguments(low_registers=(Ra, Rb, Rc))
+            Ra, Rb, Rc = self.check_register(Ra), self.check_register(Rb), self.check_register(Rc)
 
             def STRB_func():
-                self.memory[self.register[Rb] + self.register[Rc]] = (self.register[Ra] & 0xFF)
+                self.memory[self.registers[Rb] + self.registers[Rc]] = (self.registers[Ra] & 0xFF)
 
         return STRB_func
 
@@ -441,15 +421,16 @@ class Memory(_Meta):
 
         if self.is_immediate(Rc):
             self.check_arguments(low_registers=(Ra, Rb), imm5=(Rc,))
+            Ra, Rb = self.check_register(Ra), self.check_register(Rb)
+            imm = self.convert_to_integer(Rc[1:])
 
             def STRH_func():
-                for i in range(2):
-                    self.memory[self.register[Rb] + self.convert_to_integer(Rc[1:]) + i] = ((self.register[Ra] >> (8 * i)) & 0xFF)
+                self.memory.write_halfword(self.registers[Rb] + imm, self.registers[Ra])
         else:
             self.check_arguments(low_registers=(Ra, Rb, Rc))
+            Ra, Rb, Rc = self.check_register(Ra), self.check_register(Rb), self.check_register(Rc)
 
             def STRH_func():
-                for i in range(2):
-                    self.memory[self.register[Rb] + self.register[Rc] + i] = ((self.register[Ra] >> (8 * i)) & 0xFF)
+                self.memory.write_halfword(self.registers[Rb] + self.registers[Rc], self.registers[Ra])
 
         return STRH_func
@@ -1,16 +1,60 @@
 import iarm.exceptions
+import iarm.semihosting
 from ._meta import _Meta
 
 
 class Misc(_Meta):
-    def BKPT(self):
-        raise iarm.exceptions.NotImplementedError
+    def BKPT(self, params):
+        """
+        BKPT #imm8
 
-    def CPSID(self):
-        raise iarm.exceptions.NotImplementedError
+        Breakpoint, `BKPT #0xAB` is a semihosting call (see iarm.semihosting)
+        Any other breakpoint is a HardFault, as there is no debugger to stop for it
+        """
+        imm = self.get_one_parameter(self.ONE_PARAMETER, params)
+        imm = self.check_immediate_unsigned_value(imm, 8)
 
-    def CPSIE(self):
-        raise iarm.exceptions.NotImplementedError
+        if imm == iarm.semihosting.BREAKPOINT:
+            def BKPT_func():
+                self.semihosting.call(self)
+        else:
+            def BKPT_func():
+                raise iarm.exceptions.HardFault("Breakpoint {} with no debugger attached".format(imm))
+
+        return BKPT_func
+
+    def CPSID(self, params):
+        """
+        CPSID i
+
+        Mask interrupts by setting PRIMASK, only NMI and HardFault can be taken
+        """
+        self._check_interrupt_flag(params)
+
+        def CPSID_func():
+            self.registers[self.PRIMASK] = 1
+
+        return CPSID_func
+
+    def CPSIE(self, params):
+        """
+        CPSIE i
+
+        Unmask interrupts by clearing PRIMASK
+        """
+        self._check_interrupt_flag(params)
+
+        def CPSIE_func():
+            self.registers[self.PRIMASK] = 0
+            if self.nvic is not None:
+                self.schedule(self.cycles, self.nvic.check)  # Anything that was held off is taken after this
+
+        return CPSIE_func
+
+    def _check_interrupt_flag(self, params):
+        flag = self.get_one_parameter(self.ONE_PARAMETER, params)
+        if flag != 'I':
+            raise iarm.exceptions.RuleError("Only the i flag can be changed, not {}".format(flag))
 
     def CMB(self):
         raise iarm.exceptions.NotImplementedError
@@ -21,14 +65,65 @@ class Misc(_Meta):
     def ISB(self):
         raise iarm.exceptions.NotImplementedError
 
-    def SEV(self):
-        raise iarm.exceptions.NotImplementedError
+    def SEV(self, params):
+        """
+        SEV
 
-    def SVC(self):
-        raise iarm.exceptions.NotImplementedError
+        Send an event, sets the event register so the next WFE does not wait
+        """
+        # TODO check for no parameters
+        def SEV_func():
+            self.event_register = True
 
-    def WFE(self):
-        raise iarm.exceptions.NotImplementedError
+        return SEV_func
 
-    def WFI(self):
-        raise iarm.exceptions.NotImplementedError
+    def SVC(self, params):
+        """
+        SVC #imm8
+
+        Call the supervisor, pends the SVCall exception so SVC_Handler runs after this instruction
+        With no NVIC attached, `SVC #0xAB` is a semihosting call like `BKPT #0xAB`
+        """
+        # TODO instructions are not in memory, so the handler cannot read imm8 from the stacked PC
+        imm = self.get_one_parameter(self.ONE_PARAMETER, params)
+        imm = self.check_immediate_unsigned_value(imm, 8)
+
+        def SVC_func():
+            if self.nvic is None and imm == iarm.semihosting.BREAKPOINT:
+                self.semihosting.call(self)
+                return
+            if self.nvic is None:
+                raise iarm.exceptions.HardFault("SVC needs an NVIC to be attached")
+            self.nvic.pend(self.nvic.SVCALL)
+
+        return SVC_func
+
+    def WFE(self, params):
+        """
+        WFE
+
+        Wait for an event, unless the event register is set, in which case it is cleared
+        The clock skips forward to the next scheduled event instead of running instructions
+        """
+        # TODO check for no parameters
+        def WFE_func():
+            if self.event_register:
+                self.event_register = False
+            elif self.nvic is None or self.nvic.next_pending() is None:
+                self.idle()
+
+        return WFE_func
+
+    def WFI(self, params):
+        """
+        WFI
+
+        Wait for an interrupt, does not wait if one is already pending, even if PRIMASK holds it off
+        The clock skips forward to the next scheduled event instead of running instructions
+        """
+        # TODO check for no parameters
+        def WFI_func():
+            if self.nvic is None or self.nvic.next_pending() is None:
+                self.idle()
+
+        return WFI_func
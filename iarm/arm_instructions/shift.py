@@ -17,6 +17,7 @@ class Shift(_Meta):
         # This instruction allows for an optional destination register
         # If it is omitted, then it is assumed to be Rb
         # As defined in http://infocenter.arm.com/help/index.jsp?topic=/com.arm.doc.dui0662b/index.html
+        # TODO register shifts use all of Rc, the hardware only uses its bottom byte
         try:
             Ra, Rb, Rc = self.get_three_parameters(self.THREE_PARAMETER_COMMA_SEPARATED, params)
         except iarm.exceptions.ParsingError:
@@ -27,38 +28,40 @@ class Shift(_Meta):
             # ASRS Ra, Ra, Rb
             self.check_arguments(low_registers=(Ra, Rc))
             self.match_first_two_parameters(Ra, Rb)
+            Ra, Rb, Rc = self.check_register(Ra), self.check_register(Rb), self.check_register(Rc)
 
             def ASRS_func():
                 # Set the C flag, or the last shifted out bit
-                if (self.register[Rc] > 0) and (self.register[Rb] & (1 << (self.register[Rc] - 1))):
+                if (self.registers[Rc] > 0) and ((self.registers[Rb] >> (self.registers[Rc] - 1)) & 1):
                     self.set_APSR_flag_to_value('C', 1)
                 else:
                     self.set_APSR_flag_to_value('C', 0)
 
-                if self.register[Ra] & (1 << (self._bit_width - 1)):
-                    self.register[Ra] = (self.register[Ra] >> self.register[Rc]) | (
-                        int('1' * self.register[Rc], 2) << (self._bit_width - self.register[Rc]))
-                else:
-                    self.register[Ra] = self.register[Ra] >> self.register[Rc]
-                self.set_NZ_flags(self.register[Ra])
+                # Shift the signed value, which also covers shifting by 0 or by more than the bit width
+                value = self.registers[Rb]
+                if value & (1 << (self._bit_width - 1)):
+                    value -= 1 << self._bit_width
+                self.registers[Ra] = (value >> self.registers[Rc]) & self._mask
+                self.set_NZ_flags(self.registers[Ra])
         else:
             # ASRS Ra, Rb, #imm5_counting
             self.check_arguments(low_registers=(Ra, Rb), imm5_counting=(Rc,))
             shift_amount = self.check_immediate(Rc)
+            Ra, Rb = self.check_register(Ra), self.check_register(Rb)
 
             def ASRS_func():
                 # Set the C flag, or the last shifted out bit
-                if self.register[Rb] & (1 << (shift_amount - 1)):
+                if self.registers[Rb] & (1 << (shift_amount - 1)):
                     self.set_APSR_flag_to_value('C', 1)
                 else:
                     self.set_APSR_flag_to_value('C', 0)
 
-                if self.register[Ra] & (1 << (self._bit_width - 1)):
-                    self.register[Ra] = (self.register[Ra] >> shift_amount) | (
-                        int('1' * shift_amount, 2) << (self._bit_width - shift_amount))
-                else:
-                    self.register[Ra] = self.register[Rb] >> shift_amount
-                self.set_NZ_flags(self.register[Ra])
+                # The sign comes from Rb, which is not always the same register as Ra
+                value = self.registers[Rb]
+                if value & (1 << (self._bit_width - 1)):
+                    value -= 1 << self._bit_width
+                self.registers[Ra] = (value >> shift_amount) & self._mask
+                self.set_NZ_flags(self.registers[Ra])
 
         return ASRS_func
 
@@ -86,30 +89,33 @@ class Shift(_Meta):
             # LSLS Ra, Ra, Rb
             self.check_arguments(low_registers=(Ra, Rc))
             self.match_first_two_parameters(Ra, Rb)
+            Ra, Rb, Rc = self.check_register(Ra), self.check_register(Rb), self.check_register(Rc)
 
             def LSLS_func():
                 # Set the C flag, or the last shifted out bit
-                if (self.register[Rc] < self._bit_width) and (self.register[Ra] & (1 << (self._bit_width - self.register[Rc]))):
+                if (self.registers[Rc] < self._bit_width) and (self.registers[Ra] & (1 << (self._bit_width - self.registers[Rc]))):
                     self.set_APSR_flag_to_value('C', 1)
                 else:
                     self.set_APSR_flag_to_value('C', 0)
 
-                self.register[Ra] = self.register[Ra] << self.register[Rc]
-                self.set_NZ_flags(self.register[Ra])
+                # Anything past the bit width shifts out every bit, so do not build a huge number first
+                self.registers[Ra] = (self.registers[Ra] << min(self.registers[Rc], self._bit_width)) & self._mask
+                self.set_NZ_flags(self.registers[Ra])
         else:
             # LSLS Ra, Rb, #imm5
             self.check_arguments(low_registers=(Ra, Rb), imm5=(Rc,))
             shift_amount = self.check_immediate(Rc)
+            Ra, Rb = self.check_register(Ra), self.check_register(Rb)
 
             def LSLS_func():
                 # Set the C flag, or the last shifted out bit
-                if (shift_amount < self._bit_width) and (self.register[Rb] & (1 << (self._bit_width - shift_amount))):
+                if (shift_amount < self._bit_width) and (self.registers[Rb] & (1 << (self._bit_width - shift_amount))):
                     self.set_APSR_flag_to_value('C', 1)
                 else:
                     self.set_APSR_flag_to_value('C', 0)
 
-                self.register[Ra] = self.register[Rb] << shift_amount
-                self.set_NZ_flags(self.register[Ra])
+                self.registers[Ra] = (self.registers[Rb] << shift_amount) & self._mask
+                self.set_NZ_flags(self.registers[Ra])
 
         return LSLS_func
 
@@ -137,30 +143,32 @@ class Shift(_Meta):
             # LSRS Ra, Ra, Rb
             self.check_arguments(low_registers=(Ra, Rc))
             self.match_first_two_parameters(Ra, Rb)
+            Ra, Rb, Rc = self.check_register(Ra), self.check_register(Rb), self.check_register(Rc)
 
             def LSRS_func():
                 # Set the C flag, or the last shifted out bit
-                if (self.register[Rc] > 0) and (self.register[Rb] & (1 << (self.register[Rc] - 1))):
+                if (self.registers[Rc] > 0) and ((self.registers[Rb] >> (self.registers[Rc] - 1)) & 1):
                     self.set_APSR_flag_to_value('C', 1)
                 else:
                     self.set_APSR_flag_to_value('C', 0)
 
-                self.register[Ra] = self.register[Ra] >> self.register[Rc]
-                self.set_NZ_flags(self.register[Ra])
+                self.registers[Ra] = self.registers[Ra] >> self.registers[Rc]
+                self.set_NZ_flags(self.registers[Ra])
         else:
             # LSRS Ra, Rb, #imm5_counting
             self.check_arguments(low_registers=(Ra, Rb), imm5_counting=(Rc,))
             shift_amount = self.check_immediate(Rc)
+            Ra, Rb = self.check_register(Ra), self.check_register(Rb)
 
             def LSRS_func():
                 # Set the C flag, or the last shifted out bit
-                if self.register[Rb] & (1 << (shift_amount - 1)):
+                if self.registers[Rb] & (1 << (shift_amount - 1)):
                     self.set_APSR_flag_to_value('C', 1)
                 else:
                     self.set_APSR_flag_to_value('C', 0)
 
-                self.register[Ra] = self.register[Rb] >> shift_amount
-                self.set_NZ_flags(self.register[Ra])
+                self.registers[Ra] = self.registers[Rb] >> shift_amount
+                self.set_NZ_flags(self.registers[Ra])
 
         return LSRS_func
 
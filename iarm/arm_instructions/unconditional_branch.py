@@ -14,11 +14,24 @@ class UnconditionalBranch(_Meta):
         self.check_arguments(label_exists=(label,))
         # TODO check if label is within +- 2 KB
 
+        if label == '.':
+            # B .
+            def B_func():
+                if not self.events:
+                    raise iarm.exceptions.EndOfProgram("You have reached an infinite loop")
+                # Spin until something happens, only an interrupt can get out
+                self.registers[self.PC] -= 1
+                self.idle()
+
+            return B_func
+
+        target = self.resolve_label(label)
+
         # B label
         def B_func():
-            if label == '.':
-                raise iarm.exceptions.EndOfProgram("You have reached an infinite loop")
-            self.register['PC'] = self.labels[label]
+            if target is None:
+                raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+            self.registers[self.PC] = target
 
         return B_func
 
@@ -38,13 +51,40 @@ class UnconditionalBranch(_Meta):
         """
         label = self.get_one_parameter(self.ONE_PARAMETER, params)
 
+        target = self.resolve_label(label)
+        intrinsic = self.intrinsics.get(label)
+        if intrinsic is not None:
+            return self._call_intrinsic(intrinsic)
+
         self.check_arguments(label_exists=(label,))
         # TODO check if label is within +- 16 MB
 
         # BL label
         def BL_func():
-            self.register['LR'] = self.register['PC']  # No need for the + 1, PC already points to the next instruction
-            self.register['PC'] = self.labels[label]
+            if target is None:
+                raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+            self.registers[self.LR] = self.registers[self.PC]  # No need for the + 1, PC already points to the next instruction
+            self.registers[self.PC] = target
+
+        return BL_func
+
+    def _call_intrinsic(self, intrinsic):
+        """
+        Make a BL that calls a bound Python function, see iarm.intrinsics
+        """
+        function, cycles = intrinsic
+
+        def BL_func():
+            registers = self.registers
+            registers[self.LR] = registers[self.PC]  # Same as the routine being called and returning
+            result = function(self, registers[0], registers[1], registers[2], registers[3])
+            if result is not None:
+                if isinstance(result, int):
+                    result = (result,)
+                for i, value in enumerate(result):
+                    registers[i] = value & self._mask
+            if cycles != 1:
+                self.charge(cycles - 1)
 
         return BL_func
 
@@ -57,10 +97,12 @@ class UnconditionalBranch(_Meta):
         Rj = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(LR_or_general_purpose_registers=(Rj,))
+        Rj = self.check_register(Rj)
 
         def BLX_func():
-            self.register['LR'] = self.register['PC']  # No need for the + 1, PC already points to the next instruction
-            self.register['PC'] = self.register[Rj]
+            address = self.registers[Rj]
+            self.registers[self.LR] = self.registers[self.PC]  # No need for the + 1, PC already points to the next instruction
+            self.registers[self.PC] = address
 
         return BLX_func
 
@@ -73,8 +115,9 @@ class UnconditionalBranch(_Meta):
         Rj = self.get_one_parameter(self.ONE_PARAMETER, params)
 
         self.check_arguments(LR_or_general_purpose_registers=(Rj,))
+        Rj = self.check_register(Rj)
 
         def BX_func():
-            self.register['PC'] = self.register[Rj]
+            self.registers[self.PC] = self.registers[Rj]
 
         return BX_func
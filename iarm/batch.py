@@ -0,0 +1,169 @@
+"""
+Run many programs, or one program with many inputs, across a pool of processes
+
+Instructions capture the interpreter they were decoded on, so programs cannot be sent to other processes.
+Instead the program source and its inputs are sent, and each worker assembles and runs it on its own interpreter.
+
+From the command line:
+
+    python -m iarm.batch program1.s program2.s --inputs inputs.json --steps 10000
+
+`inputs.json` is a list of input sets, each one a register name to value mapping
+with an optional `memory` entry mapping a byte address to a list of bytes.
+One JSON result is printed per line.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import os
+import sys
+import warnings
+import iarm.exceptions
+import iarm.pool
+
+# What to run, every field has to be picklable
+Job = collections.namedtuple('Job', ['program', 'inputs', 'code', 'registers', 'memory', 'steps',
+                                     'memory_size', 'read_memory'])
+
+# What happened. `status` is one of
+# finished: ran to the end of the program
+# halted: reached an infinite loop (`B .`)
+# step_limit: ran out of steps before finishing
+# error: the program did not assemble or raised an error when running, see `error`
+# `memory` is the bytes asked for with read_memory, as a list of ints so results can be written out as JSON
+# `output` is everything the program wrote with semihosting calls
+Result = collections.namedtuple('Result', ['program', 'inputs', 'status', 'error', 'registers', 'memory', 'output'])
+
+REGISTERS = ['R{}'.format(i) for i in range(16)] + ['APSR']
+
+# Interpreter pools for this process, keyed by memory size, so jobs reuse interpreters
+_pools = {}
+
+
+def run_job(job):
+    """
+    Assemble and run one job on an interpreter from this process's pool
+    :param job: The Job to run
+    :return: The Result
+    """
+    try:
+        pool = _pools[job.memory_size]
+    except KeyError:
+        pool = _pools[job.memory_size] = iarm.pool.InterpreterPool(memory_size=job.memory_size)
+    with pool.interpreter() as interp:
+        return _run_job(job, interp)
+
+
+def _run_job(job, interp):
+    status = 'finished'
+    error = None
+    output = []
+    interp.semihosting.output = lambda name, text: output.append(text)
+    try:
+        for name, value in job.registers.items():
+            interp.register[name] = value
+        for address, data in job.memory.items():
+            interp.memory.write(address, bytes(data))
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            interp.evaluate(job.code)
+        interp.run(job.steps)
+        if interp.register['PC'] - 1 < len(interp.program):
+            status = 'step_limit'
+    except iarm.exceptions.EndOfProgram:
+        status = 'halted'
+    except Exception as e:
+        status = 'error'
+        error = _describe(e)
+
+    memory = None
+    if job.read_memory is not None:
+        try:
+            memory = list(interp.memory.read(*job.read_memory))
+        except Exception as e:
+            # A bad address only fails this job, not the whole batch
+            if error is None:
+                status = 'error'
+                error = _describe(e)
+    interp.semihosting.flush()  # In case it failed to assemble after writing something
+    return Result(job.program, job.inputs, status, error,
+                  {name: interp.register[name] for name in REGISTERS}, memory, ''.join(output))
+
+
+def _describe(error):
+    return "{}: {}".format(type(error).__name__, ' '.join(str(arg) for arg in error.args))
+
+
+def make_jobs(programs, inputs=None, steps=float('inf'), memory_size=1024, read_memory=None):
+    """
+    Make a job for every program with every input set
+    :param programs: A list of program source code
+    :param inputs: A list of input sets, each a register name to value dict.
+        An input set can have a `memory` entry mapping a byte address to a list of bytes to load first.
+        If not given, every program is run once with no inputs
+    :param steps: The most instructions a job can run
+    :param memory_size: How many bytes of memory each interpreter has
+    :param read_memory: A tuple of (address, length) of memory to return with each result
+    :return: A list of Jobs
+    """
+    if not inputs:
+        inputs = [{}]
+    jobs = []
+    for program_index, code in enumerate(programs):
+        for inputs_index, input_set in enumerate(inputs):
+            registers = {name: value for name, value in input_set.items() if name != 'memory'}
+            memory = {int(address): data for address, data in input_set.get('memory', {}).items()}
+            jobs.append(Job(program_index, inputs_index, code, registers, memory, steps, memory_size, read_memory))
+    return jobs
+
+
+def run_batch(programs, inputs=None, steps=float('inf'), workers=None, memory_size=1024, read_memory=None):
+    """
+    Run every program with every input set across a pool of processes
+    :param programs: A list of program source code
+    :param inputs: A list of input sets, see `make_jobs`
+    :param steps: The most instructions a job can run
+    :param workers: How many processes to use, defaults to one per core. Zero runs everything in this process
+    :param memory_size: How many bytes of memory each interpreter has
+    :param read_memory: A tuple of (address, length) of memory to return with each result
+    :return: A list of Results, in the same order as the jobs (every input set for the first program first)
+    """
+    jobs = make_jobs(programs, inputs, steps, memory_size, read_memory)
+    if workers == 0:
+        return [run_job(job) for job in jobs]
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (workers * 4))  # Fewer round trips without leaving workers idle at the end
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_job, jobs, chunksize=chunksize))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run ARM assembly programs with many inputs across processes")
+    parser.add_argument('programs', nargs='+', help="Files with the program source")
+    parser.add_argument('--inputs', help="JSON file with a list of input sets")
+    parser.add_argument('--steps', type=int, default=None, help="The most instructions a job can run")
+    parser.add_argument('--workers', type=int, default=None, help="How many processes to use")
+    parser.add_argument('--memory-size', type=int, default=1024, help="How many bytes of memory each interpreter has")
+    args = parser.parse_args(argv)
+
+    programs = []
+    for name in args.programs:
+        with open(name) as f:
+            programs.append(f.read())
+    inputs = None
+    if args.inputs:
+        with open(args.inputs) as f:
+            inputs = json.load(f)
+    steps = float('inf') if args.steps is None else args.steps
+
+    for result in run_batch(programs, inputs, steps, args.workers, args.memory_size):
+        result = result._asdict()
+        result['program'] = args.programs[result['program']]
+        print(json.dumps(result))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
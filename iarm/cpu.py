@@ -1,11 +1,19 @@
+import collections.abc
+import copy
 import inspect
 import random
+import types
+import iarm.memory
 
 
 class RegisterCpu(object):
     """
     A register based CPU
     """
+    SPECIAL_REGISTERS = ()  # Registers that come after the numbered registers
+    _instructions = {}  # Instruction name to function, filled in for each subclass by _build_tables
+    _rule_functions = {}  # Rule name to function, filled in for each subclass by _build_tables
+
     def __init__(self, bit_width, max_registers, memory_width=8, memory_size=1024, generate_random=False, postpone_execution=True):
         """
         Initialize the CPU and get all instructions and "rules"
@@ -29,25 +37,48 @@ class RegisterCpu(object):
         self._generate_random = generate_random
         self._postpone_execution = postpone_execution
 
-        self.register = RandomValueDict(self._bit_width, self._generate_random)  # Holder for the register values
-        self.memory = RandomValueDict(self._memory_width, self._generate_random)  # Holder for memory
+        self._mask = 2**self._bit_width - 1
+
+        # Register values, indexed by register number, and a view to access them by name
+        self.registers = [0] * (max_registers + len(self.SPECIAL_REGISTERS))
+        self.register = RegisterFile(self.registers,
+                                     ['R{}'.format(i) for i in range(max_registers)] + list(self.SPECIAL_REGISTERS),
+                                     self._bit_width)
+        if self._generate_random:
+            self.register.randomize()
+        self.memory = iarm.memory.PagedMemory(self._memory_size, self._generate_random)  # Holder for memory
         self.program = []  # Hold the current program, used for jumps
         self.labels = {}  # A label to program location lookup
-        self.ops = {}  # What operations are defined
-        self._rules = {}  # Holder for parameter rules
+        self.peripherals = []  # Peripherals attached to memory
+        # Bind the instructions and rules found when the class was made
+        self.ops = {name: types.MethodType(func, self) for name, func in self._instructions.items()}  # What operations are defined
+        self._rules = {name: types.MethodType(func, self) for name, func in self._rule_functions.items()}  # Holder for parameter rules
 
-        # Get all instructions and rules
-        for obj in inspect.getmembers(self, predicate=inspect.ismethod):
-            # Is returned in the form of (method name, method)
-            name = obj[0]
-            method = obj[1]
+    def __init_subclass__(cls, **kwargs):
+        """
+        Find the instructions and rules once for every class instead of every time an instance is made
+        """
+        super().__init_subclass__(**kwargs)
+        cls._build_tables()
+
+    @classmethod
+    def _build_tables(cls):
+        """
+        Get all instructions and "rules" defined on the class
 
+        Instructions are defined as being all uppercase.
+        Rules are defined with starting with 'rule_'.
+        Subclasses can extend this to find their own kinds of methods.
+        """
+        cls._instructions = {}
+        cls._rule_functions = {}
+        for name, func in inspect.getmembers(cls, predicate=inspect.isfunction):
             # Instructions are defined by being all uppercase
             if str.isupper(name):
-                self.ops[name] = method
+                cls._instructions[name] = func
             # Rules are defined with starting with 'rule_'
             elif str.startswith(name, 'rule_'):
-                self._rules[name[len('rule_'):]] = method
+                cls._rule_functions[name[len('rule_'):]] = func
             else:
                 # TODO Hokay we need to rethink how we do stuff defined on the classes.
                 # This may mean redoing the internals so that the logic is separated away from the parsing
@@ -57,6 +88,63 @@ class RegisterCpu(object):
                 #raise Exception("Bad bad programmer, you made a bad method name with `{} ; {}`. Adhere to the rules".format(name, method))
                 pass
 
+    def reset(self, keep_program=False):
+        """
+        Put the CPU back the way it was when it was made, without finding the instructions again
+        :param keep_program: Keep the decoded program and its labels so it can be run again,
+            along with the memory it was loaded into and the peripherals it uses
+        :return:
+        """
+        # Clear in place, the register view and compiled code hold on to the list
+        self.registers[:] = [0] * len(self.registers)
+        if self._generate_random:
+            self.register.randomize()
+        if keep_program:
+            self.memory.reset()
+        else:
+            self.program = []
+            self.labels = {}
+            # Peripherals are attached to the memory, so both go back to how they were when the CPU was made
+            for peripheral in self.peripherals:
+                peripheral.flush()  # Hand over any output they were holding on to
+            self.memory = iarm.memory.PagedMemory(self._memory_size, self._generate_random)
+            self.peripherals = []
+
+    def attach(self, peripheral):
+        """
+        Map a peripheral's registers into memory at its base address
+        :param peripheral: An iarm.peripherals.Peripheral
+        :return:
+        """
+        try:
+            attach = self.memory.attach
+        except AttributeError:
+            raise ValueError("{} does not support peripherals".format(type(self.memory).__name__)) from None
+        attach(peripheral, peripheral.base)
+        self.peripherals.append(peripheral)
+        peripheral.attached(self)
+
+    def fork(self):
+        """
+        Make a copy of the CPU that carries on from the same state
+        Memory pages are shared between the two until one of them writes to it.
+        Peripherals cannot be shared or copied, so a CPU with peripherals attached cannot be forked.
+        :return: The new CPU
+        """
+        if self.peripherals:
+            raise ValueError("Cannot fork with peripherals attached; {}".format(
+                ', '.join(type(peripheral).__name__ for peripheral in self.peripherals)))
+        other = copy.copy(self)
+        other.registers = list(self.registers)
+        other.register = self.register.copy(other.registers)
+        other.memory = self.memory.fork()
+        other.program = list(self.program)
+        other.labels = dict(self.labels)
+        other.peripherals = []
+        other.ops = {name: types.MethodType(func, other) for name, func in self._instructions.items()}
+        other._rules = {name: types.MethodType(func, other) for name, func in self._rule_functions.items()}
+        return other
+
     def check_arguments(self, **kwargs):
         """
         Determine if the parameters meet the specifications
@@ -83,8 +171,9 @@ class RegisterCpu(object):
     @generate_random.setter
     def generate_random(self, value):
         self._generate_random = value
-        self.memory._generate_random = value
-        self.register._generate_random = value
+        if value:
+            self.register.randomize()
+            self.memory.randomize()
 
     @property
     def postpone_execution(self):
@@ -95,6 +184,102 @@ class RegisterCpu(object):
         self._postpone_execution = value
 
 
+class RegisterFile(collections.abc.MutableMapping):
+    """
+    Access the register list by name
+
+    Instructions index the register list directly with the register number.
+    This gives the kernel and anything else outside of the instructions a
+    dictionary to work with, where aliases (like `PC` and `R15`) point to the same register.
+    """
+    def __init__(self, registers, names, bit_width):
+        """
+        :param registers: The list holding the register values
+        :param names: The name of each register in the list
+        :param bit_width: The width of a register. Used to determine the max value
+        """
+        self._registers = registers
+        self._index = {name: i for i, name in enumerate(names)}
+        self._names = list(names)
+        self._mask = 2**bit_width - 1
+        self._watchers = {}  # Register index to a function called before it is accessed
+
+    def index(self, name):
+        """
+        Get the register number for a register name or alias
+        :param name: The register name
+        :return: The index into the register list
+        """
+        return self._index[name]
+
+    def link(self, alias, name):
+        """
+        Make alias refer to the same register as name
+        :param alias: The new name
+        :param name: The existing register name
+        :return:
+        """
+        self._index[alias] = self._index[name]
+
+    def copy(self, registers):
+        """
+        Make a view with the same names over a different register list
+        Watchers are not copied since they belong to the CPU that added them.
+        :param registers: The list holding the register values
+        :return: The new RegisterFile
+        """
+        other = RegisterFile(registers, [], 0)
+        other._index = dict(self._index)
+        other._names = list(self._names)
+        other._mask = self._mask
+        return other
+
+    def watch(self, name, func):
+        """
+        Call func before the register is read or written through this view.
+        Used for registers that are not always kept up to date in the register list (like the APSR flags)
+        :param name: The register name
+        :param func: A function that takes no arguments
+        :return:
+        """
+        self._watchers[self._index[name]] = func
+
+    def randomize(self):
+        """
+        Give a random value to every register that still holds zero,
+        mimicking the undefined values registers have on real hardware
+        :return:
+        """
+        for i, value in enumerate(self._registers):
+            if not value:
+                self._registers[i] = random.randint(0, self._mask)
+
+    def __getitem__(self, key):
+        if not isinstance(key, int):
+            key = self._index[key]
+        if key in self._watchers:
+            self._watchers[key]()
+        return self._registers[key]
+
+    def __setitem__(self, key, value):
+        if not isinstance(key, int):
+            key = self._index[key]
+        if key in self._watchers:
+            self._watchers[key]()
+        self._registers[key] = value & self._mask
+
+    def __delitem__(self, key):
+        raise TypeError("Registers cannot be removed")
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
 
 class RandomValueDict(dict):
     """
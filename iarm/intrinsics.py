@@ -0,0 +1,111 @@
+"""
+Run library routines on the host instead of emulating them
+
+The Cortex-M0+ has no divide instruction, so programs call routines like `__aeabi_uidiv` and `memcpy`
+that take hundreds of instructions. A label can be bound to a Python function, and then `BL label`
+calls the function instead and carries on with the next instruction:
+
+    interp.bind_library()  # Everything in LIBRARY
+    interp.bind('checksum', lambda cpu, address, length, *_: sum(cpu.memory.read(address, length)))
+
+Functions are called with the interpreter and R0 - R3, like the arguments of a C function.
+They return the value for R0, a tuple of values for R0, R1, ..., or None to leave the registers alone.
+A call counts as `cycles` instructions, and a function can call `cpu.charge` for costs that depend on its arguments.
+"""
+
+import collections
+
+# A bound function and how many instructions a call to it counts as
+Intrinsic = collections.namedtuple('Intrinsic', ['function', 'cycles'])
+
+
+def _signed(value):
+    return value - (1 << 32) if value & (1 << 31) else value
+
+
+def _divide(numerator, denominator):
+    """
+    Signed division that rounds towards zero like C, dividing by zero gives zero like the default __aeabi_idiv0
+    :return: The quotient and remainder
+    """
+    if not denominator:
+        return 0, numerator
+    quotient = abs(numerator) // abs(denominator)
+    if (numerator < 0) != (denominator < 0):
+        quotient = -quotient
+    return quotient, numerator - quotient * denominator
+
+
+def uidiv(cpu, numerator, denominator, *_):
+    return _divide(numerator, denominator)[0]
+
+
+def uidivmod(cpu, numerator, denominator, *_):
+    return _divide(numerator, denominator)
+
+
+def idiv(cpu, numerator, denominator, *_):
+    return _divide(_signed(numerator), _signed(denominator))[0]
+
+
+def idivmod(cpu, numerator, denominator, *_):
+    return _divide(_signed(numerator), _signed(denominator))
+
+
+def memcpy(cpu, destination, source, length, *_):
+    if length:
+        cpu.memory.write(destination, cpu.memory.read(source, length))
+    return destination
+
+
+def memset(cpu, destination, value, length, *_):
+    if length:
+        cpu.memory.write(destination, bytes((value & 0xFF,)) * length)
+    return destination
+
+
+def aeabi_memcpy(cpu, destination, source, length, *_):
+    memcpy(cpu, destination, source, length)
+
+
+def aeabi_memset(cpu, destination, length, value, *_):
+    # The run time ABI puts the length before the value
+    memset(cpu, destination, value, length)
+
+
+def aeabi_memclr(cpu, destination, length, *_):
+    memset(cpu, destination, 0, length)
+
+
+def strlen(cpu, address, *_):
+    memory = cpu.memory
+    length = 0
+    while memory[address + length]:
+        length += 1
+    return length
+
+
+# Label to function for the routines `bind_library` binds. Reading everything before writing
+# means memcpy also handles overlapping copies, so it doubles as memmove
+LIBRARY = {
+    '__aeabi_uidiv': uidiv,
+    '__aeabi_uidivmod': uidivmod,
+    '__aeabi_idiv': idiv,
+    '__aeabi_idivmod': idivmod,
+    '__aeabi_memcpy': aeabi_memcpy,
+    '__aeabi_memcpy4': aeabi_memcpy,
+    '__aeabi_memcpy8': aeabi_memcpy,
+    '__aeabi_memmove': aeabi_memcpy,
+    '__aeabi_memmove4': aeabi_memcpy,
+    '__aeabi_memmove8': aeabi_memcpy,
+    '__aeabi_memset': aeabi_memset,
+    '__aeabi_memset4': aeabi_memset,
+    '__aeabi_memset8': aeabi_memset,
+    '__aeabi_memclr': aeabi_memclr,
+    '__aeabi_memclr4': aeabi_memclr,
+    '__aeabi_memclr8': aeabi_memclr,
+    'memcpy': memcpy,
+    'memmove': memcpy,
+    'memset': memset,
+    'strlen': strlen,
+}
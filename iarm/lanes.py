@@ -0,0 +1,833 @@
+"""
+Run one program over many sets of inputs at the same time
+
+Every register is a numpy array with one entry per lane, and every lane has its own copy of memory.
+Instructions are decoded again from the interpreters source into functions that take a lane mask
+and update only those lanes.
+This is a second copy of every instruction, so `test_random_programs` in the tests runs random programs
+through both and checks that they agree.
+When lanes take different branches, the lanes with the lowest program index are run first,
+so lanes that skipped ahead wait for the others to catch up and then continue together.
+
+This needs numpy, which is an optional dependency.
+"""
+
+import inspect
+import iarm.exceptions
+
+try:
+    import numpy
+except ImportError:  # Only needed when running lanes
+    numpy = None
+
+MASK = 0xFFFFFFFF
+SIGN = 1 << 31
+MAX_MEMORY_SIZE = 1 << 24  # Each lane has its own copy of memory
+
+
+class Lanes(object):
+    """
+    Lane parallel copy of an interpreter
+
+    Supports the data movement, arithmetic, logic, shift, branch, and most of the memory instructions
+    """
+    def __init__(self, cpu, registers=None, memory=None, lanes=None):
+        """
+        :param cpu: The interpreter that holds the (already validated) program
+        :param registers: Register name to a value or a list of values, one per lane.
+            Registers not given start with the interpreters current value
+        :param memory: Starting memory, either one memory for every lane or an array of shape (lanes, memory size).
+            If not given, every lane starts with the interpreters current memory
+        :param lanes: How many lanes to run. Only needed if it cannot be worked out from registers or memory
+        """
+        if numpy is None:
+            raise ImportError("Running lanes needs numpy")
+        self.cpu = cpu
+        registers = registers or {}
+
+        if lanes is None:
+            sizes = [len(value) for value in registers.values() if numpy.ndim(value)]
+            if memory is not None and numpy.ndim(memory) == 2:
+                sizes.append(len(memory))
+            if not sizes:
+                raise ValueError("Cannot work out how many lanes to run, pass in `lanes`")
+            lanes = sizes[0]
+        self.lanes = lanes
+        self._index = numpy.arange(lanes)
+
+        # Registers, one row per register
+        self.registers = numpy.empty((len(cpu.registers), lanes), dtype=numpy.uint32)
+        self.registers[:] = numpy.array(cpu.registers, dtype=numpy.uint32)[:, None]
+        for name, value in registers.items():
+            self.registers[cpu.register.index(name)] = numpy.asarray(value, dtype=numpy.int64) & MASK
+        self.register = {name: self.registers[cpu.register.index(name)]
+                         for name in list(cpu.register) + ['PC', 'LR', 'SP', 'FP']}
+
+        # Flags are kept as their own arrays and put into the APSR when the run is finished.
+        # They start from the APSR, which is the interpreters (with its flags worked out) unless it was given
+        if 'APSR' not in registers:
+            cpu.update_APSR()
+            self.registers[cpu.APSR] = cpu.registers[cpu.APSR]
+        apsr = self.registers[cpu.APSR]
+        self.N = (apsr >> 31) & 1 == 1
+        self.Z = (apsr >> 30) & 1 == 1
+        self.C = (apsr >> 29) & 1 == 1
+        self.V = (apsr >> 28) & 1 == 1
+
+        self.memory_size = len(cpu.memory)
+        if self.memory_size > MAX_MEMORY_SIZE:
+            # Every lane gets a full copy of memory, which does not work for a sparse 32 bit address space
+            raise ValueError("Lanes need memory of {} bytes or less, the interpreter has {}".format(
+                MAX_MEMORY_SIZE, self.memory_size))
+        self.memory = numpy.empty((lanes, self.memory_size), dtype=numpy.uint8)
+        if memory is None:
+            self.memory[:] = numpy.frombuffer(cpu.memory.read(0, self.memory_size), dtype=numpy.uint8)
+        else:
+            self.memory[:] = memory
+
+        # The program index of the next instruction for each lane
+        self.pc = numpy.full(lanes, cpu.registers[cpu.PC] - 1, dtype=numpy.int64)
+        self.steps = numpy.zeros(lanes, dtype=numpy.int64)  # How many instructions each lane has run
+        self.halted = numpy.zeros(lanes, dtype=bool)  # Lanes that hit `B .` or faulted
+        self.faults = {}  # Lane number to the exception that stopped it
+        self._current = 0  # The program index that is being run
+
+        self.ops = {}
+        for name, method in inspect.getmembers(self, predicate=inspect.ismethod):
+            # Instructions are defined by being all uppercase
+            if str.isupper(name):
+                self.ops[name] = method
+
+        self.program = []
+        for op, params in cpu.source:
+            try:
+                func = self.ops[op]
+            except KeyError:
+                raise iarm.exceptions.NotImplementedError("Instruction `{}` cannot be run in lanes".format(op))
+            self.program.append(func(params))
+
+    def run(self, steps=float('inf')):
+        """
+        Run every lane to the end of the program or a number of steps
+        :param steps: The most instructions any one lane will run
+        :return: self, so results can be read straight off of a run
+        """
+        pc = self.pc
+        length = len(self.program)
+        while True:
+            active = ~self.halted & (pc < length) & (self.steps < steps)
+            if not active.any():
+                break
+            current = int(pc[active].min())
+            mask = active & (pc == current)
+            if mask.all():
+                mask = slice(None)  # A view is a lot cheaper than a boolean index
+            self._current = current
+            pc[mask] = current + 1
+            self.registers[self.cpu.PC, mask] = current + 1  # PC points to the next instruction
+            self.steps[mask] += 1
+            self.program[current](mask)
+
+        self.registers[self.cpu.PC] = pc + 1
+        self.registers[self.cpu.APSR] = ((self.N.astype(numpy.uint32) << 31) | (self.Z.astype(numpy.uint32) << 30) |
+                                         (self.C.astype(numpy.uint32) << 29) | (self.V.astype(numpy.uint32) << 28))
+        return self
+
+    # Helpers used by the instructions
+
+    def _get(self, R, mask):
+        return self.registers[R, mask].astype(numpy.uint64)
+
+    def _set(self, R, mask, value):
+        if R == self.cpu.PC:
+            self.pc[mask] = value  # Same as the interpreter, the PC is set to the index before the next instruction
+        else:
+            self.registers[R, mask] = value
+
+    def _operand(self, arg):
+        """
+        Get a function that returns the value of a register or immediate for the masked lanes
+        """
+        if self.cpu.is_register(arg):
+            R = self.cpu.check_register(arg)
+            return lambda mask: self._get(R, mask)
+        value = numpy.uint64(self.cpu.convert_to_integer(arg[1:]) & MASK)
+        return lambda mask: value
+
+    def _fault(self, lanes, error):
+        """
+        Stop the given lanes, leaving their PC on the instruction that failed
+        """
+        self.halted[lanes] = True
+        self.pc[lanes] = self._current
+        for lane in numpy.atleast_1d(self._index[lanes]):
+            self.faults[int(lane)] = error
+
+    def _set_NZ(self, mask, result):
+        self.N[mask] = (result & SIGN) != 0
+        self.Z[mask] = result == 0
+
+    def _set_NZCV(self, mask, oper_1, oper_2, result, _type):
+        """
+        The same as `set_NZCV_flags` on the interpreter, but for every masked lane
+        """
+        oper_1 = numpy.asarray(oper_1, dtype=numpy.uint64)
+        oper_2 = numpy.asarray(oper_2, dtype=numpy.uint64)
+        self._set_NZ(mask, result)
+        if _type == 'add':
+            self.C[mask] = result < oper_1
+        else:
+            self.C[mask] = oper_1 >= oper_2
+            oper_2 = (~oper_2 & MASK) + 1
+        neg_1 = (oper_1 & SIGN) != 0
+        neg_2 = (oper_2 & SIGN) != 0
+        neg_r = (result & SIGN) != 0
+        self.V[mask] = ((oper_1 + oper_2) >= SIGN) & ((neg_1 & neg_2 & ~neg_r) | (~neg_1 & ~neg_2 & neg_r))
+
+    def _three_parameters(self, params):
+        # Same as the interpreter, the first register is optional
+        try:
+            return self.cpu.get_three_parameters(self.cpu.THREE_PARAMETER_COMMA_SEPARATED, params)
+        except iarm.exceptions.ParsingError:
+            Rb, Rc = self.cpu.get_two_parameters(self.cpu.TWO_PARAMETER_COMMA_SEPARATED, params)
+            return Rb, Rb, Rc
+
+    def _two_parameters(self, params):
+        return self.cpu.get_two_parameters(self.cpu.TWO_PARAMETER_COMMA_SEPARATED, params)
+
+    def _load(self, mask, address, size):
+        """
+        Read size bytes at each lanes address, faulting lanes that go outside of memory
+        :return: The lanes that were read and the value for each of them
+        """
+        lanes = self._index[mask]
+        bad = address + size > self.memory_size
+        if bad.any():
+            self._fault(lanes[bad], iarm.exceptions.HardFault("Memory access out of bounds"))
+            lanes, address = lanes[~bad], address[~bad]
+        value = numpy.zeros(len(lanes), dtype=numpy.uint64)
+        for i in range(size):
+            value |= self.memory[lanes, address + i].astype(numpy.uint64) << numpy.uint64(8 * i)
+        return lanes, value
+
+    def _store(self, mask, address, value, size):
+        """
+        Write the lowest size bytes of value at each lanes address, faulting lanes that go outside of memory
+        """
+        lanes = self._index[mask]
+        value = numpy.broadcast_to(value, lanes.shape)
+        bad = address + size > self.memory_size
+        if bad.any():
+            self._fault(lanes[bad], iarm.exceptions.HardFault("Memory access out of bounds"))
+            lanes, address, value = lanes[~bad], address[~bad], value[~bad]
+        for i in range(size):
+            self.memory[lanes, address + i] = (value >> numpy.uint64(8 * i)) & 0xFF
+
+    def _check_aligned(self, mask, address, size):
+        """
+        Fault the lanes whose address is not aligned
+        :return: The mask of lanes to keep going with, and their addresses
+        """
+        bad = address % size != 0
+        if bad.any():
+            lanes = self._index[mask]
+            self._fault(lanes[bad], iarm.exceptions.HardFault("Memory access not aligned"))
+            return lanes[~bad], address[~bad]
+        return mask, address
+
+    def _address(self, params):
+        """
+        Get a function that returns the address for the masked lanes from `Ra, [Rb, Rc]`, `Ra, [Rb, #imm]`, or `Ra, [Rb]`
+        :return: Ra and the address function
+        """
+        try:
+            Ra, Rb, Rc = self.cpu.get_three_parameters(self.cpu.THREE_PARAMETER_WITH_BRACKETS, params)
+        except iarm.exceptions.ParsingError:
+            Ra, Rb = self.cpu.get_two_parameters(self.cpu.TWO_PARAMETER_WITH_BRACKETS, params)
+            Rc = '#0'
+        Ra, Rb, Rc = self.cpu.check_register(Ra), self.cpu.check_register(Rb), self._operand(Rc)
+        return Ra, lambda mask: self._get(Rb, mask) + Rc(mask)
+
+    # Data movement
+
+    def MOV(self, params):
+        Rx, Ry = self._two_parameters(params)
+        Rx, Ry = self.cpu.check_register(Rx), self.cpu.check_register(Ry)
+
+        def MOV_func(mask):
+            self._set(Rx, mask, self.registers[Ry, mask])
+
+        return MOV_func
+
+    def MOVS(self, params):
+        Ra, Rb = self._two_parameters(params)
+        Ra, Rb = self.cpu.check_register(Ra), self._operand(Rb)
+
+        def MOVS_func(mask):
+            value = Rb(mask)
+            self.registers[Ra, mask] = value
+            self._set_NZ(mask, value)
+
+        return MOVS_func
+
+    def MVNS(self, params):
+        Ra, Rb = self._two_parameters(params)
+        Ra, Rb = self.cpu.check_register(Ra), self.cpu.check_register(Rb)
+
+        def MVNS_func(mask):
+            value = ~self._get(Rb, mask) & MASK
+            self.registers[Ra, mask] = value
+            self._set_NZ(mask, value)
+
+        return MVNS_func
+
+    def MRS(self, params):
+        Rj, Rspecial = self._two_parameters(params)
+        Rj = self.cpu.check_register(Rj)
+        others = ()
+        if Rspecial == 'PSR':
+            others = (self.cpu.IPSR, self.cpu.EPSR)
+        elif Rspecial != 'APSR':
+            raise iarm.exceptions.NotImplementedError("MRS from `{}` cannot be run in lanes".format(Rspecial))
+
+        def MRS_func(mask):
+            value = ((self.N[mask].astype(numpy.uint64) << numpy.uint64(31)) |
+                     (self.Z[mask].astype(numpy.uint64) << numpy.uint64(30)) |
+                     (self.C[mask].astype(numpy.uint64) << numpy.uint64(29)) |
+                     (self.V[mask].astype(numpy.uint64) << numpy.uint64(28)))
+            for R in others:
+                value |= self._get(R, mask)
+            self.registers[Rj, mask] = value
+
+        return MRS_func
+
+    def MSR(self, params):
+        Rspecial, Rj = self._two_parameters(params)
+        Rj = self.cpu.check_register(Rj)
+
+        def MSR_func(mask):
+            if Rspecial in ('PSR', 'APSR'):
+                value = self._get(Rj, mask)
+                self.N[mask] = (value >> numpy.uint64(31)) & 1
+                self.Z[mask] = (value >> numpy.uint64(30)) & 1
+                self.C[mask] = (value >> numpy.uint64(29)) & 1
+                self.V[mask] = (value >> numpy.uint64(28)) & 1
+
+        return MSR_func
+
+    def REV(self, params):
+        Ra, Rb = self._two_parameters(params)
+        Ra, Rb = self.cpu.check_register(Ra), self.cpu.check_register(Rb)
+
+        def REV_func(mask):
+            self.registers[Ra, mask] = self.registers[Rb, mask].byteswap()
+
+        return REV_func
+
+    def REV16(self, params):
+        Ra, Rb = self._two_parameters(params)
+        Ra, Rb = self.cpu.check_register(Ra), self.cpu.check_register(Rb)
+
+        def REV16_func(mask):
+            value = self._get(Rb, mask)
+            self.registers[Ra, mask] = ((value & 0xFF00FF00) >> numpy.uint64(8)) | ((value & 0x00FF00FF) << numpy.uint64(8))
+
+        return REV16_func
+
+    def REVSH(self, params):
+        Ra, Rb = self._two_parameters(params)
+        Ra, Rb = self.cpu.check_register(Ra), self.cpu.check_register(Rb)
+
+        def REVSH_func(mask):
+            value = self._get(Rb, mask)
+            value = ((value & 0xFF00) >> numpy.uint64(8)) | ((value & 0xFF) << numpy.uint64(8))
+            self.registers[Ra, mask] = numpy.where(value & 0x8000, value | 0xFFFF0000, value)
+
+        return REVSH_func
+
+    def SXTB(self, params):
+        Ra, Rb = self._two_parameters(params)
+        Ra, Rb = self.cpu.check_register(Ra), self.cpu.check_register(Rb)
+
+        def SXTB_func(mask):
+            value = self._get(Rb, mask) & 0xFF
+            self.registers[Ra, mask] = numpy.where(value & 0x80, value | 0xFFFFFF00, value)
+
+        return SXTB_func
+
+    def SXTH(self, params):
+        Ra, Rb = self._two_parameters(params)
+        Ra, Rb = self.cpu.check_register(Ra), self.cpu.check_register(Rb)
+
+        def SXTH_func(mask):
+            value = self._get(Rb, mask) & 0xFFFF
+            self.registers[Ra, mask] = numpy.where(value & 0x8000, value | 0xFFFF0000, value)
+
+        return SXTH_func
+
+    def UXTB(self, params):
+        Ra, Rb = self._two_parameters(params)
+        Ra, Rb = self.cpu.check_register(Ra), self.cpu.check_register(Rb)
+
+        def UXTB_func(mask):
+            self.registers[Ra, mask] = self.registers[Rb, mask] & 0xFF
+
+        return UXTB_func
+
+    def UXTH(self, params):
+        Ra, Rb = self._two_parameters(params)
+        Ra, Rb = self.cpu.check_register(Ra), self.cpu.check_register(Rb)
+
+        def UXTH_func(mask):
+            self.registers[Ra, mask] = self.registers[Rb, mask] & 0xFFFF
+
+        return UXTH_func
+
+    # Arithmetic
+
+    def ADCS(self, params):
+        Ra, Rb, Rc = self._three_parameters(params)
+        Ra, Rc = self.cpu.check_register(Ra), self.cpu.check_register(Rc)
+
+        def ADCS_func(mask):
+            oper_1 = self._get(Ra, mask)
+            oper_2 = self._get(Rc, mask)
+            result = (oper_1 + oper_2 + self.C[mask]) & MASK
+            self.registers[Ra, mask] = result
+            self._set_NZCV(mask, oper_1, oper_2, result, 'add')
+
+        return ADCS_func
+
+    def ADD(self, params):
+        Rx, Ry, Rz = self._three_parameters(params)
+        Rx, Ry, Rz = self.cpu.check_register(Rx), self.cpu.check_register(Ry), self._operand(Rz)
+
+        def ADD_func(mask):
+            self._set(Rx, mask, (self._get(Ry, mask) + Rz(mask)) & MASK)
+
+        return ADD_func
+
+    def ADDS(self, params):
+        Ra, Rb, Rc = self._three_parameters(params)
+        Ra, Rb, Rc = self.cpu.check_register(Ra), self.cpu.check_register(Rb), self._operand(Rc)
+
+        def ADDS_func(mask):
+            oper_1 = self._get(Rb, mask)
+            oper_2 = Rc(mask)
+            result = (oper_1 + oper_2) & MASK
+            self.registers[Ra, mask] = result
+            self._set_NZCV(mask, oper_1, oper_2, result, 'add')
+
+        return ADDS_func
+
+    def CMN(self, params):
+        Ra, Rb = self._two_parameters(params)
+        Ra, Rb = self.cpu.check_register(Ra), self.cpu.check_register(Rb)
+
+        def CMN_func(mask):
+            oper_1 = self._get(Ra, mask)
+            oper_2 = self._get(Rb, mask)
+            self._set_NZCV(mask, oper_1, oper_2, oper_1 + oper_2, 'add')
+
+        return CMN_func
+
+    def CMP(self, params):
+        Rm, Rn = self._two_parameters(params)
+        Rm, Rn = self.cpu.check_register(Rm), self._operand(Rn)
+
+        def CMP_func(mask):
+            oper_1 = self._get(Rm, mask)
+            oper_2 = Rn(mask)
+            self._set_NZCV(mask, oper_1, oper_2, oper_1 - oper_2, 'sub')
+
+        return CMP_func
+
+    def MULS(self, params):
+        Ra, Rb, Rc = self.cpu.get_three_parameters(self.cpu.THREE_PARAMETER_COMMA_SEPARATED, params)
+        Ra, Rb = self.cpu.check_register(Ra), self.cpu.check_register(Rb)
+
+        def MULS_func(mask):
+            result = (self._get(Rb, mask) * self._get(Ra, mask)) & MASK
+            self.registers[Ra, mask] = result
+            self._set_NZ(mask, result)
+
+        return MULS_func
+
+    def NOP(self, params):
+        def NOP_func(mask):
+            return
+        return NOP_func
+
+    def RSBS(self, params):
+        Ra, Rb, Rc = self._three_parameters(params)
+        Ra, Rb = self.cpu.check_register(Ra), self.cpu.check_register(Rb)
+
+        def RSBS_func(mask):
+            oper_2 = self._get(Rb, mask)
+            result = (numpy.uint64(0) - oper_2) & MASK
+            self.registers[Ra, mask] = result
+            self._set_NZCV(mask, numpy.zeros_like(oper_2), oper_2, result, 'sub')
+
+        return RSBS_func
+
+    def SBCS(self, params):
+        Ra, Rb, Rc = self._three_parameters(params)
+        Ra, Rc = self.cpu.check_register(Ra), self.cpu.check_register(Rc)
+
+        def SBCS_func(mask):
+            oper_1 = self._get(Ra, mask)
+            oper_2 = self._get(Rc, mask) + self.C[mask]
+            result = (oper_1 - oper_2) & MASK
+            self.registers[Ra, mask] = result
+            self._set_NZCV(mask, oper_1, oper_2, result, 'sub')
+
+        return SBCS_func
+
+    def SUB(self, params):
+        Ra, Rb, Rc = self._three_parameters(params)
+        Ra, Rb, Rc = self.cpu.check_register(Ra), self.cpu.check_register(Rb), self._operand(Rc)
+
+        def SUB_func(mask):
+            self.registers[Ra, mask] = (self._get(Rb, mask) - Rc(mask)) & MASK
+
+        return SUB_func
+
+    def SUBS(self, params):
+        Ra, Rb, Rc = self._three_parameters(params)
+        Ra, Rb, Rc = self.cpu.check_register(Ra), self.cpu.check_register(Rb), self._operand(Rc)
+
+        def SUBS_func(mask):
+            oper_1 = self._get(Rb, mask)
+            oper_2 = Rc(mask)
+            result = (oper_1 - oper_2) & MASK
+            self.registers[Ra, mask] = result
+            self._set_NZCV(mask, oper_1, oper_2, result, 'sub')
+
+        return SUBS_func
+
+    # Logic
+
+    def ANDS(self, params):
+        Ra, Rb, Rc = self._three_parameters(params)
+        Ra, Rc = self.cpu.check_register(Ra), self.cpu.check_register(Rc)
+
+        def ANDS_func(mask):
+            result = self.registers[Ra, mask] & self.registers[Rc, mask]
+            self.registers[Ra, mask] = result
+            self._set_NZ(mask, result)
+
+        return ANDS_func
+
+    def BICS(self, params):
+        Ra, Rb, Rc = self._three_parameters(params)
+        Ra, Rc = self.cpu.check_register(Ra), self.cpu.check_register(Rc)
+
+        def BICS_func(mask):
+            result = self.registers[Ra, mask] & ~self.registers[Rc, mask]
+            self.registers[Ra, mask] = result
+            self._set_NZ(mask, result)
+
+        return BICS_func
+
+    def EORS(self, params):
+        Ra, Rb, Rc = self._three_parameters(params)
+        Ra, Rc = self.cpu.check_register(Ra), self.cpu.check_register(Rc)
+
+        def EORS_func(mask):
+            result = self.registers[Ra, mask] ^ self.registers[Rc, mask]
+            self.registers[Ra, mask] = result
+            self._set_NZ(mask, result)
+
+        return EORS_func
+
+    def ORRS(self, params):
+        Ra, Rb, Rc = self._three_parameters(params)
+        Ra, Rc = self.cpu.check_register(Ra), self.cpu.check_register(Rc)
+
+        def ORRS_func(mask):
+            result = self.registers[Ra, mask] | self.registers[Rc, mask]
+            self.registers[Ra, mask] = result
+            self._set_NZ(mask, result)
+
+        return ORRS_func
+
+    def TST(self, params):
+        Ra, Rb = self._two_parameters(params)
+        Ra, Rb = self.cpu.check_register(Ra), self.cpu.check_register(Rb)
+
+        def TST_func(mask):
+            self._set_NZ(mask, self.registers[Ra, mask] & self.registers[Rb, mask])
+
+        return TST_func
+
+    # Shift
+
+    def ASRS(self, params):
+        Ra, Rb, Rc = self._three_parameters(params)
+        Ra, Rb, Rc = self.cpu.check_register(Ra), self.cpu.check_register(Rb), self._operand(Rc)
+
+        def ASRS_func(mask):
+            value = self._get(Rb, mask)
+            shift = numpy.asarray(Rc(mask), dtype=numpy.uint64)
+            self.C[mask] = (shift > 0) & (((value >> numpy.minimum(shift - 1, 63)) & 1) != 0)
+            result = (value.astype(numpy.uint32).view(numpy.int32) >> numpy.minimum(shift, 31).astype(numpy.int32))
+            result = result.view(numpy.uint32)
+            self.registers[Ra, mask] = result
+            self._set_NZ(mask, result)
+
+        return ASRS_func
+
+    def LSLS(self, params):
+        Ra, Rb, Rc = self._three_parameters(params)
+        Ra, Rb, Rc = self.cpu.check_register(Ra), self.cpu.check_register(Rb), self._operand(Rc)
+
+        def LSLS_func(mask):
+            value = self._get(Rb, mask)
+            shift = numpy.minimum(Rc(mask), 32)
+            self.C[mask] = (shift < 32) & (((value >> (32 - shift)) & 1) != 0)
+            result = (value << numpy.minimum(shift, 63)) & MASK
+            self.registers[Ra, mask] = result
+            self._set_NZ(mask, result)
+
+        return LSLS_func
+
+    def LSRS(self, params):
+        Ra, Rb, Rc = self._three_parameters(params)
+        Ra, Rb, Rc = self.cpu.check_register(Ra), self.cpu.check_register(Rb), self._operand(Rc)
+
+        def LSRS_func(mask):
+            value = self._get(Rb, mask)
+            shift = numpy.minimum(Rc(mask), 63)
+            self.C[mask] = (shift > 0) & (((value >> numpy.maximum(shift, 1) - 1) & 1) != 0)
+            result = value >> shift
+            self.registers[Ra, mask] = result
+            self._set_NZ(mask, result)
+
+        return LSRS_func
+
+    # Branches
+
+    def _branch(self, params, condition):
+        label = self.cpu.get_one_parameter(self.cpu.ONE_PARAMETER, params)
+        if label == '.':
+            def B_func(mask):
+                # Same as the interpreter raising EndOfProgram, the lane stops on this instruction
+                taken = self._index[mask][condition(mask)]
+                self.halted[taken] = True
+                self.pc[taken] = self._current
+            return B_func
+
+        target = self.cpu.labels.get(label)
+        if target is None:
+            raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+
+        def B_func(mask):
+            self.pc[self._index[mask][condition(mask)]] = target
+
+        return B_func
+
+    def B(self, params):
+        return self._branch(params, lambda mask: slice(None))
+
+    def BAL(self, params):
+        return self.B(params)
+
+    def BCC(self, params):
+        return self._branch(params, lambda mask: ~self.C[mask])
+
+    def BCS(self, params):
+        return self._branch(params, lambda mask: self.C[mask])
+
+    def BEQ(self, params):
+        return self._branch(params, lambda mask: self.Z[mask])
+
+    def BGE(self, params):
+        return self._branch(params, lambda mask: self.N[mask] == self.V[mask])
+
+    def BGT(self, params):
+        return self._branch(params, lambda mask: (self.N[mask] == self.V[mask]) & ~self.Z[mask])
+
+    def BHI(self, params):
+        return self._branch(params, lambda mask: self.C[mask] & ~self.Z[mask])
+
+    def BHS(self, params):
+        return self.BCS(params)
+
+    def BLE(self, params):
+        return self._branch(params, lambda mask: self.Z[mask] | (self.N[mask] != self.V[mask]))
+
+    def BLO(self, params):
+        return self.BCC(params)
+
+    def BLS(self, params):
+        return self._branch(params, lambda mask: ~self.C[mask] | self.Z[mask])
+
+    def BLT(self, params):
+        return self._branch(params, lambda mask: self.N[mask] != self.V[mask])
+
+    def BMI(self, params):
+        return self._branch(params, lambda mask: self.N[mask])
+
+    def BNE(self, params):
+        return self._branch(params, lambda mask: ~self.Z[mask])
+
+    def BPL(self, params):
+        return self._branch(params, lambda mask: ~self.N[mask])
+
+    def BVC(self, params):
+        return self._branch(params, lambda mask: ~self.V[mask])
+
+    def BVS(self, params):
+        return self._branch(params, lambda mask: self.V[mask])
+
+    def BL(self, params):
+        label = self.cpu.get_one_parameter(self.cpu.ONE_PARAMETER, params)
+        if label in self.cpu.intrinsics:
+            raise iarm.exceptions.NotImplementedError("Intrinsic `{}` cannot be run in lanes".format(label))
+        target = self.cpu.labels.get(label)
+        if target is None:
+            raise iarm.exceptions.IarmError("Label `{}` does not exist".format(label))
+
+        def BL_func(mask):
+            self.registers[self.cpu.LR, mask] = self.registers[self.cpu.PC, mask]
+            self.pc[mask] = target
+
+        return BL_func
+
+    def BLX(self, params):
+        Rj = self.cpu.check_register(self.cpu.get_one_parameter(self.cpu.ONE_PARAMETER, params))
+
+        def BLX_func(mask):
+            address = self.registers[Rj, mask]
+            self.registers[self.cpu.LR, mask] = self.registers[self.cpu.PC, mask]
+            self.pc[mask] = address
+
+        return BLX_func
+
+    def BX(self, params):
+        Rj = self.cpu.check_register(self.cpu.get_one_parameter(self.cpu.ONE_PARAMETER, params))
+
+        def BX_func(mask):
+            self.pc[mask] = self.registers[Rj, mask]
+
+        return BX_func
+
+    # Memory
+
+    def LDR(self, params):
+        try:
+            Ra, address = self._address(params)
+        except iarm.exceptions.ParsingError:
+            # LDR Ra, =value and LDR Ra, label load a value known when decoding
+            Ra, label_name = self._two_parameters(params)
+            Ra = self.cpu.check_register(Ra)
+            label_name = label_name.lstrip('=')
+            if label_name in self.cpu.labels:
+                value = self.cpu.labels[label_name]
+            elif label_name in self.cpu.equates:
+                value = self.cpu.equates[label_name]
+            else:
+                value = self.cpu.convert_to_integer(label_name)
+
+            def LDR_func(mask):
+                self.registers[Ra, mask] = int(value)
+
+            return LDR_func
+
+        def LDR_func(mask):
+            lanes, addresses = self._check_aligned(mask, address(mask), 4)
+            lanes, value = self._load(lanes, addresses, 4)
+            self.registers[Ra, lanes] = value
+
+        return LDR_func
+
+    def LDRB(self, params):
+        Ra, address = self._address(params)
+
+        def LDRB_func(mask):
+            lanes, value = self._load(mask, address(mask), 1)
+            self.registers[Ra, lanes] = value
+
+        return LDRB_func
+
+    def LDRH(self, params):
+        Ra, address = self._address(params)
+
+        def LDRH_func(mask):
+            lanes, addresses = self._check_aligned(mask, address(mask), 2)
+            lanes, value = self._load(lanes, addresses, 2)
+            self.registers[Ra, lanes] = value
+
+        return LDRH_func
+
+    def LDRSB(self, params):
+        Ra, address = self._address(params)
+
+        def LDRSB_func(mask):
+            lanes, value = self._load(mask, address(mask), 1)
+            self.registers[Ra, lanes] = numpy.where(value & 0x80, value | 0xFFFFFF00, value)
+
+        return LDRSB_func
+
+    def LDRSH(self, params):
+        Ra, address = self._address(params)
+
+        def LDRSH_func(mask):
+            lanes, addresses = self._check_aligned(mask, address(mask), 2)
+            lanes, value = self._load(lanes, addresses, 2)
+            self.registers[Ra, lanes] = numpy.where(value & 0x8000, value | 0xFFFF0000, value)
+
+        return LDRSH_func
+
+    def STR(self, params):
+        Ra, address = self._address(params)
+
+        def STR_func(mask):
+            self._store(mask, address(mask), self._get(Ra, mask), 4)
+
+        return STR_func
+
+    def STRB(self, params):
+        Ra, address = self._address(params)
+
+        def STRB_func(mask):
+            self._store(mask, address(mask), self._get(Ra, mask), 1)
+
+        return STRB_func
+
+    def STRH(self, params):
+        Ra, address = self._address(params)
+
+        def STRH_func(mask):
+            self._store(mask, address(mask), self._get(Ra, mask), 2)
+
+        return STRH_func
+
+    def POP(self, params):
+        RPopList = self.cpu.get_one_parameter(r'\s*{(.*)}(.*)', params).split(',')
+        RPopList.reverse()  # Same order as the interpreter
+        RPopList = [self.cpu.check_register(i.strip()) for i in RPopList]
+        SP = self.cpu.SP
+
+        def POP_func(mask):
+            lanes = self._index[mask]
+            for register in RPopList:
+                lanes, value = self._load(lanes, self._get(SP, lanes), 4)
+                self._set(register, lanes, value)
+                self.registers[SP, lanes] += 4
+
+        return POP_func
+
+    def PUSH(self, params):
+        RPushList = self.cpu.get_one_parameter(r'\s*{(.*)}(.*)', params).split(',')
+        RPushList = [self.cpu.check_register(i.strip()) for i in RPushList]
+        SP = self.cpu.SP
+
+        def PUSH_func(mask):
+            lanes = self._index[mask]
+            for register in RPushList:
+                self.registers[SP, lanes] -= 4
+                self._store(lanes, self._get(SP, lanes), self._get(register, lanes), 4)
+                lanes = lanes[~self.halted[lanes]]  # Drop the lanes that faulted
+
+        return PUSH_func
@@ -0,0 +1,867 @@
+import collections
+import mmap
+import multiprocessing.shared_memory
+import os
+import random
+import struct
+import iarm.exceptions
+
+WORD = struct.Struct('<I')  # Memory is little endian
+HALFWORD = struct.Struct('<H')
+PAGE_BITS = 8  # Pages are 256 bytes
+REGION_BITS = 16  # Regions in a memory map start on a 64K boundary
+
+
+class FlatMemory(object):
+    """
+    Byte addressable memory backed by a bytearray
+
+    Bytes are accessed like a list (`memory[address]`),
+    words and half words have their own methods so an instruction does not
+    need to put them together one byte at a time.
+    Any access outside of memory raises a HardFault, like it would on real hardware.
+    """
+    def __init__(self, size, generate_random=False):
+        """
+        :param size: How many bytes of memory there are
+        :param generate_random: Should memory start out with random values instead of zero
+        """
+        self._data = bytearray(size)
+        self._size = size
+        self._generate_random = generate_random
+        if generate_random:
+            self.randomize()
+
+    def randomize(self):
+        """
+        Give a random value to every byte that still holds zero,
+        mimicking the undefined values memory has on real hardware
+        :return:
+        """
+        data = self._data
+        for i in range(self._size):
+            if not data[i]:
+                data[i] = random.randint(0, 0xFF)
+
+    def reset(self):
+        """
+        Set every byte back to zero, or to a random value if memory was made with random values
+        :return:
+        """
+        self._data[:] = bytes(self._size)
+        if self._generate_random:
+            self.randomize()
+
+    def fork(self):
+        """
+        Make a copy of memory
+        :return: A new FlatMemory with the same contents
+        """
+        other = FlatMemory(0, self._generate_random)
+        other._data = bytearray(self._data)
+        other._size = self._size
+        return other
+
+    def _fault(self, address, width):
+        return iarm.exceptions.HardFault(
+            "Memory access out of bounds; Address: {}  Size: {}  Memory size: {}".format(address, width, self._size))
+
+    def read_word(self, address):
+        """
+        Read a little endian word
+        :param address: The byte address of the lowest byte
+        :return: The unsigned value
+        """
+        if address < 0:
+            raise self._fault(address, 4)
+        try:
+            return WORD.unpack_from(self._data, address)[0]
+        except struct.error:
+            raise self._fault(address, 4) from None
+
+    def write_word(self, address, value):
+        """
+        Write a little endian word, only the lowest 32 bits of value are kept
+        :param address: The byte address of the lowest byte
+        :param value: The value to write
+        :return:
+        """
+        if address < 0:
+            raise self._fault(address, 4)
+        try:
+            WORD.pack_into(self._data, address, value & 0xFFFFFFFF)
+        except struct.error:
+            raise self._fault(address, 4) from None
+
+    def read_halfword(self, address):
+        """
+        Read a little endian half word
+        :param address: The byte address of the lowest byte
+        :return: The unsigned value
+        """
+        if address < 0:
+            raise self._fault(address, 2)
+        try:
+            return HALFWORD.unpack_from(self._data, address)[0]
+        except struct.error:
+            raise self._fault(address, 2) from None
+
+    def write_halfword(self, address, value):
+        """
+        Write a little endian half word, only the lowest 16 bits of value are kept
+        :param address: The byte address of the lowest byte
+        :param value: The value to write
+        :return:
+        """
+        if address < 0:
+            raise self._fault(address, 2)
+        try:
+            HALFWORD.pack_into(self._data, address, value & 0xFFFF)
+        except struct.error:
+            raise self._fault(address, 2) from None
+
+    def read(self, address, length):
+        """
+        Read a block of bytes
+        :param address: The byte address to start at
+        :param length: How many bytes to read
+        :return: The bytes
+        """
+        if address < 0 or address + length > self._size:
+            raise self._fault(address, length)
+        return bytes(self._data[address:address + length])
+
+    def write(self, address, data):
+        """
+        Write a block of bytes
+        :param address: The byte address to start at
+        :param data: The bytes to write
+        :return:
+        """
+        if address < 0 or address + len(data) > self._size:
+            raise self._fault(address, len(data))
+        self._data[address:address + len(data)] = data
+
+    def load(self, address, data):
+        """
+        Put data in memory before the program runs, used by directives
+        Unlike `write`, this also works on read only memory
+        :param address: The byte address to start at
+        :param data: The bytes to write
+        :return:
+        """
+        self.write(address, data)
+
+    def __getitem__(self, address):
+        if address < 0:
+            raise self._fault(address, 1)
+        try:
+            return self._data[address]
+        except IndexError:
+            raise self._fault(address, 1) from None
+
+    def __setitem__(self, address, value):
+        if address < 0:
+            raise self._fault(address, 1)
+        try:
+            self._data[address] = value & 0xFF
+        except IndexError:
+            raise self._fault(address, 1) from None
+
+    def __len__(self):
+        return self._size
+
+
+class MappedMemory(FlatMemory):
+    """
+    Memory backed by a memory mapped file
+
+    The file is not read into python, the operating system loads it as it is accessed,
+    so large images (lookup tables, sample buffers, firmware) can be used straight away.
+    Writes land directly in the file unless the memory is made with `copy_on_write`.
+    """
+    def __init__(self, path, size=None, copy_on_write=False):
+        """
+        :param path: The file to map
+        :param size: How many bytes of the file to map. Defaults to the size of the file.
+            If the file is smaller it is made bigger, unless copy_on_write is set
+        :param copy_on_write: Keep writes in memory instead of writing them to the file
+        """
+        self.path = path
+        self._copy_on_write = copy_on_write
+        with open(path, 'rb' if copy_on_write else 'r+b') as f:
+            file_size = os.fstat(f.fileno()).st_size
+            if size is None:
+                size = file_size
+            elif size > file_size:
+                if copy_on_write:
+                    raise ValueError("File {} is {} bytes, smaller than {}".format(path, file_size, size))
+                f.truncate(size)
+            if size == 0:
+                raise ValueError("Cannot map an empty file")
+            self._data = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_COPY if copy_on_write else mmap.ACCESS_WRITE)
+        self._size = size
+        self._generate_random = False
+
+    def randomize(self):
+        """
+        The file holds real values, so they are never replaced with random ones
+        :return:
+        """
+        pass
+
+    def reset(self):
+        """
+        Throw away anything written since the file was mapped if it is copy on write,
+        otherwise the file is the memory and is left alone
+        :return:
+        """
+        if self._copy_on_write:
+            self.close()
+            self.__init__(self.path, self._size, True)
+
+    def flush(self):
+        """
+        Make sure everything written has reached the file
+        :return:
+        """
+        self._data.flush()
+
+    def close(self):
+        """
+        Unmap the file, memory cannot be used afterwards
+        :return:
+        """
+        self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReadOnlyMemory(FlatMemory):
+    """
+    Memory that the program can read but not write, like flash
+
+    Directives put their constants here with `load`, anything the program writes raises a HardFault.
+    Since the program cannot change it, forks share the same bytes,
+    and `share` puts it in shared memory so other processes can use it without a copy of their own.
+    """
+    def __init__(self, size=0, data=None):
+        """
+        :param size: How many bytes of memory there are, if data is not given
+        :param data: The contents, any bytes like object. It is used as is, not copied
+        """
+        self._data = bytearray(size) if data is None else data
+        self._size = len(self._data)
+        self._generate_random = False
+        self._shared_memory = None  # Kept so the shared memory stays open as long as this does
+
+    @classmethod
+    def from_shared(cls, name):
+        """
+        Use read only memory that another process shared
+        Before python 3.13 attaching always registers the shared memory with this process's resource tracker.
+        That is harmless in processes started by multiprocessing, which use the tracker of the process that
+        made it, but a process started any other way removes the shared memory when it exits.
+        Call `close` once done with it.
+        :param name: The name of the shared memory, from `share`
+        :return: A ReadOnlyMemory that reads straight from the shared memory
+        """
+        try:
+            # Only the process that made the shared memory should remove it
+            shared = multiprocessing.shared_memory.SharedMemory(name, track=False)
+        except TypeError:
+            shared = multiprocessing.shared_memory.SharedMemory(name)
+        memory = cls(data=shared.buf.toreadonly())
+        memory._shared_memory = shared
+        return memory
+
+    def share(self):
+        """
+        Copy the contents into shared memory and read from there from now on
+        The caller owns the shared memory and has to `unlink` it once every process is done with it.
+        Close it with this memory's `close`, not the SharedMemory's, which cannot close while this reads from it.
+        :return: The multiprocessing.shared_memory.SharedMemory, pass its `name` to `from_shared`
+        """
+        shared = multiprocessing.shared_memory.SharedMemory(create=True, size=self._size)
+        shared.buf[:self._size] = self._data
+        self._data = shared.buf.toreadonly()
+        self._shared_memory = shared
+        return shared
+
+    def _read_only(self, address, width):
+        return iarm.exceptions.HardFault(
+            "Memory is read only; Address: {}  Size: {}".format(address, width))
+
+    def write_word(self, address, value):
+        raise self._read_only(address, 4)
+
+    def write_halfword(self, address, value):
+        raise self._read_only(address, 2)
+
+    def write(self, address, data):
+        raise self._read_only(address, len(data))
+
+    def __setitem__(self, address, value):
+        raise self._read_only(address, 1)
+
+    def load(self, address, data):
+        """
+        Put data in memory before the program runs, used by directives
+        If the contents are shared they are copied first, so nothing else sees the change
+        :param address: The byte address to start at
+        :param data: The bytes to write
+        :return:
+        """
+        if address < 0 or address + len(data) > self._size:
+            raise self._fault(address, len(data))
+        if not isinstance(self._data, bytearray):
+            self._data = bytearray(self._data)
+            self._shared_memory = None
+        self._data[address:address + len(data)] = data
+
+    def randomize(self):
+        """
+        Read only memory holds what was loaded into it, so it is never given random values
+        :return:
+        """
+        pass
+
+    def reset(self):
+        """
+        Like flash, read only memory keeps its contents
+        :return:
+        """
+        pass
+
+    def fork(self):
+        """
+        Share the contents with the copy, whichever one is loaded into next makes its own copy first
+        :return: A new ReadOnlyMemory with the same contents
+        """
+        if isinstance(self._data, bytearray):
+            self._data = bytes(self._data)
+        # Shared memory gets a view of its own, so each can be closed on its own
+        other = ReadOnlyMemory(data=self._data if self._shared_memory is None else memoryview(self._data))
+        other._shared_memory = self._shared_memory
+        return other
+
+    def close(self):
+        """
+        Stop reading from shared memory, the memory cannot be used afterwards
+        The shared memory is closed in this process once this and every fork of it are closed.
+        It is not removed, that is up to whoever called `share`.
+        Memory that is not shared is left as it is.
+        :return:
+        """
+        if self._shared_memory is None:
+            return
+        self._data.release()
+        try:
+            self._shared_memory.close()
+        except BufferError:
+            pass  # A fork still reads from it, closing that fork closes it
+        self._shared_memory = None
+
+
+# A part of a memory map, `start` is the address of the first byte of `memory`
+Region = collections.namedtuple('Region', ['name', 'start', 'memory'])
+
+
+class MemoryMap(object):
+    """
+    Memory made of regions at different addresses, like the flash, SRAM, and peripherals of a microcontroller
+
+    Each region is its own memory (read only, paged, memory mapped file, ...) and is accessed
+    with addresses relative to its start. Regions start on a 64K boundary so the region for an
+    address is found with a single lookup of the address's 64K block.
+    Accessing an address that is not in any region raises a HardFault.
+    The access methods are the same as FlatMemory.
+    """
+    def __init__(self, size=2**32):
+        """
+        :param size: The size of the address space
+        """
+        self._size = size
+        self.regions = []
+        self._table = {}  # 64K block number to the Region that covers it
+
+    def add_region(self, name, start, memory):
+        """
+        Put memory at an address
+        :param name: What to call the region
+        :param start: The address of the first byte, must be a multiple of 64K
+        :param memory: The memory for the region
+        :return: The Region
+        """
+        if start % (1 << REGION_BITS):
+            raise ValueError("Region {} must start on a 64K boundary, not {:#x}".format(name, start))
+        if start < 0 or start + len(memory) > self._size:
+            raise ValueError("Region {} does not fit in the address space".format(name))
+        blocks = range(start >> REGION_BITS, ((start + len(memory) - 1) >> REGION_BITS) + 1)
+        for block in blocks:
+            if block in self._table:
+                raise ValueError("Region {} overlaps region {}".format(name, self._table[block].name))
+        region = Region(name, start, memory)
+        self.regions.append(region)
+        for block in blocks:
+            self._table[block] = region
+        return region
+
+    def remove_region(self, name):
+        """
+        Take a region out of the map
+        :param name: The name of the region
+        :return: The Region
+        """
+        region = self.named(name)
+        self.regions.remove(region)
+        self._table = {block: value for block, value in self._table.items() if value is not region}
+        return region
+
+    def attach(self, peripheral, address):
+        """
+        Attach a peripheral to the region that address is in
+        :param peripheral: The iarm.peripherals.Peripheral
+        :param address: Where its first register is
+        :return:
+        """
+        region = self.region(address)
+        try:
+            attach = region.memory.attach
+        except AttributeError:
+            raise ValueError("Peripherals cannot be attached to region {}".format(region.name)) from None
+        attach(peripheral, address - region.start)
+
+    def region(self, address):
+        """
+        Find the region an address is in
+        :param address: The byte address
+        :return: The Region
+        """
+        try:
+            return self._table[address >> REGION_BITS]
+        except (KeyError, TypeError):
+            raise iarm.exceptions.HardFault("No memory at address {:#x}".format(address)) from None
+
+    def named(self, name):
+        """
+        Find a region by its name
+        :param name: The name of the region
+        :return: The Region
+        """
+        for region in self.regions:
+            if region.name == name:
+                return region
+        raise KeyError(name)
+
+    def __getitem__(self, address):
+        region = self.region(address)
+        return region.memory[address - region.start]
+
+    def __setitem__(self, address, value):
+        region = self.region(address)
+        region.memory[address - region.start] = value
+
+    def read_word(self, address):
+        region = self.region(address)
+        return region.memory.read_word(address - region.start)
+
+    def write_word(self, address, value):
+        region = self.region(address)
+        region.memory.write_word(address - region.start, value)
+
+    def read_halfword(self, address):
+        region = self.region(address)
+        return region.memory.read_halfword(address - region.start)
+
+    def write_halfword(self, address, value):
+        region = self.region(address)
+        region.memory.write_halfword(address - region.start, value)
+
+    def read(self, address, length):
+        region = self.region(address)
+        return region.memory.read(address - region.start, length)
+
+    def write(self, address, data):
+        region = self.region(address)
+        region.memory.write(address - region.start, data)
+
+    def load(self, address, data):
+        region = self.region(address)
+        region.memory.load(address - region.start, data)
+
+    def randomize(self):
+        for region in self.regions:
+            region.memory.randomize()
+
+    def reset(self):
+        for region in self.regions:
+            region.memory.reset()
+
+    def fork(self):
+        """
+        Make a copy of the map where every region is forked
+        :return: The new MemoryMap
+        """
+        other = MemoryMap(self._size)
+        for region in self.regions:
+            other.add_region(region.name, region.start, region.memory.fork())
+        return other
+
+    def __len__(self):
+        return self._size
+
+
+def cortex_m0_map(flash_size=0x8000, sram_size=0x2000, generate_random=False):
+    """
+    Make the memory map of a Cortex-M0+
+    Flash (read only) at 0x00000000, SRAM at 0x20000000, peripherals at 0x40000000,
+    and the private peripheral bus (SysTick, NVIC, ...) at 0xE0000000.
+    :param flash_size: How many bytes of flash there are
+    :param sram_size: How many bytes of SRAM there are
+    :param generate_random: Should SRAM start out with random values instead of zero
+    :return: The MemoryMap
+    """
+    memory = MemoryMap()
+    memory.add_region('flash', 0x00000000, ReadOnlyMemory(flash_size))
+    memory.add_region('sram', 0x20000000, PagedMemory(sram_size, generate_random))
+    memory.add_region('peripherals', 0x40000000, PagedMemory(0x20000000))
+    memory.add_region('ppb', 0xE0000000, PagedMemory(0x100000))
+    return memory
+
+
+class PagedMemory(object):
+    """
+    Byte addressable memory made of fixed size pages that are made when first used and copied on write
+
+    Only pages that have been written to take up space, so memory can cover the full 32 bit
+    address space of a Cortex-M0+ (SRAM at 0x20000000, peripherals at 0x40000000) as long as a
+    program only touches a small part of it. Pages that have not been written read as zero.
+    Pages are shared until they are written to, and `fork` shares every page between the two copies,
+    so a copy only costs as much memory as is written to it afterwards.
+    The last page read and the last page written are remembered so accesses near each other
+    skip looking the page up.
+    Peripherals (see iarm.peripherals) can be attached to whole pages. Their pages are never remembered
+    as the last page, so checking for a peripheral only happens when the page has to be looked up,
+    and accesses to ordinary memory are not slowed down.
+    The access methods are the same as FlatMemory.
+    """
+    def __init__(self, size, generate_random=False, page_bits=PAGE_BITS):
+        """
+        :param size: How many bytes of memory there are, up to 2**32
+        :param generate_random: Should memory start out with random values instead of zero
+        :param page_bits: Pages are 2**page_bits bytes
+        """
+        self._size = size
+        self._generate_random = generate_random
+        self._page_bits = page_bits
+        self._page_size = 1 << page_bits
+        self._offset_mask = self._page_size - 1
+        self._last_word = self._page_size - 4  # Words and half words starting after these offsets are split across pages
+        self._last_halfword = self._page_size - 2
+        self._zero_page = bytes(self._page_size)
+        self._pages = {}  # Page number to page, for pages that have been used
+        self._owned = set()  # Pages this memory has its own copy of
+        self._devices = {}  # Page number to (address, peripheral) for pages that belong to a peripheral
+        self._forget_pages()
+
+    def _forget_pages(self):
+        # The last page read from and written to
+        self._read_index = self._write_index = -1
+        self._read_page = self._write_page = None
+
+    def _page(self, index):
+        """
+        Get a page to read from
+        :param index: The page number
+        :return: The page
+        """
+        try:
+            page = self._pages[index]
+        except KeyError:
+            if self._generate_random:
+                page = self._writable(index)
+            else:
+                page = self._zero_page
+        self._read_index = index
+        self._read_page = page
+        return page
+
+    def _writable(self, index):
+        """
+        Get a page that can be written to, copying it first if it is shared
+        :param index: The page number
+        :return: The page
+        """
+        if index in self._owned:
+            page = self._pages[index]
+        else:
+            try:
+                page = self._pages[index] = bytearray(self._pages[index])
+            except KeyError:
+                page = self._pages[index] = bytearray(self._page_size)
+                if self._generate_random:
+                    self._randomize_page(page)
+            self._owned.add(index)
+            if index == self._read_index:
+                self._read_page = page
+        self._write_index = index
+        self._write_page = page
+        return page
+
+    def attach(self, peripheral, address):
+        """
+        Send accesses to `peripheral.size` bytes at address to the peripheral
+        The peripheral takes over every page it touches, so it should start on a page boundary.
+        :param peripheral: The iarm.peripherals.Peripheral
+        :param address: Where its first register is
+        :return:
+        """
+        if address < 0 or address + peripheral.size > self._size:
+            raise ValueError("Peripheral at {:#x} does not fit in memory".format(address))
+        pages = range(address >> self._page_bits, ((address + peripheral.size - 1) >> self._page_bits) + 1)
+        for index in pages:
+            if index in self._devices:
+                raise ValueError("Peripheral at {:#x} overlaps another peripheral".format(address))
+        for index in pages:
+            self._devices[index] = (address, peripheral)
+            self._pages.pop(index, None)
+            self._owned.discard(index)
+        self._forget_pages()
+
+    def _device(self, address, width):
+        """
+        Find the peripheral for an access
+        :return: The peripheral and the offset of address from its first register
+        """
+        start, peripheral = self._devices[address >> self._page_bits]
+        offset = address - start
+        if offset < 0 or offset + width > peripheral.size:
+            raise iarm.exceptions.HardFault(
+                "Access outside of peripheral {}; Address: {}  Size: {}".format(type(peripheral).__name__, address, width))
+        return peripheral, offset
+
+    def _device_read(self, address, width):
+        peripheral, offset = self._device(address, width)
+        return peripheral.read(offset, width) & ((1 << 8 * width) - 1)
+
+    def _device_write(self, address, width, value):
+        peripheral, offset = self._device(address, width)
+        peripheral.write(offset, width, value & ((1 << 8 * width) - 1))
+
+    def _randomize_page(self, page):
+        for i in range(self._page_size):
+            if not page[i]:
+                page[i] = random.randint(0, 0xFF)
+
+    def randomize(self):
+        """
+        Give a random value to every byte that still holds zero,
+        mimicking the undefined values memory has on real hardware
+        Pages that have not been used yet are given random values when they are first used.
+        :return:
+        """
+        self._generate_random = True
+        for index in list(self._pages):
+            self._randomize_page(self._writable(index))
+
+    def reset(self):
+        """
+        Set every byte back to zero, or to a random value if memory was made with random values
+        :return:
+        """
+        self._pages = {}
+        self._owned = set()
+        self._forget_pages()
+        for _, peripheral in set(self._devices.values()):
+            peripheral.reset()
+
+    def fork(self):
+        """
+        Make a copy of memory that shares every page with this one until either of them writes to it
+        :return: A new PagedMemory with the same contents
+        """
+        other = PagedMemory.__new__(PagedMemory)
+        other.__dict__.update(self.__dict__)
+        other._pages = dict(self._pages)
+        other._devices = dict(self._devices)  # The peripherals themselves are shared
+        # Neither copy can write to the pages now that they are shared
+        self._owned = set()
+        other._owned = set()
+        self._write_index = other._write_index = -1
+        self._write_page = other._write_page = None
+        return other
+
+    @property
+    def pages_owned(self):
+        """
+        :return: How many pages this memory has its own copy of
+        """
+        return len(self._owned)
+
+    def _fault(self, address, width):
+        return iarm.exceptions.HardFault(
+            "Memory access out of bounds; Address: {}  Size: {}  Memory size: {}".format(address, width, self._size))
+
+    def read_word(self, address):
+        """
+        Read a little endian word
+        :param address: The byte address of the lowest byte
+        :return: The unsigned value
+        """
+        offset = address & self._offset_mask
+        if address < 0 or address + 4 > self._size or offset > self._last_word:
+            # Out of memory or split across two pages
+            return WORD.unpack(self.read(address, 4))[0]
+        index = address >> self._page_bits
+        if index == self._read_index:
+            page = self._read_page
+        elif index in self._devices:
+            return self._device_read(address, 4)
+        else:
+            page = self._page(index)
+        return WORD.unpack_from(page, offset)[0]
+
+    def write_word(self, address, value):
+        """
+        Write a little endian word, only the lowest 32 bits of value are kept
+        :param address: The byte address of the lowest byte
+        :param value: The value to write
+        :return:
+        """
+        offset = address & self._offset_mask
+        if address < 0 or address + 4 > self._size or offset > self._last_word:
+            self.write(address, WORD.pack(value & 0xFFFFFFFF))
+            return
+        index = address >> self._page_bits
+        if index == self._write_index:
+            page = self._write_page
+        elif index in self._devices:
+            self._device_write(address, 4, value)
+            return
+        else:
+            page = self._writable(index)
+        WORD.pack_into(page, offset, value & 0xFFFFFFFF)
+
+    def read_halfword(self, address):
+        """
+        Read a little endian half word
+        :param address: The byte address of the lowest byte
+        :return: The unsigned value
+        """
+        offset = address & self._offset_mask
+        if address < 0 or address + 2 > self._size or offset > self._last_halfword:
+            return HALFWORD.unpack(self.read(address, 2))[0]
+        index = address >> self._page_bits
+        if index == self._read_index:
+            page = self._read_page
+        elif index in self._devices:
+            return self._device_read(address, 2)
+        else:
+            page = self._page(index)
+        return HALFWORD.unpack_from(page, offset)[0]
+
+    def write_halfword(self, address, value):
+        """
+        Write a little endian half word, only the lowest 16 bits of value are kept
+        :param address: The byte address of the lowest byte
+        :param value: The value to write
+        :return:
+        """
+        offset = address & self._offset_mask
+        if address < 0 or address + 2 > self._size or offset > self._last_halfword:
+            self.write(address, HALFWORD.pack(value & 0xFFFF))
+            return
+        index = address >> self._page_bits
+        if index == self._write_index:
+            page = self._write_page
+        elif index in self._devices:
+            self._device_write(address, 2, value)
+            return
+        else:
+            page = self._writable(index)
+        HALFWORD.pack_into(page, offset, value & 0xFFFF)
+
+    def read(self, address, length):
+        """
+        Read a block of bytes
+        :param address: The byte address to start at
+        :param length: How many bytes to read
+        :return: The bytes
+        """
+        if address < 0 or address + length > self._size:
+            raise self._fault(address, length)
+        data = bytearray()
+        end = address + length
+        while address < end:
+            offset = address & self._offset_mask
+            count = min(self._page_size - offset, end - address)
+            if address >> self._page_bits in self._devices:
+                data += bytes(self._device_read(address + i, 1) for i in range(count))
+            else:
+                data += self._page(address >> self._page_bits)[offset:offset + count]
+            address += count
+        return bytes(data)
+
+    def write(self, address, data):
+        """
+        Write a block of bytes
+        :param address: The byte address to start at
+        :param data: The bytes to write
+        :return:
+        """
+        if address < 0 or address + len(data) > self._size:
+            raise self._fault(address, len(data))
+        data = memoryview(bytes(data))
+        while data:
+            offset = address & self._offset_mask
+            count = min(self._page_size - offset, len(data))
+            if address >> self._page_bits in self._devices:
+                for i in range(count):
+                    self._device_write(address + i, 1, data[i])
+            else:
+                self._writable(address >> self._page_bits)[offset:offset + count] = data[:count]
+            address += count
+            data = data[count:]
+
+    def load(self, address, data):
+        """
+        Put data in memory before the program runs, used by directives
+        Unlike `write`, this also works on read only memory
+        :param address: The byte address to start at
+        :param data: The bytes to write
+        :return:
+        """
+        self.write(address, data)
+
+    def __getitem__(self, address):
+        if address < 0 or address >= self._size:
+            raise self._fault(address, 1)
+        index = address >> self._page_bits
+        if index == self._read_index:
+            page = self._read_page
+        elif index in self._devices:
+            return self._device_read(address, 1)
+        else:
+            page = self._page(index)
+        return page[address & self._offset_mask]
+
+    def __setitem__(self, address, value):
+        if address < 0 or address >= self._size:
+            raise self._fault(address, 1)
+        index = address >> self._page_bits
+        if index == self._write_index:
+            page = self._write_page
+        elif index in self._devices:
+            self._device_write(address, 1, value)
+            return
+        else:
+            page = self._writable(index)
+        page[address & self._offset_mask] = value & 0xFF
+
+    def __len__(self):
+        return self._size
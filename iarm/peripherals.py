@@ -0,0 +1,710 @@
+"""
+Peripherals that are mapped into memory
+
+A peripheral is attached to an interpreter at an address, and from then on
+loads and stores to its registers call its `read` and `write` instead of going to memory:
+
+    uart = MyUart(0x40004000)
+    interp.attach(uart)
+
+Peripherals take over whole pages of memory (256 bytes), so put them on a page boundary.
+Only accesses that miss the page cache check for a peripheral, so ordinary memory is not slowed down.
+"""
+
+import iarm.exceptions
+
+
+class Peripheral(object):
+    """
+    A device whose registers are mapped into memory
+
+    By default the registers are plain storage. Subclasses override `read` and `write`
+    to give them behaviour, and can call up to this class to keep the stored value.
+    """
+    size = 256  # How many bytes of registers there are
+
+    def __init__(self, base):
+        """
+        :param base: The address of the first register
+        """
+        self.base = base
+        self.cpu = None  # The interpreter, set when attached
+        self.registers = bytearray(self.size)
+
+    def attached(self, cpu):
+        """
+        Called when the peripheral is attached to an interpreter
+        :param cpu: The interpreter
+        :return:
+        """
+        self.cpu = cpu
+
+    def read(self, offset, width):
+        """
+        Read a register
+        :param offset: The byte offset from base
+        :param width: 1, 2, or 4 bytes
+        :return: The unsigned value
+        """
+        return int.from_bytes(self.registers[offset:offset + width], 'little')
+
+    def write(self, offset, width, value):
+        """
+        Write a register
+        :param offset: The byte offset from base
+        :param width: 1, 2, or 4 bytes
+        :param value: The value, already masked to width
+        :return:
+        """
+        self.registers[offset:offset + width] = value.to_bytes(width, 'little')
+
+    def reset(self):
+        """
+        Put the registers back the way they were, called when the interpreter is reset
+        :return:
+        """
+        self.registers[:] = bytes(self.size)
+
+    def flush(self):
+        """
+        Called when the interpreter stops running, for peripherals that keep output in a buffer
+        :return:
+        """
+
+
+class SysTick(Peripheral):
+    """
+    The SysTick timer, counting down once every cycle (instruction)
+
+    The current value is never counted down as instructions run, it is worked out from
+    `cpu.cycles` when it is read, and the next time it reaches zero is worked out ahead of time
+    (`next_wrap`), so a running timer adds nothing to the cost of an instruction.
+
+    Registers, from 0xE000E010
+    0x0 SYST_CSR: bit 0 ENABLE, bit 1 TICKINT, bit 2 CLKSOURCE, bit 16 COUNTFLAG (cleared when read)
+    0x4 SYST_RVR: The 24 bit reload value
+    0x8 SYST_CVR: The current value, writing anything clears it to zero
+    0xC SYST_CALIB: Always zero
+    """
+    size = 16
+    BASE = 0xE000E010
+    CSR, RVR, CVR = 0x0, 0x4, 0x8
+    ENABLE, TICKINT, CLKSOURCE = 1 << 0, 1 << 1, 1 << 2
+    COUNTFLAG = 1 << 16
+    MASK = 0xFFFFFF
+
+    def __init__(self, base=BASE):
+        super().__init__(base)
+        self.reset()
+
+    def reset(self):
+        self.control = 0
+        self.reload = 0
+        self._value = 0  # The value at _since while running, or the value while stopped
+        self._since = 0  # The cycle the timer was last started or changed
+        self._flag_since = 0  # Reaching zero after this cycle sets COUNTFLAG
+        self._counted = False  # The counter reached zero before it was last changed, and COUNTFLAG has not been read
+        self.next_wrap = None  # The cycle the timer next reaches zero, if it is running
+
+    @property
+    def _now(self):
+        return self.cpu.cycles if self.cpu is not None else 0
+
+    def value(self, now=None):
+        """
+        The current value of the counter
+        :param now: The cycle to work it out for, defaults to the current one
+        :return: The value
+        """
+        if not self.control & self.ENABLE:
+            return self._value
+        elapsed = (self._now if now is None else now) - self._since
+        if elapsed <= self._value:
+            return self._value - elapsed
+        if not self.reload:
+            return 0  # Stays at zero once there is nothing to reload
+        return self.reload - (elapsed - self._value - 1) % (self.reload + 1)
+
+    def wrap_after(self, cycle):
+        """
+        When does the counter next reach zero (from one) after a cycle
+        :param cycle: The cycle to look after
+        :return: The cycle it reaches zero, or None if it never does
+        """
+        if not self.control & self.ENABLE:
+            return None
+        first = self._since + self._value  # The first time it reaches zero, only counts if it started above zero
+        if cycle < first and self._value:
+            return first
+        if not self.reload:
+            return None
+        period = self.reload + 1
+        return first + (max(cycle - first, 0) // period + 1) * period
+
+    def _latch(self):
+        """
+        Remember the current value and whether COUNTFLAG is set before the timer is changed
+        :return: The current value
+        """
+        now = self._now
+        wrap = self.wrap_after(self._flag_since)
+        self._counted = self._counted or (wrap is not None and wrap <= now)
+        self._flag_since = now
+        return self.value(now)
+
+    def _restart(self, value):
+        self._value = value
+        self._since = self._now
+        self.next_wrap = self.wrap_after(self._since)
+        self._schedule()
+
+    def _schedule(self):
+        """
+        Ask the interpreter to raise the SysTick exception when the counter next reaches zero
+        Nothing is scheduled unless TICKINT is set, so a timer that is only polled costs nothing.
+        :return:
+        """
+        if self.next_wrap is None or not self.control & self.TICKINT or self.cpu is None:
+            return
+        wrap = self.next_wrap
+        self.cpu.schedule(wrap, lambda: self._wrapped(wrap))
+
+    def _wrapped(self, wrap):
+        if wrap != self.next_wrap or not self.control & self.TICKINT:
+            return  # The timer was changed after this was scheduled
+        if self.cpu.nvic is not None:
+            self.cpu.nvic.pend(NVIC.SYSTICK)
+        self.next_wrap = self.wrap_after(wrap)
+        self._schedule()
+
+    def read(self, offset, width):
+        register = offset & ~3
+        if register == self.CSR:
+            self._latch()
+            value = self.control | (self.COUNTFLAG if self._counted else 0)
+            self._counted = False
+        elif register == self.RVR:
+            value = self.reload
+        elif register == self.CVR:
+            value = self.value()
+        else:
+            value = 0
+        return value >> (8 * (offset & 3))
+
+    def write(self, offset, width, value):
+        register = offset & ~3
+        value <<= 8 * (offset & 3)
+        current = self._latch()
+        if register == self.CSR:
+            self.control = value & (self.ENABLE | self.TICKINT | self.CLKSOURCE)
+            self._restart(current)
+        elif register == self.RVR:
+            self.reload = value & self.MASK
+            self._restart(current)
+        elif register == self.CVR:
+            self._counted = False
+            self._restart(0)
+
+
+class NVIC(Peripheral):
+    """
+    The Nested Vectored Interrupt Controller, which decides when exceptions are taken
+
+    Nothing is checked between instructions. Pending an exception schedules a check with the
+    interpreter, which runs once the current instruction is done, so a program that never
+    uses interrupts runs as fast as it did without an NVIC.
+
+    Handlers are found by their CMSIS label, like `SysTick_Handler` or `IRQ3_Handler`,
+    or can be given by exception number in `handlers`. A handler returns by branching to the
+    EXC_RETURN value the interpreter puts in LR (`BX LR`, or `POP {PC}` after `PUSH {LR}`).
+
+    Attaching the NVIC also attaches the System Control Block (`scb`).
+
+    Registers, from 0xE000E100
+    0x000 NVIC_ISER: Writing a one enables an interrupt, reads the enabled interrupts
+    0x080 NVIC_ICER: Writing a one disables an interrupt, reads the enabled interrupts
+    0x100 NVIC_ISPR: Writing a one pends an interrupt, reads the pending interrupts
+    0x180 NVIC_ICPR: Writing a one clears a pending interrupt, reads the pending interrupts
+    0x300 - 0x31C NVIC_IPR0 - 7: One priority byte per interrupt, only the top two bits are kept
+    """
+    size = 0x320
+    BASE = 0xE000E100
+    ISER, ICER, ISPR, ICPR, IPR = 0x000, 0x080, 0x100, 0x180, 0x300
+    INTERRUPTS = 32
+
+    # Exception numbers
+    NMI = 2
+    HARDFAULT = 3
+    SVCALL = 11
+    PENDSV = 14
+    SYSTICK = 15
+    IRQ0 = 16
+
+    THREAD = 0x100  # The priority of code that is not in a handler, lower than any exception
+    HANDLER_NAMES = {
+        NMI: 'NMI_Handler',
+        HARDFAULT: 'HardFault_Handler',
+        SVCALL: 'SVC_Handler',
+        PENDSV: 'PendSV_Handler',
+        SYSTICK: 'SysTick_Handler',
+    }
+
+    def __init__(self, base=BASE, handlers=None):
+        """
+        :param base: The address of the first register
+        :param handlers: Exception number to handler label, for handlers without the CMSIS name
+        """
+        super().__init__(base)
+        self.handlers = dict(handlers or {})
+        self.scb = SCB(self)
+        self.reset()
+
+    def reset(self):
+        self.enabled = 0  # Bit n is set if IRQn is enabled
+        self.pending = set()  # Exception numbers
+        self.active = []  # Exception numbers, the one being handled last
+        self.priorities = {self.NMI: -2, self.HARDFAULT: -1}  # Exception number to priority, zero if not set
+
+    def attached(self, cpu):
+        super().attached(cpu)
+        cpu.nvic = self
+        cpu.attach(self.scb)
+
+    def priority(self, number):
+        return self.priorities.get(number, 0)
+
+    def execution_priority(self):
+        """
+        The priority an exception has to beat to be taken
+        :return: The priority of the active exceptions, or of thread mode, boosted to zero by PRIMASK
+        """
+        priority = min((self.priority(number) for number in self.active), default=self.THREAD)
+        if self.cpu.registers[self.cpu.PRIMASK] & 1:
+            priority = min(priority, 0)
+        return priority
+
+    def is_enabled(self, number):
+        return number < self.IRQ0 or bool(self.enabled >> (number - self.IRQ0) & 1)
+
+    def next_pending(self):
+        """
+        :return: The enabled pending exception that would be taken next, or None
+        """
+        ready = [number for number in self.pending if self.is_enabled(number)]
+        if not ready:
+            return None
+        return min(ready, key=lambda number: (self.priority(number), number))
+
+    def pend(self, number):
+        """
+        Make an exception pending, it is taken once the current instruction is done if its priority allows
+        :param number: The exception number, 16 + n for IRQn
+        :return:
+        """
+        self.pending.add(number)
+        if self.cpu is not None:
+            self.cpu.schedule(self.cpu.cycles, self.check)
+
+    def irq(self, n):
+        """
+        Make an interrupt pending, like a peripheral signalling it
+        :param n: The interrupt number
+        :return:
+        """
+        self.pend(self.IRQ0 + n)
+
+    def check(self):
+        """
+        Take pending exceptions that have a higher priority than what is running
+        Called by the interpreter between instructions.
+        :return:
+        """
+        while True:
+            number = self.next_pending()
+            if number is None or self.priority(number) >= self.execution_priority():
+                return
+            self.pending.discard(number)
+            self.active.append(number)
+            self.cpu.enter_exception(number, self.handler(number))
+
+    def returned(self, number):
+        """
+        Called by the interpreter when a handler returns
+        :param number: The exception number that was being handled
+        :return:
+        """
+        if number in self.active:
+            self.active.remove(number)  # An exception cannot preempt itself, so it is only in here once
+        self.check()  # Go straight into the next handler if one is waiting
+
+    def handler(self, number):
+        """
+        Find the program index of the handler for an exception
+        :param number: The exception number
+        :return: The index of its first instruction
+        """
+        name = self.handlers.get(number)
+        if name is None:
+            name = self.HANDLER_NAMES.get(number, 'IRQ{}_Handler'.format(number - self.IRQ0))
+        index = self.cpu.labels.get(name.upper())  # Labels are kept in upper case
+        if index is None:
+            raise iarm.exceptions.HardFault("No handler for exception {}, define the label {}".format(number, name))
+        return index
+
+    def _interrupts(self, mask):
+        return {self.IRQ0 + n for n in range(self.INTERRUPTS) if mask >> n & 1}
+
+    def read(self, offset, width):
+        if offset >= self.IPR:
+            return super().read(offset, width)
+        register = offset & ~3
+        if register in (self.ISER, self.ICER):
+            value = self.enabled
+        elif register in (self.ISPR, self.ICPR):
+            value = sum(1 << (number - self.IRQ0) for number in self.pending if number >= self.IRQ0)
+        else:
+            value = 0
+        return (value >> (8 * (offset & 3))) & ((1 << (8 * width)) - 1)
+
+    def write(self, offset, width, value):
+        if offset >= self.IPR:
+            # Only the top two bits of each priority byte are kept
+            value = int.from_bytes(bytes(b & 0xC0 for b in value.to_bytes(width, 'little')), 'little')
+            super().write(offset, width, value)
+            for i in range(width):
+                self.priorities[self.IRQ0 + offset - self.IPR + i] = self.registers[offset + i]
+            self._changed()
+            return
+        register = offset & ~3
+        value <<= 8 * (offset & 3)
+        if register == self.ISER:
+            self.enabled |= value
+            self._changed()
+        elif register == self.ICER:
+            self.enabled &= ~value
+        elif register == self.ISPR:
+            for number in self._interrupts(value):
+                self.pend(number)
+        elif register == self.ICPR:
+            self.pending -= self._interrupts(value)
+
+    def _changed(self):
+        """
+        Something changed that could let a pending exception be taken
+        :return:
+        """
+        if self.pending and self.cpu is not None:
+            self.cpu.schedule(self.cpu.cycles, self.check)
+
+
+class SCB(Peripheral):
+    """
+    The parts of the System Control Block that deal with exceptions, attached along with the NVIC
+
+    Registers, from 0xE000ED00
+    0x00 CPUID: Reads as a Cortex-M0
+    0x04 ICSR: bit 31 NMIPENDSET, bit 28 PENDSVSET, bit 27 PENDSVCLR, bit 26 PENDSTSET, bit 25 PENDSTCLR,
+               bit 22 ISRPENDING, bits 17:12 VECTPENDING, bits 5:0 VECTACTIVE
+    0x10 SCR: bit 1 SLEEPONEXIT, bit 4 SEVONPEND
+    0x1C SHPR2: bits 31:30 SVCall priority
+    0x20 SHPR3: bits 23:22 PendSV priority, bits 31:30 SysTick priority
+    """
+    size = 0x40
+    BASE = 0xE000ED00
+    CPUID, ICSR, SCR, SHPR2, SHPR3 = 0x00, 0x04, 0x10, 0x1C, 0x20
+    CPUID_VALUE = 0x410CC200
+    NMIPENDSET, PENDSVSET, PENDSVCLR, PENDSTSET, PENDSTCLR = 1 << 31, 1 << 28, 1 << 27, 1 << 26, 1 << 25
+    ISRPENDING = 1 << 22
+    SLEEPONEXIT, SEVONPEND = 1 << 1, 1 << 4
+
+    def __init__(self, nvic, base=BASE):
+        """
+        :param nvic: The NVIC that holds the exception state
+        :param base: The address of the first register
+        """
+        super().__init__(base)
+        self.nvic = nvic
+
+    def read(self, offset, width):
+        register = offset & ~3
+        nvic = self.nvic
+        if register == self.CPUID:
+            value = self.CPUID_VALUE
+        elif register == self.ICSR:
+            pending = nvic.next_pending() or 0
+            value = (self.cpu.registers[self.cpu.IPSR] & 0x3F) | (pending << 12)
+            if any(number >= nvic.IRQ0 for number in nvic.pending):
+                value |= self.ISRPENDING
+            if nvic.NMI in nvic.pending:
+                value |= self.NMIPENDSET
+            if nvic.PENDSV in nvic.pending:
+                value |= self.PENDSVSET
+            if nvic.SYSTICK in nvic.pending:
+                value |= self.PENDSTSET
+        elif register == self.SHPR2:
+            value = (nvic.priority(nvic.SVCALL) & 0xC0) << 24
+        elif register == self.SHPR3:
+            value = ((nvic.priority(nvic.PENDSV) & 0xC0) << 16) | ((nvic.priority(nvic.SYSTICK) & 0xC0) << 24)
+        else:
+            return super().read(offset, width)
+        return (value >> (8 * (offset & 3))) & ((1 << (8 * width)) - 1)
+
+    def write(self, offset, width, value):
+        register = offset & ~3
+        nvic = self.nvic
+        shifted = value << (8 * (offset & 3))
+        if register == self.ICSR:
+            if shifted & self.NMIPENDSET:
+                nvic.pend(nvic.NMI)
+            if shifted & self.PENDSVSET:
+                nvic.pend(nvic.PENDSV)
+            elif shifted & self.PENDSVCLR:
+                nvic.pending.discard(nvic.PENDSV)
+            if shifted & self.PENDSTSET:
+                nvic.pend(nvic.SYSTICK)
+            elif shifted & self.PENDSTCLR:
+                nvic.pending.discard(nvic.SYSTICK)
+        elif register == self.SHPR2:
+            super().write(offset, width, value)
+            word = int.from_bytes(self.registers[self.SHPR2:self.SHPR2 + 4], 'little')
+            nvic.priorities[nvic.SVCALL] = (word >> 24) & 0xC0
+            nvic._changed()
+        elif register == self.SHPR3:
+            super().write(offset, width, value)
+            word = int.from_bytes(self.registers[self.SHPR3:self.SHPR3 + 4], 'little')
+            nvic.priorities[nvic.PENDSV] = (word >> 16) & 0xC0
+            nvic.priorities[nvic.SYSTICK] = (word >> 24) & 0xC0
+            nvic._changed()
+        elif register != self.CPUID:
+            super().write(offset, width, value)
+
+
+class UART(Peripheral):
+    """
+    A serial port, with the registers of the ARM PL011 that firmware needs to print and read
+
+    Bytes written to the data register are kept in a buffer and handed over in chunks, when the buffer
+    fills up and when the interpreter stops running, so printing costs no more than a store.
+    By default the output goes wherever the interpreter's semihosting output goes (the console,
+    the notebook in the kernel, or `Result.output` in iarm.batch). Received bytes come from `input`
+    and anything given to `feed`.
+
+    Registers, from 0x40004000
+    0x00 UARTDR: Write to send a byte, read to take the next received byte (zero if there is none)
+    0x18 UARTFR: bit 4 RXFE (nothing received), bit 7 TXFE (always set, sending takes no time)
+    0x38 UARTIMSC: bit 4 RXIM, raise `irq` while there are received bytes
+    0x3C UARTRIS: bit 4 RXRIS, there are received bytes
+    0x40 UARTMIS: UARTRIS masked by UARTIMSC
+    0x44 UARTICR: Write only, nothing to clear
+    """
+    size = 0x48
+    BASE = 0x40004000
+    DR, FR, IMSC, RIS, MIS, ICR = 0x00, 0x18, 0x38, 0x3C, 0x40, 0x44
+    RXFE, TXFE = 1 << 4, 1 << 7
+    RXIM = 1 << 4
+
+    def __init__(self, base=BASE, output=None, input=b'', buffer_size=4096, irq=None):
+        """
+        :param base: The address of the first register
+        :param output: Called with the bytes sent, defaults to the interpreter's semihosting output as text
+        :param input: The bytes there are to receive
+        :param buffer_size: How many bytes to keep before handing them over
+        :param irq: The interrupt number to raise for received bytes, if any
+        """
+        super().__init__(base)
+        self.output = output
+        self.input = bytes(input)
+        self.buffer_size = buffer_size
+        self.irq = irq
+        self._transmit = bytearray()
+        self.reset()
+
+    def reset(self):
+        self.flush()
+        self._received = bytearray(self.input)  # Bytes received, the ones from _read on have not been read yet
+        self._read = 0
+        self._interrupts = 0  # UARTIMSC
+
+    def flush(self):
+        if not self._transmit:
+            return
+        data = bytes(self._transmit)
+        self._transmit.clear()
+        if self.output is not None:
+            self.output(data)
+        elif self.cpu is not None:
+            self.cpu.semihosting.output('stdout', data.decode('utf-8', errors='replace'))
+
+    def feed(self, data):
+        """
+        Receive bytes, like they just came down the wire
+        :param data: The bytes
+        :return:
+        """
+        if self._read:
+            del self._received[:self._read]  # Drop what has been read while it is cheap to
+            self._read = 0
+        self._received += data
+        self._signal()
+
+    @property
+    def waiting(self):
+        """
+        :return: How many received bytes have not been read
+        """
+        return len(self._received) - self._read
+
+    def _signal(self):
+        """
+        Raise the interrupt if there are bytes waiting and it is enabled
+        :return:
+        """
+        if self.waiting and self._interrupts & self.RXIM and self.irq is not None:
+            if self.cpu is not None and self.cpu.nvic is not None:
+                self.cpu.nvic.irq(self.irq)
+
+    def read(self, offset, width):
+        register = offset & ~3
+        if register == self.DR:
+            if not self.waiting:
+                return 0
+            value = self._received[self._read]
+            self._read += 1
+            self._signal()  # Still more to read
+            return value
+        elif register == self.FR:
+            value = self.TXFE | (0 if self.waiting else self.RXFE)
+        elif register == self.IMSC:
+            value = self._interrupts
+        elif register == self.RIS:
+            value = self.RXIM if self.waiting else 0
+        elif register == self.MIS:
+            value = (self.RXIM if self.waiting else 0) & self._interrupts
+        else:
+            value = 0
+        return (value >> (8 * (offset & 3))) & ((1 << (8 * width)) - 1)
+
+    def write(self, offset, width, value):
+        register = offset & ~3
+        if register == self.DR:
+            self._transmit.append(value & 0xFF)
+            if len(self._transmit) >= self.buffer_size:
+                self.flush()
+        elif register == self.IMSC:
+            self._interrupts = (value << (8 * (offset & 3))) & self.RXIM
+            self._signal()
+
+
+class DMA(Peripheral):
+    """
+    A DMA controller that copies memory without the program running a loop
+
+    Each transfer is done as one block read and one block write on the memory, at the time the
+    transfer finishes, which is worked out from its length (`bytes_per_cycle`) and scheduled
+    with the interpreter. Then the channel's flag is set and the interrupt raised, if enabled.
+    A channel that does not increment its destination writes every byte to the same address,
+    which is how a buffer is sent to a peripheral like the UART. One that does not increment its
+    source reads the same address once for every byte, which is how a peripheral is read into a buffer.
+
+    Registers, from 0x40020000
+    0x00 DMA_ISR: bit n is set when channel n has finished
+    0x04 DMA_IFCR: Writing a one clears the bit in DMA_ISR
+    0x10 + 0x10 * n, channel n:
+        +0x0 CSRC: The source address
+        +0x4 CDST: The destination address
+        +0x8 CCNT: How many bytes to copy
+        +0xC CCTRL: bit 0 EN (start, cleared when finished), bit 1 TCIE (interrupt when finished),
+                    bit 2 SINC (increment the source), bit 3 DINC (increment the destination)
+    """
+    CHANNELS = 4
+    size = 0x10 + 0x10 * CHANNELS
+    BASE = 0x40020000
+    ISR, IFCR = 0x00, 0x04
+    SRC, DST, CNT, CTRL = 0x0, 0x4, 0x8, 0xC
+    EN, TCIE, SINC, DINC = 1 << 0, 1 << 1, 1 << 2, 1 << 3
+
+    def __init__(self, base=BASE, irq=None, bytes_per_cycle=4):
+        """
+        :param base: The address of the first register
+        :param irq: The interrupt number to raise when a channel finishes, if any
+        :param bytes_per_cycle: How fast transfers go
+        """
+        super().__init__(base)
+        self.irq = irq
+        self.bytes_per_cycle = bytes_per_cycle
+        self.reset()
+
+    def reset(self):
+        self.channels = [[0, 0, 0, 0] for _ in range(self.CHANNELS)]  # [source, destination, count, control]
+        self.finished = 0  # DMA_ISR
+        self._started = [0] * self.CHANNELS  # Counts transfers, so a stopped transfer's event does nothing
+
+    def read(self, offset, width):
+        register = offset & ~3
+        if register == self.ISR:
+            value = self.finished
+        elif register >= 0x10:
+            channel, field = divmod(register - 0x10, 0x10)
+            value = self.channels[channel][field // 4]
+        else:
+            value = 0
+        return (value >> (8 * (offset & 3))) & ((1 << (8 * width)) - 1)
+
+    def write(self, offset, width, value):
+        register = offset & ~3
+        shift = 8 * (offset & 3)
+        if register == self.IFCR:
+            self.finished &= ~(value << shift)
+        elif register >= 0x10:
+            channel, field = divmod(register - 0x10, 0x10)
+            settings = self.channels[channel]
+            was_enabled = settings[3] & self.EN
+            mask = ((1 << (8 * width)) - 1) << shift
+            value = (settings[field // 4] & ~mask) | (value << shift)  # Keep the bytes not written
+            settings[field // 4] = value
+            if field == self.CTRL:
+                if value & self.EN and not was_enabled:
+                    self._start(channel)
+                elif not value & self.EN:
+                    self._started[channel] += 1  # Stopped before it finished, nothing is copied
+
+    def _start(self, channel):
+        self._started[channel] += 1
+        started = self._started[channel]
+        count = self.channels[channel][2]
+        duration = max(1, -(-count // self.bytes_per_cycle))
+        self.cpu.schedule(self.cpu.cycles + duration, lambda: self._finish(channel, started))
+
+    def _finish(self, channel, started):
+        if started != self._started[channel]:
+            return
+        source, destination, count, control = self.channels[channel]
+        self.transfer(source, destination, count, control & self.SINC, control & self.DINC)
+        self.channels[channel][3] &= ~self.EN
+        self.finished |= 1 << channel
+        if control & self.TCIE and self.irq is not None and self.cpu.nvic is not None:
+            self.cpu.nvic.irq(self.irq)
+
+    def transfer(self, source, destination, count, increment_source=True, increment_destination=True):
+        """
+        Copy memory in one go
+        :param source: The address to copy from
+        :param destination: The address to copy to
+        :param count: How many bytes
+        :param increment_source: Read every byte from the same address if not set
+        :param increment_destination: Write every byte to the same address if not set
+        :return:
+        """
+        if not count:
+            return
+        memory = self.cpu.memory
+        if increment_source:
+            data = memory.read(source, count)
+        else:
+            # Read every time, a peripheral register can give a different value on each read
+            data = bytes(memory[source] for _ in range(count))
+        if increment_destination:
+            memory.write(destination, data)
+        else:
+            for byte in data:
+                memory[destination] = byte
@@ -0,0 +1,75 @@
+"""
+Keep interpreters around to be used again instead of making a new one for every job
+
+    pool = InterpreterPool(4, memory_size=1024)
+    with pool.interpreter() as interp:
+        interp.evaluate(code)
+        interp.run()
+
+Interpreters are reset when they are given back, so the next one handed out is ready to use.
+Peripherals, bound functions, semihosting settings, and replaced memory do not carry over to the next job,
+but settings changed on an interpreter, like `batch_blocks`, stay changed.
+"""
+
+import collections
+import contextlib
+import threading
+import iarm.arm
+
+
+class InterpreterPool(object):
+    """
+    A pool of interpreters that are made ahead of time and reset when given back
+    """
+    def __init__(self, size=0, memory_size=1024, generate_random=False, **kwargs):
+        """
+        :param size: How many interpreters to make ahead of time
+        :param memory_size: How many bytes of memory each interpreter has
+        :param generate_random: Should registers and memory start out with random values
+        :param kwargs: Any other arguments to give to Arm, like batch_blocks
+        """
+        self._memory_size = memory_size
+        self._generate_random = generate_random
+        self._kwargs = kwargs
+        self._idle = collections.deque(self._new() for _ in range(size))
+        self._lock = threading.Lock()
+
+    def _new(self):
+        return iarm.arm.Arm(self._memory_size, self._generate_random, **self._kwargs)
+
+    def acquire(self):
+        """
+        Get an interpreter, a new one is made if there are none left
+        :return: An Arm that is not being used by anything else
+        """
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._new()
+
+    def release(self, interp):
+        """
+        Reset an interpreter and give it back to the pool
+        :param interp: An Arm from acquire
+        :return:
+        """
+        interp.reset()
+        with self._lock:
+            self._idle.append(interp)
+
+    @contextlib.contextmanager
+    def interpreter(self):
+        """
+        Get an interpreter for the length of a with block
+        """
+        interp = self.acquire()
+        try:
+            yield interp
+        finally:
+            self.release(interp)
+
+    def __len__(self):
+        """
+        :return: How many interpreters are ready to be handed out
+        """
+        return len(self._idle)
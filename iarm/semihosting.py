@@ -0,0 +1,201 @@
+"""
+ARM semihosting, letting a program print, read input, and exit through the host
+
+A program makes a semihosting call with `BKPT #0xAB` (or `SVC #0xAB` when no NVIC is attached),
+the operation number in R0 and its parameter (usually the address of a block of words) in R1.
+The result is put in R0.
+
+     MOVS R0, #4        ; SYS_WRITE0
+     LDR R1, =message   ; Address of a zero terminated string
+     BKPT #0xAB
+
+Output is kept in a buffer and handed over in bulk, when the buffer fills up, when the program exits,
+and when `run` returns, so printing one character at a time costs no more than printing whole lines.
+"""
+
+import sys
+import time
+import iarm.exceptions
+
+# Operation numbers, from the ARM semihosting specification
+SYS_OPEN = 0x01
+SYS_CLOSE = 0x02
+SYS_WRITEC = 0x03
+SYS_WRITE0 = 0x04
+SYS_WRITE = 0x05
+SYS_READ = 0x06
+SYS_READC = 0x07
+SYS_ISTTY = 0x09
+SYS_CLOCK = 0x10
+SYS_TIME = 0x11
+SYS_ERRNO = 0x13
+SYS_EXIT = 0x18
+SYS_ELAPSED = 0x30
+SYS_TICKFREQ = 0x31
+
+ADP_STOPPED_APPLICATION_EXIT = 0x20026  # The reason given to SYS_EXIT for a normal exit
+
+BREAKPOINT = 0xAB  # The BKPT and SVC immediate that makes a semihosting call
+
+# Handles for the console, opened with the special file name `:tt`
+STDIN, STDOUT, STDERR = 1, 2, 3
+STREAMS = {STDOUT: 'stdout', STDERR: 'stderr'}
+
+
+def _write_to_console(name, text):
+    stream = sys.stderr if name == 'stderr' else sys.stdout
+    stream.write(text)
+    stream.flush()
+
+
+class Semihosting(object):
+    """
+    Handles semihosting calls for an interpreter
+    """
+    def __init__(self, output=None, input='', buffer_size=4096, frequency=1000000):
+        """
+        :param output: Called with the stream name ('stdout' or 'stderr') and the text, defaults to the console
+        :param input: The text the program reads
+        :param buffer_size: How many bytes of output to keep before handing them over
+        :param frequency: How many instructions make a second of simulated time, for SYS_CLOCK and SYS_TICKFREQ
+        """
+        self.output = output or _write_to_console
+        self.input = input
+        self.buffer_size = buffer_size
+        self.frequency = frequency
+        self.reset()
+
+    def reset(self):
+        """
+        Forget any output that was not handed over, the input read so far, and the exit
+        :return:
+        """
+        self._buffer = []  # (stream name, bytes)
+        self._buffered = 0
+        self._read = 0  # How much of the input has been read
+        self.exit_reason = None  # What the program gave to SYS_EXIT, if it exited
+
+    def fork(self):
+        """
+        :return: A new Semihosting with the same settings, for a forked interpreter
+        """
+        return Semihosting(self.output, self.input, self.buffer_size, self.frequency)
+
+    @property
+    def exited(self):
+        return self.exit_reason is not None
+
+    def write(self, name, data):
+        """
+        Add output to the buffer, handing it over if the buffer is full
+        :param name: The stream name
+        :param data: The bytes to write
+        :return:
+        """
+        self._buffer.append((name, data))
+        self._buffered += len(data)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Hand over everything in the buffer, one call per run of output to the same stream
+        :return:
+        """
+        buffer = self._buffer
+        if not buffer:
+            return
+        self._buffer = []
+        self._buffered = 0
+        start = 0
+        for i in range(1, len(buffer) + 1):
+            if i == len(buffer) or buffer[i][0] != buffer[start][0]:
+                text = b''.join(data for _, data in buffer[start:i]).decode('utf-8', errors='replace')
+                self.output(buffer[start][0], text)
+                start = i
+
+    def read(self, length):
+        """
+        Read from the input
+        :param length: The most characters to read
+        :return: The bytes read, empty at the end of the input
+        """
+        data = self.input[self._read:self._read + length]
+        self._read += len(data)
+        return data.encode('utf-8')
+
+    def call(self, cpu):
+        """
+        Carry out the call the program asked for in R0 and R1
+        :param cpu: The interpreter making the call
+        :return:
+        """
+        registers = cpu.registers
+        operation, parameter = registers[0], registers[1]
+        memory = cpu.memory
+        if operation == SYS_WRITEC:
+            self.write('stdout', bytes((memory[parameter],)))
+            return
+        elif operation == SYS_WRITE0:
+            data = bytearray()
+            while memory[parameter + len(data)]:
+                data.append(memory[parameter + len(data)])
+            self.write('stdout', bytes(data))
+            return
+        elif operation == SYS_WRITE:
+            handle, address, length = (memory.read_word(parameter + 4 * i) for i in range(3))
+            if handle not in STREAMS:
+                result = length  # Nothing was written
+            else:
+                self.write(STREAMS[handle], bytes(memory.read(address, length)))
+                result = 0
+        elif operation == SYS_READ:
+            handle, address, length = (memory.read_word(parameter + 4 * i) for i in range(3))
+            if handle != STDIN:
+                result = length  # Nothing was read
+            else:
+                self.flush()  # Anything asking for input should be seen first
+                data = self.read(length)
+                memory.write(address, data)
+                result = length - len(data)
+        elif operation == SYS_READC:
+            self.flush()
+            data = self.read(1)
+            result = data[0] if data else cpu._mask  # -1 at the end of the input
+        elif operation == SYS_OPEN:
+            name_address, mode, length = (memory.read_word(parameter + 4 * i) for i in range(3))
+            name = bytes(memory.read(name_address, length)).decode('utf-8', errors='replace')
+            if name != ':tt':
+                # TODO open files on the host
+                result = cpu._mask  # -1, files cannot be opened
+            elif mode < 4:
+                result = STDIN
+            elif mode < 8:
+                result = STDOUT
+            else:
+                result = STDERR
+        elif operation == SYS_CLOSE:
+            result = 0
+        elif operation == SYS_ISTTY:
+            result = 1 if memory.read_word(parameter) in (STDIN, STDOUT, STDERR) else 0
+        elif operation == SYS_CLOCK:
+            result = (cpu.cycles * 100 // self.frequency) & cpu._mask  # Centiseconds of simulated time
+        elif operation == SYS_TIME:
+            result = int(time.time()) & cpu._mask
+        elif operation == SYS_ERRNO:
+            result = 0
+        elif operation == SYS_ELAPSED:
+            memory.write_word(parameter, cpu.cycles & cpu._mask)
+            memory.write_word(parameter + 4, (cpu.cycles >> 32) & cpu._mask)
+            result = 0
+        elif operation == SYS_TICKFREQ:
+            result = self.frequency
+        elif operation == SYS_EXIT:
+            self.exit_reason = parameter
+            self.flush()
+            # Jump past the end of the program so running stops after this instruction
+            registers[cpu.PC] = len(cpu.program)
+            return
+        else:
+            raise iarm.exceptions.NotImplementedError("Semihosting operation {:#x} is not supported".format(operation))
+        registers[0] = result
@@ -20,6 +20,7 @@ class ArmKernel(Kernel):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.interpreter = Arm(1024)  # 1K memory
+        self.interpreter.semihosting.output = self.stream_output  # Program output goes to the notebook
         self.magics = {
             'run': self.magic_run,
             'register': self.magic_register,
@@ -31,7 +32,9 @@ class ArmKernel(Kernel):
             'hex': self.magic_hex_rep,
             'help': self.magic_help,
             'generate_random': self.magic_generate_random,
-            'postpone_execution': self.magic_postpone_execution
+            'postpone_execution': self.magic_postpone_execution,
+            'batch_blocks': self.magic_batch_blocks,
+            'reset': self.magic_reset
                        }
 
         self.number_representation = ''
@@ -112,6 +115,37 @@ class ArmKernel(Kernel):
                     'evalue': "unknwon value '{}'".format(line),
                     'traceback': '???'}
 
+    def magic_batch_blocks(self, line):
+        """
+        Call straight line code in basic blocks instead of one instruction at a time
+
+        Usage:
+        Call this magic with `true` or nothing to run batched blocks,
+        or call with `false` to run one instruction at a time.
+        This defaults to False.
+
+        The results are the same either way, batched blocks run a little faster.
+
+        `%batch_blocks`
+        or
+        `%batch_blocks true`
+        or
+        `%batch_blocks false`
+        """
+        line = line.strip().lower()
+        if not line or line == 'true':
+            self.interpreter.batch_blocks = True
+        elif line == 'false':
+            self.interpreter.batch_blocks = False
+        else:
+            stream_content = {'name': 'stderr', 'text': "unknwon value '{}'".format(line)}
+            self.send_response(self.iopub_socket, 'stream', stream_content)
+            return {'status': 'error',
+                    'execution_count': self.execution_count,
+                    'ename': ValueError.__name__,
+                    'evalue': "unknwon value '{}'".format(line),
+                    'traceback': '???'}
+
     def magic_signed_rep(self, line):
         """
         Convert all values to it's signed representation
@@ -253,6 +287,32 @@ class ArmKernel(Kernel):
                     'evalue': str(e),
                     'traceback': '???'}
 
+    def magic_reset(self, line):
+        """
+        Reset registers and memory without restarting the kernel
+
+        Usage:
+        Call with no arguments to also forget the program, labels, and equates,
+        or call with `program` to keep the program and run it again from the start
+
+        `%reset`
+        or
+        `%reset program`
+        """
+        line = line.strip().lower()
+        if not line:
+            self.interpreter.reset()
+        elif line == 'program':
+            self.interpreter.reset(keep_program=True)
+        else:
+            stream_content = {'name': 'stderr', 'text': "unknwon value '{}'".format(line)}
+            self.send_response(self.iopub_socket, 'stream', stream_content)
+            return {'status': 'error',
+                    'execution_count': self.execution_count,
+                    'ename': ValueError.__name__,
+                    'evalue': "unknwon value '{}'".format(line),
+                    'traceback': '???'}
+
     def magic_help(self, line):
         """
         Print out the help for magics
@@ -298,12 +358,24 @@ class ArmKernel(Kernel):
                 op = line[1:]
             return self.magics[op](params)
 
-    def run_code(self, code):
+    def stream_output(self, name, text):
+        """
+        Send what the program wrote with semihosting calls to the notebook, it comes in bulk when the program stops
+        """
+        stream_content = {'name': name, 'text': text}
+        self.send_response(self.iopub_socket, 'stream', stream_content)
+
+    def run_code(self, code, cell=None):
+        """
+        Evaluate code from a cell
+        :param code: The code
+        :param cell: Identifies the cell, so running it again replaces its code instead of adding another copy
+        """
         if not code:
             return
         try:
             with warnings.catch_warnings(record=True) as w:
-                self.interpreter.evaluate(code)
+                self.interpreter.evaluate(code, cell=cell)
                 for warning_message in w:
                     # TODO should this be stdout or stderr
                     stream_content = {'name': 'stdout', 'text': 'Warning: ' + str(warning_message.message) + '\n'}
@@ -319,22 +391,25 @@ class ArmKernel(Kernel):
                     'traceback': '???'}
 
     def do_execute(self, code, silent, store_history=True,
-                   user_expressions=None, allow_stdin=False):
-
+                   user_expressions=None, allow_stdin=False, *, cell_id=None):
+        # Frontends that send a cell id get the cell's code replaced when it is run again,
+        # the code between each magic is its own part of the cell
+        part = 0
         instructions = ""
         for line in code.split('\n'):
             if line.startswith('%'):
                 # TODO run current code, run magic, then continue
-                ret = self.run_code(instructions)
+                ret = self.run_code(instructions, None if cell_id is None else (cell_id, part))
                 if ret:
                     return ret
+                part += 1
                 instructions = ""
                 ret = self.run_magic(line)
                 if ret:
                     return ret
             else:
                 instructions += line + '\n'
-        ret = self.run_code(instructions)
+        ret = self.run_code(instructions, None if cell_id is None else (cell_id, part))
         if ret:
             return ret
 
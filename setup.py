@@ -22,4 +22,10 @@ setup(name=iarm.__title__,
             'jupyter-client',
             'ipython',
       ],
+      entry_points={
+            'console_scripts': ['iarm-batch=iarm.batch:main'],
+      },
+      extras_require={
+            'lanes': ['numpy'],
+      },
       zip_safe=True)
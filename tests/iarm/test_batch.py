@@ -0,0 +1,79 @@
+import iarm.batch
+import io
+import json
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+
+class TestBatch(unittest.TestCase):
+    PROGRAM = """
+ MOVS R1, #0
+loop ADDS R1, R1, R0
+ SUBS R0, R0, #1
+ BNE loop
+"""
+
+    def test_inputs(self):
+        results = iarm.batch.run_batch([self.PROGRAM], [{'R0': i} for i in range(1, 5)], workers=0)
+        self.assertEqual([result.registers['R1'] for result in results], [1, 3, 6, 10])
+        self.assertEqual([result.inputs for result in results], [0, 1, 2, 3])
+        self.assertTrue(all(result.status == 'finished' for result in results))
+
+    def test_many_programs(self):
+        programs = [" MOVS R0, #1", " MOVS R0, #2"]
+        results = iarm.batch.run_batch(programs, [{}, {'R1': 5}], workers=0)
+        self.assertEqual([(result.program, result.inputs) for result in results], [(0, 0), (0, 1), (1, 0), (1, 1)])
+        self.assertEqual([result.registers['R0'] for result in results], [1, 1, 2, 2])
+        self.assertEqual(results[1].registers['R1'], 5)
+
+    def test_status(self):
+        programs = [self.PROGRAM, " MOVS R0, #1\n B .", " MOVS R9, #1", " LDR R0, [R1, #0]"]
+        results = iarm.batch.run_batch(programs, [{'R0': 100, 'R1': 1}], steps=50, workers=0)
+        self.assertEqual([result.status for result in results], ['step_limit', 'halted', 'error', 'error'])
+        self.assertIn('RuleError', results[2].error)
+        self.assertIn('HardFault', results[3].error)
+
+    def test_memory(self):
+        results = iarm.batch.run_batch([" LDR R1, [R0, #0]\n STR R1, [R0, #4]"],
+                                       [{'R0': 8, 'memory': {'8': [1, 2, 3, 4]}}], workers=0, read_memory=(8, 8))
+        self.assertEqual(results[0].registers['R1'], 0x04030201)
+        self.assertEqual(results[0].memory, [1, 2, 3, 4, 1, 2, 3, 4])
+        json.dumps(results[0]._asdict())  # Results can be written out as they are
+
+    def test_memory_out_of_range(self):
+        results = iarm.batch.run_batch([" MOVS R0, #1", " MOVS R0, #2"], workers=0, read_memory=(1020, 8))
+        self.assertEqual([result.status for result in results], ['error', 'error'])
+        self.assertIn('HardFault', results[0].error)
+        self.assertEqual(results[1].registers['R0'], 2)
+        self.assertIsNone(results[0].memory)
+
+    def test_output(self):
+        program = " MOVS R0, #4\n MOVS R1, #8\n BKPT #0xAB\n MOVS R0, #3\n BKPT #0xAB"
+        results = iarm.batch.run_batch([program], [{'memory': {'8': [72, 105, 0]}}, {'memory': {'8': [33, 0]}}],
+                                       workers=0)
+        self.assertEqual([result.output for result in results], ['HiH', '!!'])
+
+    def test_process_pool(self):
+        inputs = [{'R0': i} for i in range(1, 21)]
+        results = iarm.batch.run_batch([self.PROGRAM], inputs, workers=2)
+        self.assertEqual(results, iarm.batch.run_batch([self.PROGRAM], inputs, workers=0))
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as directory:
+            program = os.path.join(directory, 'sum.s')
+            with open(program, 'w') as f:
+                f.write(self.PROGRAM)
+            inputs = os.path.join(directory, 'inputs.json')
+            with open(inputs, 'w') as f:
+                json.dump([{'R0': 3}, {'R0': 4}], f)
+
+            with unittest.mock.patch('sys.stdout', new_callable=io.StringIO) as stdout:
+                iarm.batch.main([program, '--inputs', inputs, '--workers', '0'])
+        results = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([result['registers']['R1'] for result in results], [6, 10])
+        self.assertEqual(results[0]['program'], program)
+
+if __name__ == '__main__':
+    unittest.main()
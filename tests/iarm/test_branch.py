@@ -1,6 +1,7 @@
 from .test_iarm import TestArm
 import iarm.exceptions
 import unittest
+import warnings
 
 
 class TestArmUnconditionalBranch(TestArm):
@@ -86,5 +87,62 @@ class TestArmConditionalBranch(TestArm):
     def test_BVS(self):
         pass
 
+class TestArmLinking(TestArm):
+    """
+    Labels are resolved when the code is evaluated, and again if they change later on
+    """
+    def test_forward_reference(self):
+        self.interp.evaluate(""" MOVS R0, #3
+loop SUBS R0, R0, #1
+ BNE loop
+ B end
+ MOVS R1, #1
+end MOVS R2, #2""")
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 0)
+        self.assertEqual(self.interp.register['R1'], 0)
+        self.assertEqual(self.interp.register['R2'], 2)
+
+    def test_label_defined_later(self):
+        self.interp.evaluate(" BL function")
+        self.assertIsNone(self.interp.references[0]['FUNCTION'])
+        self.interp.evaluate(" B .")
+        self.interp.evaluate("function MOVS R0, #5")
+        self.assertEqual(self.interp.references[0]['FUNCTION'], 2)
+        self.interp.run(2)
+        self.assertEqual(self.interp.register['R0'], 5)
+        self.assertEqual(self.interp.register['LR'], 1)
+
+    def test_label_moved(self):
+        self.interp.evaluate(" B function")
+        self.interp.evaluate("function MOVS R0, #5")
+        self.interp.evaluate("function MOVS R0, #6")
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 6)
+
+    def test_label_does_not_exist(self):
+        self.interp.evaluate(" B nowhere")
+        with self.assertRaises(iarm.exceptions.IarmError):
+            self.interp.run()
+
+    def test_LDR_label_defined_later(self):
+        self.interp.evaluate(" LDR R1, =P")
+        self.interp.evaluate("P SPACE 4\nR SPACE 4")
+        self.interp.evaluate(" LDR R2, =R")
+        self.interp.run()
+        self.assertEqual(self.interp.register['R1'], 0)
+        self.assertEqual(self.interp.register['R2'], 4)
+
+    def test_LDR_equate_defined_later(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # It is not known to be an equate yet
+            self.interp.evaluate(" LDR R0, =SIZE")
+        self.interp.evaluate("SIZE EQU 64")
+        # Linked again from what it resolved, and now it uses the equate instead of waiting for a label
+        self.assertEqual(self.interp.references[0], {})
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 64)
+
+
 if __name__ == '__main__':
     unittest.main()
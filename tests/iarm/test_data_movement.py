@@ -113,6 +113,16 @@ class TestArmDataMovement(TestArm):
 
         self.assertEqual(self.interp.register['APSR'], (15 << 28))
 
+    def test_MSR_after_flags_set(self):
+        self.interp.register['R0'] = (1 << 28)
+        self.interp.evaluate(" MOVS R1, #0")  # Set the Z flag
+        self.interp.evaluate(" MSR APSR, R0")
+        self.interp.evaluate(" MRS R2, APSR")
+        self.interp.run()
+
+        self.assertEqual(self.interp.register['R2'], (1 << 28))
+        self.assertFalse(self.interp.is_Z_set())
+
     def test_MVNS(self):
         self.interp.register['R0'] = -5
         self.interp.evaluate(" MVNS R1, R0")
@@ -0,0 +1,94 @@
+from .test_iarm import TestArm
+import iarm.arm
+import iarm.exceptions
+import unittest
+
+
+class TestArmBatchBlocks(TestArm):
+    """
+    Batched blocks must give the same results as running one instruction at a time
+    """
+    PROGRAM = """
+ MOVS R0, #100
+ MOVS R1, #0
+ MOVS R2, #0
+loop ADDS R1, R1, R0
+ LSLS R3, R0, #2
+ STR R3, [R2, #0]
+ SUBS R0, R0, #1
+ BNE loop
+"""
+
+    def setUp(self):
+        super().setUp()
+        self.interp.batch_blocks = True
+
+    def test_same_result(self):
+        reference = iarm.arm.Arm(1024, False)
+        reference.evaluate(self.PROGRAM)
+        reference.run()
+
+        self.interp.evaluate(self.PROGRAM)
+        self.interp.run()
+
+        for reg in ('R0', 'R1', 'R2', 'R3', 'PC', 'APSR'):
+            self.assertEqual(self.interp.register[reg], reference.register[reg])
+        self.assertEqual(self.interp.register['R1'], 5050)
+        self.assertEqual(self.interp.memory[0], 4)
+        self.assertEqual(self.interp.cycles, reference.cycles)
+        self.assertEqual(self.interp.cycles, 3 + 5 * 100)
+
+    def test_steps(self):
+        self.interp.evaluate(self.PROGRAM)
+        self.interp.run(4)
+        self.assertEqual(self.interp.register['PC'], 5)
+        self.assertEqual(self.interp.register['R1'], 100)
+
+        self.interp.run(5)
+        self.assertEqual(self.interp.register['PC'], 5)
+        self.assertEqual(self.interp.register['R1'], 199)
+
+    def test_add_to_program(self):
+        self.interp.evaluate(" MOVS R0, #1")
+        self.interp.run()
+        self.interp.evaluate(" MOVS R1, #2")
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 1)
+        self.assertEqual(self.interp.register['R1'], 2)
+        self.assertEqual(self.interp.register['PC'], 3)
+
+    def test_pc_reference(self):
+        self.interp.evaluate("""
+ MOVS R0, #1
+ MOVS R0, #2
+ ADD R1, PC, #4
+ MOVS R2, #3
+""")
+        self.interp.run()
+        self.assertEqual(self.interp.register['R1'], 7)  # PC points to the next instruction
+        self.assertEqual(self.interp.register['R2'], 3)
+
+    def test_exception_in_block(self):
+        self.interp.register['R1'] = 1
+        self.interp.evaluate("""
+ MOVS R0, #1
+ LDR R2, [R1, #0]
+ MOVS R0, #2
+""")
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.interp.run()
+        self.assertEqual(self.interp.register['PC'], 2)
+        self.assertEqual(self.interp.register['R0'], 1)
+        self.assertEqual(self.interp.cycles, 1)
+
+    def test_infinite_loop(self):
+        self.interp.evaluate("""
+ MOVS R0, #1
+ B .
+""")
+        with self.assertRaises(iarm.exceptions.EndOfProgram):
+            self.interp.run()
+        self.assertEqual(self.interp.register['PC'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
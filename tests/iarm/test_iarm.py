@@ -1,7 +1,9 @@
 import unittest
 import iarm.arm
 import iarm.exceptions
+import iarm.peripherals
 import random
+import warnings
 
 
 class TestArm(unittest.TestCase):
@@ -10,6 +12,334 @@ class TestArm(unittest.TestCase):
         self.interp = iarm.arm.Arm(1024, False)
 
 
+class TestArmTables(TestArm):
+    def test_tables_are_per_class(self):
+        self.assertIn('MOVS', iarm.arm.Arm._instructions)
+        self.assertIn('low_registers', iarm.arm.Arm._rule_functions)
+        self.assertIn('DCD', iarm.arm.Arm._directive_functions)
+
+    def test_bound_to_instance(self):
+        other = iarm.arm.Arm(1024, False)
+        self.assertIs(self.interp.ops['MOVS'].__self__, self.interp)
+        self.assertIs(self.interp.directives['DCD'].__self__, self.interp)
+        self.assertIs(other.ops['MOVS'].__self__, other)
+        self.assertEqual(set(self.interp.ops), set(other.ops))
+
+    def test_subclass_instructions(self):
+        class Extended(iarm.arm.Arm):
+            def EXTRA(self, params):
+                return lambda: None
+        self.assertIn('EXTRA', Extended(1024, False).ops)
+        self.assertNotIn('EXTRA', self.interp.ops)
+
+
+class TestArmReset(TestArm):
+    PROGRAM = """CONST EQU 3
+value DCD 0x12345678
+ MOVS R0, #3
+ LDR R1, =value
+ LDR R1, [R1]
+ STR R0, [R2, #8]
+ CMP R0, #3
+"""
+
+    def test_reset(self):
+        self.interp.evaluate(self.PROGRAM)
+        self.interp.run()
+        self.interp.reset()
+        self.assertEqual(self.interp.register['PC'], 1)
+        self.assertEqual(self.interp.register['R0'], 0)
+        self.assertEqual(self.interp.register['APSR'], 0)
+        self.assertEqual(self.interp.memory.read(0, 16), bytes(16))
+        self.assertEqual(self.interp.program, [])
+        self.assertEqual(self.interp.labels, {})
+        self.assertEqual(self.interp.equates, {})
+        self.assertEqual(self.interp.space_pointer, 0)
+
+        self.interp.evaluate(" MOVS R0, #1")
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 1)
+        self.assertEqual(self.interp.register['PC'], 2)
+
+    def test_reset_keep_program(self):
+        self.interp.evaluate(self.PROGRAM)
+        self.interp.run()
+        self.interp.reset(keep_program=True)
+        self.assertEqual(self.interp.register['R1'], 0)
+        self.assertEqual(self.interp.memory.read_word(8), 0)
+        self.assertEqual(self.interp.memory.read_word(0), 0x12345678)  # Constants are put back
+
+        self.interp.register['R2'] = 4
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 3)
+        self.assertEqual(self.interp.register['R1'], 0x12345678)
+        self.assertEqual(self.interp.memory.read_word(12), 3)
+        self.assertTrue(self.interp.is_Z_set())
+
+    def test_reset_same_as_new(self):
+        self.interp.batch_blocks = True
+        self.interp.evaluate(self.PROGRAM)
+        self.interp.run()
+        self.interp.reset()
+        reference = iarm.arm.Arm(1024, False)
+        for interp in (self.interp, reference):
+            interp.evaluate(self.PROGRAM)
+            interp.run()
+        for reg in ('R0', 'R1', 'R2', 'PC', 'APSR'):
+            self.assertEqual(self.interp.register[reg], reference.register[reg])
+        self.assertEqual(self.interp.memory.read(0, 1024), reference.memory.read(0, 1024))
+
+
+class TestArmFork(TestArm):
+    def test_fork(self):
+        self.interp.evaluate("""value DCD 7
+ LDR R1, =value
+ LDR R2, [R1]
+ CMP R2, #7
+""")
+        self.interp.run()
+        other = self.interp.fork()
+        self.assertEqual(other.register['R2'], 7)
+        self.assertTrue(other.is_Z_set())
+        self.assertEqual(other.register['PC'], self.interp.register['PC'])
+
+        other.evaluate(" ADDS R2, R2, #1\n STR R2, [R1, #0]")
+        other.run()
+        self.assertEqual(other.register['R2'], 8)
+        self.assertEqual(other.memory.read_word(0), 8)
+        self.assertEqual(self.interp.register['R2'], 7)
+        self.assertEqual(self.interp.memory.read_word(0), 7)
+        self.assertEqual(len(self.interp.program), 3)
+
+    def test_fork_runs_same_program(self):
+        self.interp.evaluate("""
+ MOVS R0, #0
+loop ADDS R0, R0, R1
+ SUBS R1, R1, #1
+ BNE loop
+""")
+        forks = []
+        for i in range(1, 5):
+            fork = self.interp.fork()
+            fork.register['R1'] = i
+            forks.append(fork)
+        for fork in forks:
+            fork.run()
+        self.assertEqual([fork.register['R0'] for fork in forks], [1, 3, 6, 10])
+        self.assertEqual(self.interp.register['PC'], 1)
+
+    def test_fork_instructions_use_fork(self):
+        other = self.interp.fork()
+        self.assertIs(other.ops['MOVS'].__self__, other)
+        self.assertIs(other.directives['DCD'].__self__, other)
+        other.register['APSR'] = 0
+        other.evaluate(" MOVS R0, #0")
+        other.run()
+        self.assertEqual(other.register['APSR'] >> 30 & 1, 1)  # The APSR is still up to date when read
+        self.assertEqual(self.interp.register['APSR'], 0)
+
+    def test_fork_with_peripherals(self):
+        self.interp.attach(iarm.peripherals.Peripheral(0x100))
+        with self.assertRaises(ValueError):
+            self.interp.fork()
+
+
+class TestArmDecodeCache(TestArm):
+    PROGRAM = """SIZE EQU 4
+ MOVS R0, #SIZE
+ B skip
+ MOVS R0, #0
+skip ADDS R0, R0, #1
+"""
+
+    def test_reset(self):
+        program_text = self.PROGRAM.replace('SIZE EQU 4\n', '').replace('#SIZE', '#4')
+        self.interp.evaluate(program_text)
+        program = list(self.interp.program)
+        self.interp.reset()
+        self.interp.evaluate(program_text)
+        self.assertTrue(all(a is b for a, b in zip(program, self.interp.program)))
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 5)
+
+    def test_reset_with_equates(self):
+        self.interp.evaluate(self.PROGRAM)
+        self.interp.reset()
+        self.interp.evaluate(self.PROGRAM)
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 5)
+
+    def test_equates_version(self):
+        equates = self.interp.equates
+        self.assertEqual(equates.version, 0)
+        equates['SIZE'] = 4
+        first = equates.version
+        equates['SIZE'] = 4
+        self.assertGreater(equates.version, first)
+        equates.clear()
+        self.assertEqual(equates.version, 0)
+        equates['SIZE'] = 4
+        self.assertNotEqual(equates.version, first)
+
+    def test_equates_changed(self):
+        self.interp.evaluate(self.PROGRAM)
+        self.interp.reset()
+        self.interp.evaluate(self.PROGRAM.replace('SIZE EQU 4', 'SIZE EQU 6'))
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 7)
+
+    def test_labels_moved(self):
+        self.interp.evaluate(self.PROGRAM)
+        self.interp.reset()
+        self.interp.evaluate(" NOP\n" + self.PROGRAM)
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 5)
+        self.assertEqual(self.interp.labels['SKIP'], 4)
+
+    def test_bind(self):
+        self.interp.evaluate(" BL double\n B done\ndouble ADDS R0, R0, R0\n BX LR\ndone NOP")
+        self.interp.reset()
+        self.interp.bind('double', lambda cpu, value, *_: 7)
+        self.interp.evaluate(" BL double\n B done\ndouble ADDS R0, R0, R0\n BX LR\ndone NOP")
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 7)
+
+    def test_fork(self):
+        self.interp.evaluate(self.PROGRAM)
+        fork = self.interp.fork()
+        self.assertFalse(any(a is b for a, b in zip(self.interp.program, fork.program)))
+        fork.run()
+        self.assertEqual(fork.register['R0'], 5)
+        self.assertEqual(self.interp.register['R0'], 0)
+
+
+class TestArmCells(TestArm):
+    SUBROUTINE = """add_three ADDS R0, R0, #3
+ BX LR
+"""
+    MAIN = """main MOVS R0, #1
+ BL add_three
+ B done
+"""
+
+    def setUp(self):
+        super().setUp()
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # main and done do not exist yet
+            self.interp.evaluate(" B main", cell='start')
+            self.interp.evaluate(self.SUBROUTINE, cell='subroutine')
+            self.interp.evaluate(self.MAIN, cell='main')
+        self.interp.evaluate("done NOP", cell='end')
+
+    def run_program(self):
+        self.interp.reset(keep_program=True)
+        self.interp.run()
+        return self.interp.register['R0']
+
+    def test_same_cell(self):
+        program = list(self.interp.program)
+        self.interp.evaluate(self.SUBROUTINE, cell='subroutine')
+        self.assertEqual(len(self.interp.program), len(program))
+        self.assertTrue(all(a is b for a, b in zip(program, self.interp.program)))
+        self.assertEqual(self.run_program(), 4)
+
+    def test_changed_line(self):
+        program = list(self.interp.program)
+        self.interp.evaluate(self.SUBROUTINE.replace('#3', '#5'), cell='subroutine')
+        self.assertIsNot(self.interp.program[1], program[1])
+        self.assertIs(self.interp.program[2], program[2])
+        self.assertEqual(self.run_program(), 6)
+
+    def test_cell_grows(self):
+        self.interp.evaluate("add_three ADDS R0, R0, #1\n ADDS R0, R0, #1\n ADDS R0, R0, #1\n BX LR",
+                             cell='subroutine')
+        self.assertEqual(len(self.interp.program), 9)
+        self.assertEqual(self.interp.labels['MAIN'], 5)
+        self.assertEqual(self.interp.labels['DONE'], 8)
+        self.assertEqual(self.interp.cells['end'][:2], (8, 9))
+        self.assertEqual(self.run_program(), 4)
+
+    def test_cell_shrinks(self):
+        self.interp.evaluate("main MOVS R0, #2\n B done", cell='main')
+        self.assertEqual(self.interp.labels['DONE'], 5)
+        self.assertEqual(self.run_program(), 2)
+
+    def test_label_removed(self):
+        self.interp.evaluate(" MOVS R1, #1", cell='end')
+        self.assertNotIn('DONE', self.interp.labels)
+
+    def test_data(self):
+        self.interp.evaluate("value DCD 7\n LDR R1, =value\n LDR R2, [R1]", cell='data')
+        address = self.interp.labels['VALUE']
+        self.interp.evaluate("value DCD 7\n LDR R1, =value\n LDR R3, [R1]", cell='data')
+        self.assertEqual(self.interp.labels['VALUE'], address)  # Not allocated again
+
+    def test_equates(self):
+        self.interp.evaluate("AMOUNT EQU 2\n MOVS R4, #AMOUNT", cell='equates')
+        self.interp.evaluate("AMOUNT EQU 6\n MOVS R4, #AMOUNT", cell='equates')
+        self.interp.run()
+        self.assertEqual(self.interp.register['R4'], 6)
+
+    def test_error(self):
+        program = list(self.interp.program)
+        labels = dict(self.interp.labels)
+        with self.assertRaises(iarm.exceptions.IarmError):
+            self.interp.evaluate("add_three ADDS R0, R0, #300\n BX LR", cell='subroutine')
+        self.assertEqual(self.interp.program, program)
+        self.assertEqual(self.interp.labels, labels)
+        self.assertEqual(self.run_program(), 4)
+
+    def test_reset(self):
+        self.interp.reset()
+        self.assertEqual(self.interp.cells, {})
+        self.interp.evaluate(" MOVS R0, #1", cell='main')
+        self.assertEqual(len(self.interp.program), 1)
+
+
+class TestArmAddressMap(TestArm):
+    def test_sram_stack(self):
+        interp = iarm.arm.Arm(2**32, False)
+        interp.evaluate("""
+ LDR R0, =0x20001000
+ MOV SP, R0
+ MOVS R1, #5
+ PUSH {R1}
+ LDR R2, =0x40000000
+ STR R1, [R2, #4]
+ POP {R3}
+""")
+        interp.run()
+        self.assertEqual(interp.register['R3'], 5)
+        self.assertEqual(interp.memory.read_word(0x20000FFC), 5)
+        self.assertEqual(interp.memory.read_word(0x40000004), 5)
+
+
+class TestArmCycles(TestArm):
+    def test_cycles(self):
+        self.interp.evaluate("""
+ MOVS R0, #3
+loop SUBS R0, R0, #1
+ BNE loop
+""")
+        self.interp.run(4)
+        self.assertEqual(self.interp.cycles, 4)
+        self.interp.run()
+        self.assertEqual(self.interp.cycles, 7)
+        self.interp.run()
+        self.assertEqual(self.interp.cycles, 7)
+        self.interp.reset()
+        self.assertEqual(self.interp.cycles, 0)
+
+    def test_cycles_on_fault(self):
+        self.interp.evaluate("""
+ MOVS R0, #1
+ LDR R1, [R0, #0]
+""")
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.interp.run()
+        self.assertEqual(self.interp.cycles, 1)
+
+
 class TestArmChecks(TestArm):
     def test_is_register(self):
         self.assertTrue(self.interp.is_register('R0'))
@@ -424,5 +754,30 @@ class TestArmRegisters(TestArm):
             self.interp.set_NZCV_flags(row[0], row[1], row[2], 'sub')
             self.assertEqual(self.interp.register['APSR'], row[3])
 
+    def test_flags_are_lazy(self):
+        self.interp.set_NZCV_flags(0xFFFFFFFF, 0x1, 0x0, 'add')
+        self.assertEqual(self.interp.registers[self.interp.APSR], 0)  # Not written yet
+        self.assertTrue(self.interp.is_Z_set())
+        self.assertFalse(self.interp.is_N_set())
+        self.assertTrue(self.interp.is_C_set())
+        self.assertEqual(self.interp.registers[self.interp.APSR], 0b0110 << 28)
+
+    def test_NZ_flags_keep_last_CV(self):
+        self.interp.set_NZCV_flags(0x80000000, 0x80000000, 0x0, 'add')  # ZCV
+        self.interp.set_NZ_flags(0x80000000)  # N
+        self.assertEqual(self.interp.register['APSR'], 0b1011 << 28)
+
+    def test_set_flag_after_lazy_flags(self):
+        self.interp.set_NZCV_flags(0x80000000, 0x80000000, 0x0, 'add')  # ZCV
+        self.interp.set_APSR_flag_to_value('C', 0)
+        self.assertEqual(self.interp.register['APSR'], 0b0101 << 28)
+
+    def test_write_APSR_discards_lazy_flags(self):
+        self.interp.set_NZCV_flags(0x80000000, 0x80000000, 0x0, 'add')  # ZCV
+        self.interp.register['APSR'] = 1 << 31
+        self.assertTrue(self.interp.is_N_set())
+        self.assertFalse(self.interp.is_C_set())
+        self.assertEqual(self.interp.register['APSR'], 1 << 31)
+
 if __name__ == '__main__':
     unittest.main()
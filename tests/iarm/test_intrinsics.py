@@ -0,0 +1,172 @@
+from .test_iarm import TestArm
+import iarm.arm
+import iarm.exceptions
+import iarm.lanes
+import unittest
+
+
+class TestArmIntrinsics(TestArm):
+    def test_bind(self):
+        calls = []
+
+        def add(cpu, a, b, *_):
+            calls.append((a, b))
+            return a + b
+
+        self.interp.bind('add', add)
+        self.interp.evaluate("""
+ MOVS R0, #3
+ MOVS R1, #4
+ BL add
+ MOVS R2, #1
+""")
+        self.interp.run()
+        self.assertEqual(calls, [(3, 4)])
+        self.assertEqual(self.interp.register['R0'], 7)
+        self.assertEqual(self.interp.register['R2'], 1)
+        self.assertEqual(self.interp.cycles, 4)
+
+    def test_replaces_routine(self):
+        program = """
+ B main
+double ADDS R0, R0, R0
+ BX LR
+main MOVS R0, #5
+ BL double
+ MOVS R1, #1
+"""
+        self.interp.evaluate(program)
+        self.interp.bind('double', lambda cpu, value, *_: value * 3)  # Bound after the BL was decoded
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 15)
+        self.assertEqual(self.interp.cycles, 4)
+
+        self.interp.unbind('double')
+        self.interp.reset(keep_program=True)
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 10)
+
+    def test_results(self):
+        self.interp.bind('pair', lambda cpu, *_: (1, 2, -1))
+        self.interp.bind('nothing', lambda cpu, *_: None)
+        self.interp.evaluate("""
+ MOVS R0, #9
+ BL nothing
+ MOVS R4, R0
+ BL pair
+""")
+        self.interp.run()
+        self.assertEqual(self.interp.register['R4'], 9)
+        self.assertEqual([self.interp.register['R{}'.format(i)] for i in range(3)], [1, 2, 0xFFFFFFFF])
+
+    def test_cycles(self):
+        for batch_blocks in (False, True):
+            with self.subTest(batch_blocks=batch_blocks):
+                interp = iarm.arm.Arm(1024, False, batch_blocks=batch_blocks)
+                interp.bind('slow', lambda cpu, *_: None, cycles=50)
+
+                def varies(cpu, n, *_):
+                    cpu.charge(n)
+
+                interp.bind('varies', varies)
+                interp.evaluate("""
+ BL slow
+ MOVS R0, #7
+ BL varies
+ MOVS R1, #1
+""")
+                interp.run()
+                self.assertEqual(interp.cycles, 50 + 1 + 8 + 1)
+                self.assertEqual(interp.register['R1'], 1)
+
+    def test_step_limit(self):
+        self.interp.bind('slow', lambda cpu, *_: None, cycles=50)
+        self.interp.evaluate(" BL slow\n MOVS R0, #1")
+        self.interp.run(10)
+        self.assertEqual(self.interp.register['R0'], 0)
+        self.assertEqual(self.interp.cycles, 50)
+
+    def test_schedule_while_running(self):
+        fired = []
+
+        def later(cpu, *_):
+            cpu.schedule(cpu.cycles + 3, lambda: fired.append(cpu.cycles))
+
+        self.interp.bind('later', later)
+        self.interp.evaluate(" BL later\n MOVS R0, #1\n MOVS R0, #2\n MOVS R0, #3\n MOVS R0, #4")
+        self.interp.run()
+        # The running stretch is cut short so the event is handled on time, then it carries on
+        self.assertEqual(fired, [3])
+        self.assertEqual(self.interp.cycles, 5)
+        self.assertEqual(self.interp.register['R0'], 4)
+
+    def test_division(self):
+        self.interp.bind_library()
+        self.interp.evaluate("""
+ MOVS R0, #100
+ MOVS R1, #7
+ BL __aeabi_uidivmod
+ MOVS R4, R0
+ MOVS R5, R1
+ MOVS R0, #0
+ SUBS R0, R0, #100
+ MOVS R1, #7
+ BL __aeabi_idiv
+ MOVS R6, R0
+ MOVS R0, #5
+ MOVS R1, #0
+ BL __aeabi_uidiv
+""")
+        self.interp.run()
+        self.assertEqual(self.interp.register['R4'], 14)
+        self.assertEqual(self.interp.register['R5'], 2)
+        self.assertEqual(self.interp.register['R6'], (-14) & 0xFFFFFFFF)  # Rounds towards zero
+        self.assertEqual(self.interp.register['R0'], 0)
+
+    def test_memory(self):
+        self.interp.bind_library()
+        self.interp.memory.write(0x40, b'hello\0')
+        self.interp.evaluate("""
+ MOVS R0, #0x80
+ MOVS R1, #0x40
+ MOVS R2, #6
+ BL memcpy
+ MOVS R0, #0x80
+ BL strlen
+ MOVS R4, R0
+ MOVS R0, #0x80
+ MOVS R1, #0x2A
+ MOVS R2, #2
+ BL memset
+ MOVS R0, #0x40
+ MOVS R1, #3
+ BL __aeabi_memclr
+""")
+        self.interp.run()
+        self.assertEqual(self.interp.register['R4'], 5)
+        self.assertEqual(self.interp.memory.read(0x80, 6), b'**llo\0')
+        self.assertEqual(self.interp.memory.read(0x40, 6), b'\0\0\0lo\0')
+
+    def test_overlapping_copy(self):
+        self.interp.bind_library()
+        self.interp.memory.write(0x40, b'abcdef')
+        self.interp.evaluate(" MOVS R0, #0x42\n MOVS R1, #0x40\n MOVS R2, #4\n BL memmove")
+        self.interp.run()
+        self.assertEqual(self.interp.memory.read(0x40, 6), b'ababcd')
+
+    def test_fork(self):
+        self.interp.bind('seven', lambda cpu, *_: 7)
+        self.interp.evaluate(" BL seven")
+        fork = self.interp.fork()
+        fork.run()
+        self.assertEqual(fork.register['R0'], 7)
+
+    @unittest.skipIf(iarm.lanes.numpy is None, "numpy is not installed")
+    def test_lanes(self):
+        self.interp.bind('seven', lambda cpu, *_: 7)
+        self.interp.evaluate(" BL seven")
+        with self.assertRaises(iarm.exceptions.NotImplementedError):
+            self.interp.run_lanes(lanes=2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,205 @@
+from .test_iarm import TestArm
+import iarm.arm
+import iarm.exceptions
+import iarm.lanes
+import unittest
+import random
+
+
+@unittest.skipIf(iarm.lanes.numpy is None, "numpy is not installed")
+class TestArmLanes(TestArm):
+    """
+    Running lanes must give the same results as running the interpreter once for each set of inputs
+    """
+    def assertSameAsInterpreter(self, program, inputs, registers=('R0', 'R1', 'R2', 'R3', 'R4', 'PC', 'APSR')):
+        self.interp.evaluate(program)
+        lanes = self.interp.run_lanes({name: [row[name] for row in inputs] for name in inputs[0]})
+
+        for lane, row in enumerate(inputs):
+            reference = iarm.arm.Arm(1024, False)
+            for name, value in row.items():
+                reference.register[name] = value
+            reference.evaluate(program)
+            reference.run()
+            for name in registers:
+                self.assertEqual(lanes.register[name][lane], reference.register[name],
+                                 msg="{} in lane {} with {}".format(name, lane, row))
+            self.assertEqual(lanes.memory[lane].tobytes(), reference.memory.read(0, 1024))
+        return lanes
+
+    def test_arithmetic(self):
+        program = """
+ ADDS R2, R0, R1
+ SUBS R3, R0, R1
+ ADCS R3, R3, R0
+ MULS R4, R1, R4
+ RSBS R1, R1, #0
+ CMP R0, #10
+"""
+        inputs = [{'R0': random.randint(0, 0xFFFFFFFF), 'R1': random.randint(0, 0xFFFFFFFF), 'R4': random.randint(0, 0xFFFF)}
+                  for _ in range(50)]
+        inputs.append({'R0': 0x7FFFFFFF, 'R1': 1, 'R4': 0})
+        inputs.append({'R0': 10, 'R1': 10, 'R4': 0})
+        self.assertSameAsInterpreter(program, inputs)
+
+    def test_logic_and_shift(self):
+        program = """
+ MOVS R2, R0
+ ANDS R2, R2, R1
+ MOVS R3, R0
+ EORS R3, R3, R1
+ LSLS R4, R0, #3
+ LSRS R1, R1, #5
+ ASRS R0, R0, #4
+"""
+        inputs = [{'R0': random.randint(0, 0xFFFFFFFF), 'R1': random.randint(0, 0xFFFFFFFF)} for _ in range(50)]
+        self.assertSameAsInterpreter(program, inputs)
+
+    def test_divergent_loop(self):
+        program = """
+ MOVS R1, #0
+ MOVS R2, #0
+loop ADDS R1, R1, R0
+ STR R1, [R2, #0]
+ ADDS R2, R2, #4
+ SUBS R0, R0, #1
+ BNE loop
+"""
+        inputs = [{'R0': i} for i in range(1, 30)]
+        lanes = self.assertSameAsInterpreter(program, inputs)
+        self.assertEqual(list(lanes.register['R1']), [i * (i + 1) // 2 for i in range(1, 30)])
+
+    def test_function_call(self):
+        program = """
+ B main
+double ADDS R0, R0, R0
+ BX LR
+main BL double
+ CMP R0, #100
+ BHI big
+ MOVS R1, #1
+ B done
+big MOVS R1, #2
+done NOP
+"""
+        inputs = [{'R0': i} for i in (0, 1, 49, 50, 51, 1000)]
+        lanes = self.assertSameAsInterpreter(program, inputs)
+        self.assertEqual(list(lanes.register['R1']), [1, 1, 1, 1, 2, 2])
+
+    def test_random_programs(self):
+        # Lanes decode every instruction again, so compare them to the interpreter on programs neither has seen
+        rng = random.Random(0)
+        registers = ['R0', 'R1', 'R2', 'R3', 'R4', 'R5']
+        three = ['ADCS', 'ADDS', 'SUBS', 'SBCS', 'ANDS', 'BICS', 'EORS', 'ORRS', 'MULS', 'ASRS', 'LSLS', 'LSRS']
+        two = ['MOVS', 'MVNS', 'CMP', 'CMN', 'TST', 'REV', 'REV16', 'REVSH', 'SXTB', 'SXTH', 'UXTB', 'UXTH', 'MOV']
+        memory = ['LDR', 'LDRB', 'LDRH', 'LDRSB', 'LDRSH', 'STR', 'STRB', 'STRH']
+        conditions = ['BEQ', 'BNE', 'BCS', 'BCC', 'BMI', 'BPL', 'BVS', 'BVC', 'BHI', 'BLS', 'BGE', 'BLT', 'BGT', 'BLE']
+
+        def operand():
+            if rng.random() < 0.5:
+                return rng.choice(registers)
+            return '#{}'.format(rng.choice([0, 1, 2, 7, 8, 16, 31, 32, 255, rng.randint(0, 255)]))
+
+        def instruction():
+            kind = rng.random()
+            Ra, Rb = rng.choice(registers), rng.choice(registers)
+            if kind < 0.1:
+                op = rng.choice(['ASRS', 'LSLS', 'LSRS'])
+                return [' MOVS R7, #{}'.format(rng.randint(0, 40)), ' {} {}, {}, R7'.format(op, Ra, Ra)]
+            if kind < 0.25:
+                op = rng.choice(memory)
+                size = 4 if op in ('LDR', 'STR') else 2 if 'H' in op else 1
+                return [' MOVS R6, #{}'.format(rng.randrange(0, 64) * 4),
+                        ' {} {}, [R6, #{}]'.format(op, Ra, rng.randrange(0, 8) * size)]
+            if kind < 0.7:
+                return [' {} {}, {}, {}'.format(rng.choice(three), Ra, Rb if rng.random() < 0.5 else Ra, operand())]
+            return [' {} {}, {}'.format(rng.choice(two), Ra, operand())]
+
+        def valid(lines):
+            try:
+                iarm.arm.Arm(1024, False).evaluate('\n'.join(lines))
+            except iarm.exceptions.IarmError:
+                return False
+            return True
+
+        for trial in range(40):
+            lines = []
+            while len(lines) < 12:
+                new = instruction()
+                if valid(new):
+                    lines.extend(new)
+                if rng.random() < 0.15:
+                    # Skip a few instructions on some of the lanes
+                    label = 'SKIP{}'.format(len(lines))
+                    lines += [' CMP {}, {}'.format(rng.choice(registers), operand()),
+                              ' {} {}'.format(rng.choice(conditions), label)]
+                    lines += [line for line in instruction() if valid([line])] + ['{} NOP'.format(label)]
+            inputs = [{name: rng.choice([0, 1, 0x7FFFFFFF, 0x80000000, 0xFFFFFFFF, rng.randint(0, 0xFFFFFFFF)])
+                       for name in registers} for _ in range(8)]
+            for row in inputs:
+                row['APSR'] = rng.randint(0, 15) << 28
+            self.interp = iarm.arm.Arm(1024, False)
+            self.assertSameAsInterpreter('\n'.join(lines), inputs, registers + ['R6', 'R7', 'PC', 'APSR'])
+
+    def test_steps(self):
+        self.interp.evaluate("""
+ MOVS R1, #1
+ MOVS R1, #2
+ MOVS R1, #3
+""")
+        lanes = self.interp.run_lanes(lanes=4, steps=2)
+        self.assertEqual(list(lanes.register['R1']), [2] * 4)
+        self.assertEqual(list(lanes.register['PC']), [3] * 4)
+
+    def test_fault_stops_lane(self):
+        self.interp.evaluate("""
+ LDR R1, [R0, #0]
+ MOVS R2, #1
+""")
+        lanes = self.interp.run_lanes({'R0': [0, 2, 1024, 4]})
+        self.assertEqual(list(lanes.register['R2']), [1, 0, 0, 1])
+        self.assertEqual(sorted(lanes.faults), [1, 2])
+        self.assertIsInstance(lanes.faults[1], iarm.exceptions.HardFault)
+        self.assertEqual(lanes.register['PC'][1], 1)
+
+    def test_infinite_loop_stops_lane(self):
+        self.interp.evaluate("""
+ CMP R0, #0
+ BEQ .
+ MOVS R1, #1
+""")
+        lanes = self.interp.run_lanes({'R0': [0, 1]})
+        self.assertEqual(list(lanes.register['R1']), [0, 1])
+        self.assertEqual(list(lanes.register['PC']), [2, 4])
+        self.assertEqual(lanes.faults, {})
+
+    def test_memory_per_lane(self):
+        self.interp.evaluate("""
+ LDR R1, [R0, #0]
+ ADDS R1, R1, #1
+ STR R1, [R0, #0]
+ PUSH {R1}
+ POP {R2}
+""")
+        memory = [[0] * 1024 for _ in range(3)]
+        memory[1][8] = 5
+        memory[2][8] = 0xFF
+        lanes = self.interp.run_lanes({'R0': 8, 'SP': 512}, memory=memory)
+        self.assertEqual(list(lanes.register['R2']), [1, 6, 0x100])
+        self.assertEqual(list(lanes.memory[:, 8]), [1, 6, 0])
+        self.assertEqual(list(lanes.memory[:, 9]), [0, 0, 1])
+        self.assertEqual(self.interp.register['R1'], 0)  # The interpreter is left alone
+
+    def test_unsupported_instruction(self):
+        self.interp.evaluate(" LDM R0!, {R1, R2}")
+        with self.assertRaises(iarm.exceptions.NotImplementedError):
+            self.interp.run_lanes(lanes=2)
+
+    def test_sparse_memory(self):
+        interp = iarm.arm.Arm(2**32, False)
+        interp.evaluate(" MOVS R0, #1")
+        with self.assertRaises(ValueError):
+            interp.run_lanes(lanes=2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 from .test_iarm import TestArm
 import iarm.exceptions
+import iarm.memory
 import unittest
 
 
@@ -34,9 +35,17 @@ class TestArmMemory(TestArm):
             # data value is word aligned
             self.interp.evaluate(" ADR R0, [PC, #3]")
 
-    @unittest.skip('No Test Defined')
     def test_LDM(self):
-        pass
+        self.interp.memory.write_word(4, 0x12345678)
+        self.interp.memory.write_word(8, 0x9ABCDEF0)
+        self.interp.register['R0'] = 4
+
+        self.interp.evaluate(" LDM R0!, {R1, R2}")
+        self.interp.run()
+
+        self.assertEqual(self.interp.register['R1'], 0x12345678)
+        self.assertEqual(self.interp.register['R2'], 0x9ABCDEF0)
+        self.assertEqual(self.interp.register['R0'], 12)
 
     def test_LDR(self):
         self.interp.memory[8] = 0x12
@@ -235,17 +244,60 @@ class TestArmMemory(TestArm):
             # Can use SP
             self.interp.evaluate(" LDRSB R0, [SP, R1]")
 
-    @unittest.skip('No Test Defined')
     def test_POP(self):
-        pass
+        self.interp.memory.write_word(8, 0x12345678)
+        self.interp.register['SP'] = 8
+
+        self.interp.evaluate(" POP {R0}")
+        self.interp.run()
+
+        self.assertEqual(self.interp.register['R0'], 0x12345678)
+        self.assertEqual(self.interp.register['SP'], 12)
 
-    @unittest.skip('No Test Defined')
     def test_PUSH(self):
-        pass
+        self.interp.register['R0'] = 1
+        self.interp.register['R1'] = 2
+        self.interp.register['SP'] = 16
+
+        self.interp.evaluate(" PUSH {R0, R1}")
+        self.interp.run()
+
+        self.assertEqual(self.interp.register['SP'], 8)
+
+        self.interp.evaluate(" POP {R2, R3}")
+        self.interp.run()
+        self.assertEqual(self.interp.register['R2'], 1)
+        self.assertEqual(self.interp.register['R3'], 2)
+        self.assertEqual(self.interp.register['SP'], 16)
+
+    def test_PUSH_default_stack(self):
+        # The stack starts at the top of memory, so PUSH works without setting SP
+        self.assertEqual(self.interp.register['SP'], len(self.interp.memory))
+
+        self.interp.evaluate(" MOVS R0, #100")
+        self.interp.evaluate(" PUSH {R0}")
+        self.interp.evaluate(" POP {R5}")
+        self.interp.run()
+
+        self.assertEqual(self.interp.register['R5'], 100)
+        self.assertEqual(self.interp.register['SP'], len(self.interp.memory))
+
+    def test_PUSH_reset_stack(self):
+        self.interp.register['SP'] = 0
+        self.interp.reset()
+        self.assertEqual(self.interp.register['SP'], len(self.interp.memory))
 
-    @unittest.skip('No Test Defined')
     def test_STM(self):
-        pass
+        self.interp.register['R0'] = 4
+        self.interp.register['R1'] = 0x12345678
+        self.interp.register['R2'] = 0x9ABCDEF0
+
+        self.interp.evaluate(" STM R0!, {R1, R2}")
+        self.interp.run()
+
+        self.assertEqual(self.interp.memory.read_word(4), 0x12345678)
+        self.assertEqual(self.interp.memory.read_word(8), 0x9ABCDEF0)
+        self.assertEqual(self.interp.register['R0'], 12)
 
     def test_STR(self):
         self.interp.register['R0'] = 0x12345678
@@ -282,6 +334,12 @@ class TestArmMemory(TestArm):
         self.assertEqual(self.interp.memory[10], 0x34)
         self.assertEqual(self.interp.memory[11], 0x12)
 
+    def test_STR_out_of_memory(self):
+        self.interp.register['R1'] = 1024
+        self.interp.evaluate(" STR R0, [R1, #0]")
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.interp.run()
+
     @unittest.skip('No Test Defined')
     def test_STRB(self):
         pass
@@ -315,5 +373,21 @@ R SPACE 4
         self.assertEqual(self.interp.register["R1"], 0)
         self.assertEqual(self.interp.register["R2"], 4)
 
+    def test_SPACE_in_sram(self):
+        # On a memory map SPACE comes from SRAM so it can be written to, and constants stay in flash
+        self.interp.memory = iarm.memory.cortex_m0_map()
+        self.interp.evaluate("""BUF SPACE 4
+VALUE DCD 0x12345678
+ LDR R1, =BUF
+ LDR R2, =VALUE
+ LDR R0, [R2, #0]
+ STR R0, [R1, #0]
+""")
+        self.interp.run()
+        self.assertEqual(self.interp.labels['BUF'], 0x20000000)
+        self.assertEqual(self.interp.labels['VALUE'], 0)
+        self.assertEqual(self.interp.memory.read_word(0x20000000), 0x12345678)
+
+
 if __name__ == '__main__':
     unittest.main()
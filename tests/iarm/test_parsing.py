@@ -41,6 +41,62 @@ class TestArmParsing(TestArm):
             self.interp.evaluate(' MOVS abc, 123')
         self.assertIn('Unknown', str(cm.exception))
 
+    def test_extra_spaces(self):
+        with self.assertRaises(iarm.exceptions.ParsingError) as cm:
+            self.interp.evaluate(' ADDS R1, R2 R3')
+        self.assertIn('comma', str(cm.exception))
+
+    def test_operands_are_whole(self):
+        self.assertFalse(self.interp.is_register('R1X'))
+        self.assertFalse(self.interp.is_register('APSR'))
+        self.assertTrue(self.interp.is_register('fp'))
+
+    def test_brackets(self):
+        self.assertEqual(self.interp.get_three_parameters(self.interp.THREE_PARAMETER_WITH_BRACKETS, 'r0, [r1,#4]'),
+                         ('R0', 'R1', '#4'))
+        with self.assertRaises(iarm.exceptions.ParsingError):
+            self.interp.get_three_parameters(self.interp.THREE_PARAMETER_WITH_BRACKETS, 'R0, [R1]')
+        with self.assertRaises(iarm.exceptions.ParsingError) as cm:
+            self.interp.get_two_parameters(self.interp.TWO_PARAMETER_WITH_BRACKETS, 'R0, [R1], R2')
+        self.assertIn('Extra', str(cm.exception))
+
+
+class TestArmEquates(TestArm):
+    def test_equates(self):
+        self.interp.evaluate("""SIZE EQU 8
+OFFSET EQU 4
+COUNT EQU SIZE
+ MOVS R0, #SIZE
+ MOVS R1, #0x40
+ STR R0, [R1, #OFFSET]
+ LDR R2, =OFFSET
+ MOVS R3, #COUNT
+""")
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 8)
+        self.assertEqual(self.interp.memory.read_word(0x44), 8)
+        self.assertEqual(self.interp.register['R2'], 4)
+        self.assertEqual(self.interp.register['R3'], 8)
+
+    def test_whole_names(self):
+        self.interp.evaluate("""N EQU 1
+ MOVS R0, #1
+ CMP R0, #N
+ BEQ DONE
+ MOVS R1, #N
+DONE MOVS R2, #2
+""")
+        self.interp.run()  # The N in DONE is left alone
+        self.assertEqual(self.interp.register['R1'], 0)
+        self.assertEqual(self.interp.register['R2'], 2)
+
+    def test_redefined(self):
+        self.interp.evaluate("VALUE EQU 1\n MOVS R0, #VALUE")
+        self.interp.evaluate("VALUE EQU 2\n MOVS R1, #VALUE")
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 1)
+        self.assertEqual(self.interp.register['R1'], 2)
+
 
 class TestArmValidation(TestArm):
     """
@@ -0,0 +1,73 @@
+import iarm.arm
+import iarm.peripherals
+import iarm.pool
+import unittest
+
+
+class TestInterpreterPool(unittest.TestCase):
+    def test_prewarmed(self):
+        pool = iarm.pool.InterpreterPool(3)
+        self.assertEqual(len(pool), 3)
+        interp = pool.acquire()
+        self.assertIsInstance(interp, iarm.arm.Arm)
+        self.assertEqual(len(pool), 2)
+
+    def test_reused_after_release(self):
+        pool = iarm.pool.InterpreterPool(1)
+        with pool.interpreter() as interp:
+            interp.evaluate(" MOVS R0, #5")
+            interp.run()
+            first = interp
+        self.assertEqual(len(pool), 1)
+        with pool.interpreter() as interp:
+            self.assertIs(interp, first)
+            self.assertEqual(interp.register['R0'], 0)
+            self.assertEqual(interp.program, [])
+
+    def test_empty_pool_makes_more(self):
+        pool = iarm.pool.InterpreterPool(0, memory_size=64)
+        first = pool.acquire()
+        second = pool.acquire()
+        self.assertIsNot(first, second)
+        self.assertEqual(len(second.memory), 64)
+        pool.release(first)
+        pool.release(second)
+        self.assertEqual(len(pool), 2)
+
+    def test_released_on_error(self):
+        pool = iarm.pool.InterpreterPool(1)
+        with self.assertRaises(ValueError):
+            with pool.interpreter() as interp:
+                interp.register['R3'] = 1
+                raise ValueError
+        self.assertEqual(len(pool), 1)
+        self.assertEqual(pool.acquire().register['R3'], 0)
+    def test_nothing_left_attached(self):
+        pool = iarm.pool.InterpreterPool(1, memory_size=2**32)
+        with pool.interpreter() as interp:
+            first = interp
+            memory = interp.memory
+            interp.attach(iarm.peripherals.NVIC())
+            interp.attach(iarm.peripherals.Peripheral(0x100))
+            interp.bind('double', lambda cpu, value, *_: 2 * value)
+            output = interp.semihosting.output = lambda name, text: None
+            interp.evaluate(" MOVS R0, #4\n BL double")
+            interp.run()
+            self.assertEqual(interp.register['R0'], 8)
+        with pool.interpreter() as interp:
+            self.assertIs(interp, first)
+            self.assertEqual(interp.peripherals, [])
+            self.assertIsNone(interp.nvic)
+            self.assertEqual(interp.intrinsics, {})
+            self.assertIsNot(interp.semihosting.output, output)
+            self.assertIsNot(interp.memory, memory)
+            interp.memory.write_word(0x100, 1)  # Plain memory again
+            self.assertEqual(interp.memory.read_word(0x100), 1)
+            # The bound function is not called any more
+            interp.evaluate(" MOVS R0, #4\n BL double\n B done\ndouble ADDS R0, R0, #1\n BX LR\ndone NOP")
+            interp.run()
+            self.assertEqual(interp.register['R0'], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,9 +5,28 @@ import unittest
 
 # TODO make sure to also test no destination registers
 class TestArmShift(TestArm):
-    @unittest.skip('No Test Defined')
     def test_ASRS(self):
-        pass
+        self.interp.register['R1'] = 0x80000010
+
+        self.interp.evaluate(" ASRS R0, R1, #4")
+        self.interp.run()
+
+        # The sign comes from R1, not from R0
+        self.assertEqual(self.interp.register['R0'], 0xF8000001)
+        self.assertTrue(self.interp.register['APSR'] & (1 << 31))
+
+    def test_ASRS_register(self):
+        self.interp.register['R0'] = 0x80000000
+        self.interp.register['R1'] = 0
+        self.interp.register['R2'] = 0x80000000
+        self.interp.register['R3'] = 40
+
+        self.interp.evaluate(" ASRS R0, R0, R1")
+        self.interp.evaluate(" ASRS R2, R2, R3")
+        self.interp.run()
+
+        self.assertEqual(self.interp.register['R0'], 0x80000000)
+        self.assertEqual(self.interp.register['R2'], 0xFFFFFFFF)
 
     @unittest.skip('No Test Defined')
     def test_LSLS(self):
@@ -0,0 +1,326 @@
+import os
+import tempfile
+import unittest
+import iarm.arm
+import iarm.memory
+import iarm.exceptions
+
+
+class TestFlatMemory(unittest.TestCase):
+    def make(self, size, generate_random=False):
+        return iarm.memory.FlatMemory(size, generate_random)
+
+    def setUp(self):
+        self.memory = self.make(16)
+
+    def test_bytes(self):
+        self.assertEqual(self.memory[0], 0)
+        self.memory[0] = 0x1FF
+        self.assertEqual(self.memory[0], 0xFF)
+
+    def test_word(self):
+        self.memory.write_word(4, 0x12345678)
+        self.assertEqual([self.memory[i] for i in range(4, 8)], [0x78, 0x56, 0x34, 0x12])
+        self.assertEqual(self.memory.read_word(4), 0x12345678)
+
+        self.memory.write_word(8, -1)
+        self.assertEqual(self.memory.read_word(8), 0xFFFFFFFF)
+
+    def test_halfword(self):
+        self.memory.write_halfword(2, 0x12345678)
+        self.assertEqual([self.memory[i] for i in range(2, 4)], [0x78, 0x56])
+        self.assertEqual(self.memory.read_halfword(2), 0x5678)
+
+    def test_size(self):
+        self.assertEqual(len(self.memory), 16)
+        self.memory.write_word(12, 1)
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory.write_word(13, 1)
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory.read_halfword(15)
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory[16]
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory[-1] = 0
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory.read_word(-4)
+
+    def test_generate_random(self):
+        memory = self.make(1024, True)
+        self.assertTrue(any(memory[i] for i in range(1024)))
+
+    def test_block(self):
+        self.memory.write(3, b'\x01\x02\x03\x04\x05\x06')
+        self.assertEqual(self.memory.read(2, 8), b'\x00\x01\x02\x03\x04\x05\x06\x00')
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory.write(12, bytes(5))
+
+    def test_reset(self):
+        self.memory.write_word(4, 0x12345678)
+        self.memory.reset()
+        self.assertEqual(self.memory.read(0, 16), bytes(16))
+
+    def test_fork(self):
+        self.memory.write_word(4, 1)
+        other = self.memory.fork()
+        self.assertEqual(other.read_word(4), 1)
+        other.write_word(4, 2)
+        self.memory.write_word(8, 3)
+        self.assertEqual(self.memory.read_word(4), 1)
+        self.assertEqual(other.read_word(4), 2)
+        self.assertEqual(other.read_word(8), 0)
+        self.assertEqual(len(other), 16)
+
+
+class TestPagedMemory(TestFlatMemory):
+    """
+    Paged memory must act the same as flat memory, small pages make accesses split across pages
+    """
+    def make(self, size, generate_random=False):
+        return iarm.memory.PagedMemory(size, generate_random, page_bits=3)
+
+    def test_split_across_pages(self):
+        self.memory.write_word(6, 0x12345678)
+        self.assertEqual(self.memory.read_word(6), 0x12345678)
+        self.assertEqual(self.memory[7], 0x56)
+        self.assertEqual(self.memory[8], 0x34)
+        self.memory.write_halfword(7, 0xABCD)
+        self.assertEqual(self.memory.read_halfword(7), 0xABCD)
+
+    def test_copy_on_write(self):
+        self.assertEqual(self.memory.pages_owned, 0)
+        self.memory[0] = 1
+        self.assertEqual(self.memory.pages_owned, 1)
+        other = self.memory.fork()
+        self.assertEqual((self.memory.pages_owned, other.pages_owned), (0, 0))
+        other[9] = 1
+        self.assertEqual((self.memory.pages_owned, other.pages_owned), (0, 1))
+        self.memory[0] = 2
+        self.assertEqual(other[0], 1)
+        self.assertEqual(self.memory[9], 0)
+
+
+class TestMappedMemory(TestFlatMemory):
+    """
+    Memory mapped files must act the same as flat memory
+    Copy on write is used for the shared tests so reset goes back to the zeros in the file
+    """
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'memory.bin')
+        super().setUp()
+
+    def make(self, size, generate_random=False):
+        with open(self.path, 'wb') as f:
+            f.write(bytes(size))
+        memory = iarm.memory.MappedMemory(self.path, copy_on_write=True)
+        self.addCleanup(memory.close)
+        return memory
+
+    def test_generate_random(self):
+        memory = self.make(16)
+        memory.randomize()
+        self.assertEqual(memory.read(0, 16), bytes(16))  # The file holds real values
+
+    def test_writes_land_in_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(bytes(range(8)))
+        with iarm.memory.MappedMemory(self.path) as memory:
+            self.assertEqual(memory.read_word(4), 0x07060504)
+            memory.write_word(0, 0x12345678)
+            memory.reset()  # The file is the memory, it is not cleared
+            memory.flush()
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), b'\x78\x56\x34\x12\x04\x05\x06\x07')
+
+    def test_size(self):
+        super().test_size()
+        with open(self.path, 'wb') as f:
+            f.write(bytes(4))
+        with iarm.memory.MappedMemory(self.path, 64) as memory:
+            self.assertEqual(len(memory), 64)
+        self.assertEqual(os.path.getsize(self.path), 64)
+        with self.assertRaises(ValueError):
+            iarm.memory.MappedMemory(self.path, 128, copy_on_write=True)
+
+    def test_interpreter(self):
+        with open(self.path, 'wb') as f:
+            f.write(bytes(range(1, 9)))
+        interp = iarm.arm.Arm(1024, False)
+        interp.memory = iarm.memory.MappedMemory(self.path)
+        self.addCleanup(interp.memory.close)
+        interp.evaluate("""
+ MOVS R1, #0
+ LDR R0, [R1, #0]
+ STRB R1, [R1, #4]
+ STRH R1, [R1, #6]
+""")
+        interp.run()
+        interp.memory.flush()
+        self.assertEqual(interp.register['R0'], 0x04030201)
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), b'\x01\x02\x03\x04\x00\x06\x00\x00')
+
+
+class TestSparseMemory(unittest.TestCase):
+    def setUp(self):
+        self.memory = iarm.memory.PagedMemory(2**32)
+
+    def test_cortex_m0_addresses(self):
+        self.memory.write_word(0x20000000, 1)
+        self.memory.write_word(0x20000004, 2)
+        self.memory.write_halfword(0x40000000, 3)
+        self.memory[0xFFFFFFFF] = 4
+        self.assertEqual(self.memory.read_word(0x20000000), 1)
+        self.assertEqual(self.memory.read_word(0x20000004), 2)
+        self.assertEqual(self.memory.read_halfword(0x40000000), 3)
+        self.assertEqual(self.memory[0xFFFFFFFF], 4)
+        self.assertEqual(self.memory.read_word(0x30000000), 0)
+        self.assertEqual(self.memory.pages_owned, 3)
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory.read_word(0xFFFFFFFE)
+
+    def test_cached_pages_follow_copies(self):
+        self.memory.write_word(0x20000000, 1)
+        self.assertEqual(self.memory.read_word(0x20000000), 1)
+        other = self.memory.fork()
+        other.write_word(0x20000000, 2)
+        self.memory.write_word(0x20000000, 3)
+        self.assertEqual(other.read_word(0x20000000), 2)
+        self.assertEqual(self.memory.read_word(0x20000000), 3)
+        self.memory.reset()
+        self.assertEqual(self.memory.read_word(0x20000000), 0)
+        self.assertEqual(other.read_word(0x20000000), 2)
+
+    def test_generate_random(self):
+        memory = iarm.memory.PagedMemory(2**32, True)
+        value = memory.read(0x20000000, 16)
+        self.assertNotEqual(value, bytes(16))
+        self.assertEqual(memory.read(0x20000000, 16), value)  # Stays the same once read
+
+
+class TestReadOnlyMemory(unittest.TestCase):
+    def test_read_only(self):
+        memory = iarm.memory.ReadOnlyMemory(16)
+        memory.load(4, b'\x78\x56\x34\x12')
+        self.assertEqual(memory.read_word(4), 0x12345678)
+        with self.assertRaises(iarm.exceptions.HardFault):
+            memory.write_word(4, 0)
+        with self.assertRaises(iarm.exceptions.HardFault):
+            memory.write_halfword(4, 0)
+        with self.assertRaises(iarm.exceptions.HardFault):
+            memory[4] = 0
+        with self.assertRaises(iarm.exceptions.HardFault):
+            memory.load(14, bytes(4))
+        memory.reset()
+        self.assertEqual(memory.read_word(4), 0x12345678)
+
+    def test_fork_shares(self):
+        memory = iarm.memory.ReadOnlyMemory(16)
+        memory.load(0, b'\x01')
+        other = memory.fork()
+        self.assertIs(other._data, memory._data)
+        other.load(0, b'\x02')
+        self.assertEqual(memory[0], 1)
+        self.assertEqual(other[0], 2)
+
+    def test_shared_memory(self):
+        memory = iarm.memory.ReadOnlyMemory(data=bytes(range(16)))
+        shared = memory.share()
+        self.addCleanup(shared.unlink)
+        self.addCleanup(shared.close)
+        other = iarm.memory.ReadOnlyMemory.from_shared(shared.name)
+        self.assertEqual(other.read(0, 16), bytes(range(16)))
+        self.assertEqual(memory.read_word(4), other.read_word(4))
+        other.load(0, b'\xFF')  # Loading makes its own copy
+        self.assertEqual(other[0], 0xFF)
+        self.assertEqual(memory[0], 0)
+
+
+    def test_shared_memory_close(self):
+        memory = iarm.memory.ReadOnlyMemory(data=bytes(range(16)))
+        shared = memory.share()
+        other = iarm.memory.ReadOnlyMemory.from_shared(shared.name)
+        forked = other.fork()
+        other.close()
+        self.assertEqual(forked.read_word(4), 0x07060504)  # Still open for the fork
+        forked.close()
+        memory.close()
+        shared.unlink()
+        with self.assertRaises(FileNotFoundError):
+            iarm.memory.ReadOnlyMemory.from_shared(shared.name)
+
+    def test_close_not_shared(self):
+        memory = iarm.memory.ReadOnlyMemory(data=bytes(range(16)))
+        memory.close()
+        self.assertEqual(memory[1], 1)
+
+class TestMemoryMap(unittest.TestCase):
+    def setUp(self):
+        self.memory = iarm.memory.cortex_m0_map(flash_size=0x100, sram_size=0x100)
+
+    def test_regions(self):
+        self.memory.write_word(0x20000010, 1)
+        self.memory.write_halfword(0x40000000, 2)
+        self.memory[0xE000E010] = 3
+        self.memory.load(0, b'\x04')
+        self.assertEqual(self.memory.read_word(0x20000010), 1)
+        self.assertEqual(self.memory.named('sram').memory.read_word(0x10), 1)
+        self.assertEqual(self.memory.read_halfword(0x40000000), 2)
+        self.assertEqual(self.memory[0xE000E010], 3)
+        self.assertEqual(self.memory[0], 4)
+        self.assertEqual(self.memory.region(0x20000010).name, 'sram')
+
+    def test_faults(self):
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory.write_word(0, 1)  # Flash is read only
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory.read_word(0x10000000)  # Nothing there
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory.read_word(0x20000100)  # Past the end of SRAM
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory.read_word(-4)
+
+    def test_add_region(self):
+        with self.assertRaises(ValueError):
+            self.memory.add_region('unaligned', 0x60000100, iarm.memory.PagedMemory(16))
+        with self.assertRaises(ValueError):
+            self.memory.add_region('overlap', 0x20000000, iarm.memory.PagedMemory(16))
+        self.memory.remove_region('sram')
+        self.memory.add_region('sram', 0x20000000, iarm.memory.PagedMemory(0x1000))
+        self.memory.write_word(0x20000800, 5)
+        self.assertEqual(self.memory.read_word(0x20000800), 5)
+
+    def test_fork(self):
+        self.memory.load(0, b'\x01')
+        self.memory.write_word(0x20000000, 1)
+        other = self.memory.fork()
+        other.write_word(0x20000000, 2)
+        self.assertEqual(self.memory.read_word(0x20000000), 1)
+        self.assertEqual(other[0], 1)
+        self.assertIs(other.named('flash').memory._data, self.memory.named('flash').memory._data)
+
+    def test_interpreter(self):
+        interp = iarm.arm.Arm(1024, False)
+        interp.memory = self.memory
+        interp.evaluate("""value DCD 0x12345678
+ LDR R0, =value
+ LDR R1, [R0]
+ LDR R2, =0x20000100
+ MOV SP, R2
+ PUSH {R1}
+ POP {R3}
+""")
+        interp.run()
+        self.assertEqual(interp.register['R3'], 0x12345678)
+        self.assertEqual(self.memory.read_word(0x200000FC), 0x12345678)
+        interp.evaluate(" STR R1, [R0, #0]")
+        with self.assertRaises(iarm.exceptions.HardFault):
+            interp.run()
+
+        interp.reset(keep_program=True)
+        self.assertEqual(self.memory.read_word(0), 0x12345678)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,721 @@
+import random
+import unittest
+import iarm.arm
+import iarm.exceptions
+import iarm.memory
+import iarm.peripherals
+
+
+class Recorder(iarm.peripherals.Peripheral):
+    """Keeps every access, and reads of offset 0 count up"""
+    size = 16
+
+    def __init__(self, base):
+        super().__init__(base)
+        self.accesses = []
+        self.count = 0
+
+    def read(self, offset, width):
+        self.accesses.append(('read', offset, width))
+        if offset == 0:
+            self.count += 1
+            return self.count
+        return super().read(offset, width)
+
+    def write(self, offset, width, value):
+        self.accesses.append(('write', offset, width, value))
+        super().write(offset, width, value)
+
+
+class TestPeripherals(unittest.TestCase):
+    def setUp(self):
+        self.memory = iarm.memory.PagedMemory(0x10000)
+        self.device = Recorder(0x1000)
+        self.memory.attach(self.device, 0x1000)
+
+    def test_dispatch(self):
+        self.memory.write_word(0x1004, 0x12345678)
+        self.memory.write_halfword(0x1008, 0x1ABCD)
+        self.memory[0x100C] = 0x1FF
+        self.assertEqual(self.memory.read_word(0x1004), 0x12345678)
+        self.assertEqual(self.memory.read_halfword(0x1008), 0xABCD)
+        self.assertEqual(self.memory[0x100C], 0xFF)
+        self.assertEqual(self.memory.read_word(0x1000), 1)
+        self.assertEqual(self.memory.read_word(0x1000), 2)
+        self.assertEqual(self.device.accesses[:3], [('write', 4, 4, 0x12345678), ('write', 8, 2, 0xABCD),
+                                                    ('write', 12, 1, 0xFF)])
+
+    def test_memory_around_peripheral(self):
+        self.memory.write_word(0x0FFC, 1)
+        self.memory.write_word(0x1100, 2)
+        self.assertEqual(self.memory.read_word(0x0FFC), 1)
+        self.assertEqual(self.memory.read_word(0x1100), 2)
+        self.assertEqual(self.device.accesses, [])
+        self.assertEqual(self.memory.read(0x1004, 4), bytes(4))
+        self.assertEqual(len(self.device.accesses), 4)  # One byte at a time
+
+    def test_never_cached(self):
+        self.memory.read_word(0x1004)
+        self.memory.write_word(0x1004, 1)
+        self.memory.read_word(0x1004)
+        self.assertEqual(len(self.device.accesses), 3)
+
+    def test_outside_registers(self):
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.memory.read_word(0x1010)  # Same page but past the peripheral
+        with self.assertRaises(ValueError):
+            self.memory.attach(Recorder(0x1080), 0x1080)
+
+    def test_reset(self):
+        self.memory.write_word(0x1004, 5)
+        self.memory.reset()
+        self.assertEqual(self.memory.read_word(0x1004), 0)
+
+    def test_interpreter(self):
+        interp = iarm.arm.Arm(2**32, False)
+        device = Recorder(0x40004000)
+        interp.attach(device)
+        self.assertIs(device.cpu, interp)
+        interp.evaluate("""
+ LDR R0, =0x40004000
+ MOVS R1, #0x41
+ STRB R1, [R0, #4]
+ STR R1, [R0, #8]
+ LDR R2, [R0, #0]
+ LDR R3, [R0, #0]
+ LDRB R4, [R0, #4]
+""")
+        interp.run()
+        self.assertEqual(interp.register['R2'], 1)
+        self.assertEqual(interp.register['R3'], 2)
+        self.assertEqual(interp.register['R4'], 0x41)
+        self.assertIn(('write', 8, 4, 0x41), device.accesses)
+
+    def test_memory_map(self):
+        interp = iarm.arm.Arm(1024, False)
+        interp.memory = iarm.memory.cortex_m0_map()
+        device = Recorder(0x40004000)
+        interp.attach(device)
+        interp.memory.write_word(0x40004004, 7)
+        self.assertEqual(device.read(4, 4), 7)
+        with self.assertRaises(ValueError):
+            interp.attach(Recorder(0x0))  # Flash
+
+
+class Clock(object):
+    """Stands in for the interpreter, only the cycle count is used"""
+    cycles = 0
+
+
+class TestSysTick(unittest.TestCase):
+    def setUp(self):
+        self.cpu = Clock()
+        self.timer = iarm.peripherals.SysTick()
+        self.timer.attached(self.cpu)
+
+    def test_matches_counting_every_cycle(self):
+        for reload in (0, 1, 2, 7, 100):
+            for start in (0, 1, 5):
+                self.cpu.cycles = 0
+                self.timer.reset()
+                self.timer.write(self.timer.RVR, 4, reload)
+                self.timer.write(self.timer.CVR, 4, 0)
+                self.timer._value = start  # CVR can only be cleared, set the starting value directly
+                self.timer.write(self.timer.CSR, 4, self.timer.ENABLE)
+                value, wraps = start, []
+                for cycle in range(1, 300):
+                    # The counter decrements, and loads the reload value the cycle after it reaches zero
+                    value = reload if value == 0 else value - 1
+                    if value == 0 and (cycle == start or reload):
+                        wraps.append(cycle)
+                    self.cpu.cycles = cycle
+                    self.assertEqual(self.timer.read(self.timer.CVR, 4), value, (reload, start, cycle))
+                expected = wraps[0] if wraps else None
+                self.assertEqual(self.timer.next_wrap, expected, (reload, start))
+                for wrap in wraps[:5]:
+                    self.assertEqual(self.timer.wrap_after(wrap - 1), wrap)
+
+    def test_countflag(self):
+        self.timer.write(self.timer.RVR, 4, 3)
+        self.timer.write(self.timer.CSR, 4, self.timer.ENABLE)
+        self.cpu.cycles = 1
+        self.assertFalse(self.timer.read(self.timer.CSR, 4) & self.timer.COUNTFLAG)
+        self.cpu.cycles = 5  # Reached zero at cycle 4
+        self.assertTrue(self.timer.read(self.timer.CSR, 4) & self.timer.COUNTFLAG)
+        self.assertFalse(self.timer.read(self.timer.CSR, 4) & self.timer.COUNTFLAG)  # Reading clears it
+        self.cpu.cycles = 9
+        self.assertEqual(self.timer.read(self.timer.CSR + 2, 1), 1)  # COUNTFLAG on its own byte
+        self.cpu.cycles = 13
+        self.timer.write(self.timer.RVR, 4, 100)  # Changing the timer does not lose the flag
+        self.assertTrue(self.timer.read(self.timer.CSR, 4) & self.timer.COUNTFLAG)
+        self.cpu.cycles = 14
+        self.timer.write(self.timer.CVR, 4, 0)
+        self.assertFalse(self.timer.read(self.timer.CSR, 4) & self.timer.COUNTFLAG)
+
+    def test_stopped(self):
+        self.timer.write(self.timer.RVR, 4, 10)
+        self.timer.write(self.timer.CSR, 4, self.timer.ENABLE)
+        self.cpu.cycles = 3
+        self.timer.write(self.timer.CSR, 4, 0)
+        self.cpu.cycles = 50
+        self.assertEqual(self.timer.read(self.timer.CVR, 4), 8)
+        self.assertIsNone(self.timer.next_wrap)
+        self.timer.write(self.timer.CSR, 4, self.timer.ENABLE)
+        self.assertEqual(self.timer.next_wrap, 58)
+
+    def test_polling_loop(self):
+        for batch_blocks in (False, True):
+            with self.subTest(batch_blocks=batch_blocks):
+                interp = iarm.arm.Arm(2**32, False, batch_blocks=batch_blocks)
+                interp.attach(iarm.peripherals.SysTick())
+                interp.evaluate("""
+ LDR R0, =0xE000E010
+ MOVS R1, #99
+ STR R1, [R0, #4]
+ MOVS R1, #1
+ STR R1, [R0, #0]
+ LDR R2, =0x10000
+ MOVS R3, #0
+wait ADDS R3, R3, #1
+ LDR R1, [R0, #0]
+ TST R1, R2
+ BEQ wait
+""")
+                interp.run()
+                self.assertEqual(interp.cycles, 7 + 4 * interp.register['R3'])
+                self.assertEqual(interp.register['R3'], 25)  # Reaches zero 100 cycles after it is started
+
+
+    def test_read_in_block(self):
+        # A batched block reads the timer at the same time as running one instruction at a time does
+        for batch_blocks in (False, True):
+            with self.subTest(batch_blocks=batch_blocks):
+                interp = iarm.arm.Arm(2**32, False, batch_blocks=batch_blocks)
+                interp.attach(iarm.peripherals.SysTick())
+                interp.register['R0'] = 0xE000E010
+                interp.evaluate("""
+ MOVS R1, #99
+ STR R1, [R0, #4]
+ MOVS R1, #1
+ STR R1, [R0, #0]
+ MOVS R2, #0
+ MOVS R2, #0
+ LDR R3, [R0, #8]
+""")
+                interp.run()
+                self.assertEqual(interp.register['R3'], 97)  # Started at cycle 3, read at cycle 6
+
+
+class TestNVIC(unittest.TestCase):
+    def setUp(self):
+        self.interp = iarm.arm.Arm(2**32, False)
+        self.nvic = iarm.peripherals.NVIC()
+        self.interp.attach(self.nvic)
+        self.interp.register['SP'] = 0x20001000
+
+    def run_program(self, program):
+        self.interp.evaluate(program)
+        self.interp.run()
+
+    def test_svc(self):
+        self.run_program("""
+ MOVS R0, #1
+ MOVS R4, #0
+ SVC #3
+ MOVS R2, #5
+ B done
+SVC_Handler MRS R4, IPSR
+ MOVS R0, #2
+ BX LR
+done NOP
+""")
+        self.assertEqual(self.interp.register['R4'], self.nvic.SVCALL)
+        self.assertEqual(self.interp.register['R0'], 1)  # Stacked and put back
+        self.assertEqual(self.interp.register['R2'], 5)
+        self.assertEqual(self.interp.register['SP'], 0x20001000)
+        self.assertEqual(self.interp.register['IPSR'], 0)
+        self.assertEqual(self.nvic.active, [])
+
+    def test_svc_without_nvic(self):
+        interp = iarm.arm.Arm(1024, False)
+        interp.evaluate(" SVC #0")
+        with self.assertRaises(iarm.exceptions.HardFault):
+            interp.run()
+
+    def test_missing_handler(self):
+        self.interp.evaluate(" SVC #0")
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.interp.run()
+
+    def test_flags_and_alignment(self):
+        self.interp.register['SP'] = 0x20000FFC  # Not 8 byte aligned
+        self.run_program("""
+ MOVS R0, #0
+ SUBS R0, R0, #1
+ SVC #0
+ BMI done
+ MOVS R4, #1
+ B done
+SVC_Handler MOVS R1, #1
+ CMP R1, #0
+ BX LR
+done NOP
+""")
+        self.assertEqual(self.interp.register['R4'], 0)  # N was put back
+        self.assertEqual(self.interp.register['SP'], 0x20000FFC)
+
+    def test_nesting_and_tail_chaining(self):
+        self.interp.memory.write_word(0xE000E400, 0x00C00080)  # IRQ1 above IRQ0, IRQ2 below it
+        self.interp.memory.write_word(0xE000E100, 0x7)
+        self.run_program("""
+ MOVS R5, #0
+ LDR R0, =0xE000E200
+ MOVS R1, #1
+ STR R1, [R0, #0]
+ B done
+IRQ0_Handler LSLS R5, R5, #4
+ ADDS R5, R5, #1
+ MOVS R1, #6
+ STR R1, [R0, #0]
+ LSLS R5, R5, #4
+ ADDS R5, R5, #4
+ BX LR
+IRQ1_Handler LSLS R5, R5, #4
+ ADDS R5, R5, #2
+ BX LR
+IRQ2_Handler LSLS R5, R5, #4
+ ADDS R5, R5, #3
+ BX LR
+done NOP
+""")
+        # IRQ1 and IRQ2 pend together, IRQ1 preempts IRQ0, IRQ2 waits for IRQ0 to finish
+        self.assertEqual(self.interp.register['R5'], 0x1243)
+        self.assertEqual(self.interp.register['SP'], 0x20001000)
+
+    def test_primask(self):
+        self.interp.memory.write_word(0xE000E100, 0x1)
+        self.run_program("""
+ MOVS R5, #1
+ CPSID i
+ LDR R0, =0xE000E200
+ MOVS R1, #1
+ STR R1, [R0, #0]
+ MOVS R5, #2
+ CPSIE i
+ B done
+IRQ0_Handler MOVS R6, R5
+ BX LR
+done NOP
+""")
+        self.assertEqual(self.interp.register['R6'], 2)  # Only taken once unmasked
+
+    def test_disabled_interrupt(self):
+        self.nvic.irq(4)
+        self.run_program("""
+ MOVS R5, #1
+IRQ4_Handler MOVS R6, #1
+""")
+        self.assertEqual(self.interp.register['R6'], 1)  # Only got there by running into it
+        self.assertEqual(self.nvic.pending, {20})
+        self.assertEqual(self.interp.memory.read_word(0xE000E280), 1 << 4)
+
+    def test_systick_interrupt(self):
+        timer = iarm.peripherals.SysTick()
+        self.interp.attach(timer)
+        self.run_program("""
+ LDR R0, =0xE000E010
+ MOVS R1, #99
+ STR R1, [R0, #4]
+ MOVS R1, #3
+ STR R1, [R0, #0]
+ MOVS R7, #0
+ LDR R5, =1000
+loop SUBS R5, R5, #1
+ BNE loop
+ B done
+SysTick_Handler PUSH {LR}
+ ADDS R7, R7, #1
+ POP {PC}
+done NOP
+""")
+        # Started after the fifth instruction, 2000 cycles of loop plus 3 for every interrupt
+        self.assertEqual(self.interp.register['R7'], 20)
+        self.assertEqual(self.interp.cycles, 5 + 2 + 2000 + 1 + 3 * 20 + 1)
+
+    def test_scb(self):
+        memory = self.interp.memory
+        self.assertEqual(memory.read_word(0xE000ED00), iarm.peripherals.SCB.CPUID_VALUE)
+        memory.write_word(0xE000ED20, 0x80400000)
+        self.assertEqual(self.nvic.priority(self.nvic.PENDSV), 0x40)
+        self.assertEqual(self.nvic.priority(self.nvic.SYSTICK), 0x80)
+        self.run_program("""
+ LDR R0, =0xE000ED04
+ LDR R1, =0x10000000
+ STR R1, [R0, #0]
+ MOVS R2, #1
+ B done
+PendSV_Handler LDR R4, [R0, #0]
+ BX LR
+done NOP
+""")
+        self.assertEqual(self.interp.register['R4'] & 0x3F, self.nvic.PENDSV)
+
+    def test_no_events_without_interrupts(self):
+        self.interp.attach(iarm.peripherals.SysTick())
+        self.run_program("""
+ LDR R0, =0xE000E010
+ MOVS R1, #10
+ STR R1, [R0, #4]
+ MOVS R1, #1
+ STR R1, [R0, #0]
+ MOVS R2, #0
+""")
+        self.assertEqual(self.interp.events, [])
+
+    def test_reset(self):
+        self.nvic.irq(1)
+        self.interp.reset(keep_program=True)
+        self.assertEqual(self.nvic.pending, set())
+        self.assertEqual(self.interp.events, [])
+
+
+class TestIdle(unittest.TestCase):
+    SETUP = """
+ LDR R0, =0xE000E010
+ LDR R1, =1000
+ SUBS R1, R1, #1
+ STR R1, [R0, #4]
+ MOVS R1, #3
+ STR R1, [R0, #0]
+ MOVS R7, #0
+"""
+    HANDLER = """SysTick_Handler ADDS R7, R7, #1
+ BX LR
+"""
+
+    def make(self, batch_blocks=False):
+        interp = iarm.arm.Arm(2**32, False, batch_blocks=batch_blocks)
+        interp.attach(iarm.peripherals.NVIC())
+        interp.attach(iarm.peripherals.SysTick())
+        interp.register['SP'] = 0x20001000
+        return interp
+
+    def test_wfi(self):
+        for batch_blocks in (False, True):
+            with self.subTest(batch_blocks=batch_blocks):
+                interp = self.make(batch_blocks)
+                interp.evaluate(self.SETUP + """wait WFI
+ CMP R7, #10
+ BNE wait
+ B done
+""" + self.HANDLER + """done NOP
+""")
+                interp.run()
+                self.assertEqual(interp.register['R7'], 10)
+                # Started by the sixth instruction, then the tenth wrap is taken as soon as the clock gets there,
+                # then the handler, CMP, BNE, B, and NOP
+                self.assertEqual(interp.cycles, 5 + 10 * 1000 + 2 + 2 + 2)
+
+    def test_spin(self):
+        for batch_blocks in (False, True):
+            with self.subTest(batch_blocks=batch_blocks):
+                interp = self.make(batch_blocks)
+                interp.evaluate(self.SETUP + """ B .
+""" + self.HANDLER)
+                interp.run(100000)
+                self.assertEqual(interp.cycles, 100000)
+                self.assertEqual(interp.register['R7'], 99)
+                self.assertEqual(interp.register['PC'], 8)  # Still spinning
+
+    def test_nothing_to_wait_for(self):
+        for instruction in ('B .', 'WFI', 'WFE'):
+            with self.subTest(instruction=instruction):
+                interp = iarm.arm.Arm(1024, False)
+                interp.evaluate(" " + instruction)
+                with self.assertRaises(iarm.exceptions.EndOfProgram):
+                    interp.run()
+
+    def test_wfi_pending(self):
+        interp = self.make()
+        interp.memory.write_word(0xE000E100, 0x1)
+        interp.evaluate("""
+ WFI
+ MOVS R1, #1
+""")
+        interp.register['PRIMASK'] = 1
+        interp.nvic.irq(0)  # Held off by PRIMASK, but still wakes WFI
+        interp.run()
+        self.assertEqual(interp.register['R1'], 1)
+        self.assertEqual(interp.cycles, 2)
+        self.assertEqual(interp.nvic.pending, {16})
+
+    def test_wfe(self):
+        interp = iarm.arm.Arm(1024, False)
+        interp.evaluate("""
+ SEV
+ WFE
+ MOVS R1, #1
+ WFE
+""")
+        with self.assertRaises(iarm.exceptions.EndOfProgram):
+            interp.run()
+        self.assertEqual(interp.register['R1'], 1)
+        self.assertFalse(interp.event_register)
+
+    def test_wakes_for_any_event(self):
+        interp = iarm.arm.Arm(1024, False)
+        interp.schedule(500, lambda: None)
+        interp.evaluate("""
+ WFI
+ MOVS R1, #1
+""")
+        interp.run()
+        self.assertEqual(interp.register['R1'], 1)
+        self.assertEqual(interp.cycles, 501)
+
+
+    def test_wait_past_step_limit(self):
+        interp = iarm.arm.Arm(1024, False)
+        interp.schedule(500, lambda: None)
+        interp.evaluate("""
+ WFI
+ MOVS R1, #1
+""")
+        interp.run(100)
+        # Running out of steps ends the wait early, waiting again sleeps until the event
+        self.assertEqual(interp.cycles, 100)
+        self.assertEqual(interp.register['R1'], 0)
+        interp.register['PC'] = 1
+        interp.run()
+        self.assertEqual(interp.register['R1'], 1)
+        self.assertEqual(interp.cycles, 501)
+
+class TestUART(unittest.TestCase):
+    def setUp(self):
+        self.interp = iarm.arm.Arm(2**32, False)
+        self.sent = []
+        self.uart = iarm.peripherals.UART(output=self.sent.append, input=b'ok')
+        self.interp.attach(self.uart)
+
+    def test_transmit(self):
+        self.interp.evaluate("""
+ LDR R0, =0x40004000
+ MOVS R1, #0x41
+ MOVS R2, #100
+loop STRB R1, [R0, #0]
+ SUBS R2, R2, #1
+ BNE loop
+""")
+        self.interp.run()
+        self.assertEqual(self.sent, [b'A' * 100])  # Handed over once, when running stopped
+
+    def test_buffer_size(self):
+        self.uart.buffer_size = 16
+        for _ in range(40):
+            self.interp.memory[0x40004000] = ord('x')
+        self.assertEqual(self.sent, [b'x' * 16, b'x' * 16])
+        self.uart.flush()
+        self.assertEqual(self.sent[-1], b'x' * 8)
+
+    def test_receive(self):
+        memory = self.interp.memory
+        self.assertFalse(memory.read_word(0x40004018) & self.uart.RXFE)
+        self.assertEqual(memory[0x40004000], ord('o'))
+        self.assertEqual(memory[0x40004000], ord('k'))
+        self.assertTrue(memory.read_word(0x40004018) & self.uart.RXFE)
+        self.assertEqual(memory[0x40004000], 0)
+        self.uart.feed(b'!')
+        self.assertEqual(memory[0x40004000], ord('!'))
+
+    def test_echo(self):
+        self.interp.evaluate("""
+ LDR R0, =0x40004000
+ MOVS R3, #0x10
+wait LDR R1, [R0, #0x18]
+ TST R1, R3
+ BNE done
+ LDRB R2, [R0, #0]
+ STRB R2, [R0, #0]
+ B wait
+done NOP
+""")
+        self.interp.run()
+        self.assertEqual(self.sent, [b'ok'])
+
+    def test_interrupt(self):
+        self.interp.attach(iarm.peripherals.NVIC())
+        self.uart.irq = 5
+        self.interp.register['SP'] = 0x20001000
+        self.interp.memory.write_word(0xE000E100, 1 << 5)
+        self.interp.evaluate("""
+ MOVS R4, #0
+ MOVS R5, #0
+ LDR R0, =0x40004000
+ MOVS R1, #0x10
+ STR R1, [R0, #0x38]
+ B done
+IRQ5_Handler LDRB R2, [R0, #0]
+ LSLS R5, R5, #8
+ ADDS R5, R5, R2
+ ADDS R4, R4, #1
+ BX LR
+done NOP
+""")
+        self.interp.run()
+        self.assertEqual(self.interp.register['R4'], 2)
+        self.assertEqual(self.interp.register['R5'], (ord('o') << 8) | ord('k'))
+
+    def test_default_output(self):
+        interp = iarm.arm.Arm(2**32, False)
+        written = []
+        interp.semihosting.output = lambda name, text: written.append((name, text))
+        interp.attach(iarm.peripherals.UART())
+        interp.evaluate(" LDR R0, =0x40004000\n MOVS R1, #0x41\n STRB R1, [R0, #0]")
+        interp.run()
+        self.assertEqual(written, [('stdout', 'A')])
+
+    def test_reset(self):
+        self.interp.memory[0x40004000] = ord('x')
+        self.assertEqual(self.interp.memory[0x40004000], ord('o'))
+        self.interp.reset(keep_program=True)
+        self.assertEqual(self.sent, [b'x'])  # Not lost
+        self.assertEqual(self.interp.memory[0x40004000], ord('o'))  # The input is there again
+
+
+class TestDMA(unittest.TestCase):
+    def setUp(self):
+        self.interp = iarm.arm.Arm(2**32, False)
+        self.dma = iarm.peripherals.DMA()
+        self.interp.attach(self.dma)
+
+    def program(self, source, destination, count, control, channel=0):
+        memory = self.interp.memory
+        base = 0x40020010 + 0x10 * channel
+        memory.write_word(base, source)
+        memory.write_word(base + 4, destination)
+        memory.write_word(base + 8, count)
+        memory.write_word(base + 12, control)
+
+    def test_registers(self):
+        memory = self.interp.memory
+        memory.write_word(0x40020020, 0x1234)
+        memory.write_word(0x40020028, 64)
+        memory.write_halfword(0x4002002A, 1)  # Only the top half
+        self.assertEqual(memory.read_word(0x40020020), 0x1234)
+        self.assertEqual(memory.read_word(0x40020028), 0x10040)
+        self.assertEqual(memory.read_word(0x40020000), 0)
+
+    def test_copy(self):
+        memory = self.interp.memory
+        data = bytes(range(256)) * 4
+        memory.write(0x20000000, data)
+        self.interp.evaluate("""
+ LDR R0, =0x40020010
+ LDR R1, =0x20000000
+ STR R1, [R0, #0]
+ LDR R1, =0x20001000
+ STR R1, [R0, #4]
+ LDR R1, =1024
+ STR R1, [R0, #8]
+ MOVS R1, #13
+ STR R1, [R0, #12]
+ LDR R2, =0x40020000
+ MOVS R4, #0
+wait ADDS R4, R4, #1
+ LDR R3, [R2, #0]
+ CMP R3, #0
+ BEQ wait
+""")
+        self.interp.run()
+        self.assertEqual(bytes(memory.read(0x20001000, 1024)), data)
+        self.assertEqual(memory.read_word(0x40020000), 1)
+        self.assertEqual(memory.read_word(0x4002001C) & self.dma.EN, 0)
+        self.assertEqual(self.interp.register['R4'], 256 // 4)  # 256 cycles at 4 bytes a cycle, 4 cycles a loop
+
+    def test_not_copied_before_finishing(self):
+        memory = self.interp.memory
+        memory.write(0x20000000, b'abcd' * 16)
+        self.program(0x20000000, 0x20000100, 64, 13)
+        self.interp.evaluate(" NOP\n NOP")
+        self.interp.run()
+        self.assertEqual(bytes(memory.read(0x20000100, 4)), bytes(4))  # Due after 16 cycles
+        self.assertEqual(len(self.interp.events), 1)
+
+    def test_clear_flag(self):
+        self.program(0x20000000, 0x20000100, 4, 13, channel=2)
+        self.interp.evaluate(" NOP\n NOP")
+        self.interp.run()
+        memory = self.interp.memory
+        self.assertEqual(memory.read_word(0x40020000), 1 << 2)
+        memory.write_word(0x40020004, 1 << 2)
+        self.assertEqual(memory.read_word(0x40020000), 0)
+
+    def test_stopped(self):
+        memory = self.interp.memory
+        memory.write(0x20000000, b'x' * 64)
+        self.program(0x20000000, 0x20000100, 64, 13)
+        memory.write_word(0x4002001C, 0)
+        self.interp.evaluate(" NOP\n NOP")
+        self.interp.run(100)
+        self.assertEqual(bytes(memory.read(0x20000100, 64)), bytes(64))
+        self.assertEqual(memory.read_word(0x40020000), 0)
+
+    def test_fill(self):
+        memory = self.interp.memory
+        memory[0x20000000] = 0x2A
+        self.program(0x20000000, 0x20000100, 8, self.dma.EN | self.dma.DINC)
+        self.interp.evaluate(" NOP\n NOP\n NOP")
+        self.interp.run()
+        self.assertEqual(bytes(memory.read(0x20000100, 9)), b'*' * 8 + b'\0')
+
+    def test_to_peripheral(self):
+        sent = []
+        self.interp.attach(iarm.peripherals.UART(output=sent.append))
+        self.interp.memory.write(0x20000000, b'hello')
+        self.program(0x20000000, 0x40004000, 5, self.dma.EN | self.dma.SINC)
+        self.interp.evaluate(" NOP\n NOP\n NOP")
+        self.interp.run()
+        self.assertEqual(sent, [b'hello'])
+
+    def test_from_peripheral(self):
+        class Counter(iarm.peripherals.Peripheral):
+            size = 4
+            count = 0
+
+            def read(self, offset, width):
+                self.count += 1
+                return self.count
+
+        counter = Counter(0x40030000)
+        self.interp.attach(counter)
+        self.program(0x40030000, 0x20000000, 5, self.dma.EN | self.dma.DINC)
+        self.interp.evaluate(" NOP\n NOP\n NOP")
+        self.interp.run()
+        self.assertEqual(bytes(self.interp.memory.read(0x20000000, 5)), bytes([1, 2, 3, 4, 5]))
+
+    def test_interrupt(self):
+        self.interp.attach(iarm.peripherals.NVIC())
+        self.dma.irq = 3
+        self.interp.register['SP'] = 0x20001000
+        self.interp.memory.write_word(0xE000E100, 1 << 3)
+        self.interp.memory.write(0x20000000, b'data' * 16)
+        self.program(0x20000000, 0x20000100, 64, 15)
+        self.interp.evaluate("""
+ MOVS R4, #0
+ WFI
+ B done
+IRQ3_Handler LDR R0, =0x20000100
+ LDR R4, [R0, #0]
+ BX LR
+done NOP
+""")
+        self.interp.run()
+        self.assertEqual(self.interp.register['R4'], int.from_bytes(b'data', 'little'))
+
+    def test_reset(self):
+        self.program(0x20000000, 0x20000100, 4, 13)
+        self.interp.reset(keep_program=True)
+        self.assertEqual(self.interp.memory.read_word(0x40020010), 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+import unittest
+import iarm.arm
+import iarm.exceptions
+import iarm.peripherals
+import iarm.semihosting
+
+
+class TestSemihosting(unittest.TestCase):
+    def setUp(self):
+        self.interp = iarm.arm.Arm(1024, False)
+        self.written = []
+        self.interp.semihosting.output = lambda name, text: self.written.append((name, text))
+
+    def put_string(self, address, text):
+        self.interp.memory.write(address, text.encode() + b'\0')
+
+    def test_write0(self):
+        self.put_string(0x80, "Hello, world\n")
+        self.interp.evaluate("""
+ MOVS R0, #4
+ MOVS R1, #0x80
+ BKPT #0xAB
+""")
+        self.interp.run()
+        self.assertEqual(self.written, [('stdout', "Hello, world\n")])
+
+    def test_buffered(self):
+        self.put_string(0x80, "ab")
+        self.interp.evaluate("""
+ MOVS R0, #3
+ MOVS R2, #200
+loop MOVS R1, #0x80
+ BKPT #0xAB
+ ADDS R1, R1, #1
+ BKPT #0xAB
+ SUBS R2, R2, #1
+ BNE loop
+""")
+        self.interp.run()
+        self.assertEqual(self.written, [('stdout', "ab" * 200)])  # One call for the whole run
+
+    def test_buffer_size(self):
+        self.interp.semihosting.buffer_size = 8
+        self.put_string(0x80, "x")
+        self.interp.evaluate("""
+ MOVS R0, #3
+ MOVS R1, #0x80
+ MOVS R2, #20
+loop BKPT #0xAB
+ SUBS R2, R2, #1
+ BNE loop
+""")
+        self.interp.run()
+        self.assertEqual([text for _, text in self.written], ["x" * 8, "x" * 8, "x" * 4])
+
+    def test_write_handles(self):
+        memory = self.interp.memory
+        memory.write(0x80, b':tt\0')
+        self.put_string(0x90, "oops")
+        for i, value in enumerate((0x80, 8, 3)):  # Open :tt for appending is stderr
+            memory.write_word(0xC0 + 4 * i, value)
+        self.interp.evaluate("""
+ MOVS R0, #1
+ MOVS R1, #0xC0
+ BKPT #0xAB
+ MOVS R3, #0x90
+ MOVS R4, #4
+ STR R0, [R1, #0]
+ STR R3, [R1, #4]
+ STR R4, [R1, #8]
+ MOVS R0, #5
+ BKPT #0xAB
+""")
+        self.interp.run()
+        self.assertEqual(self.written, [('stderr', "oops")])
+        self.assertEqual(self.interp.register['R0'], 0)
+
+    def test_read(self):
+        self.interp.semihosting.input = "hi"
+        self.interp.evaluate("""
+ MOVS R0, #7
+ BKPT #0xAB
+ MOVS R4, R0
+ MOVS R0, #7
+ BKPT #0xAB
+ MOVS R5, R0
+ MOVS R0, #7
+ BKPT #0xAB
+""")
+        self.interp.run()
+        self.assertEqual(self.interp.register['R4'], ord('h'))
+        self.assertEqual(self.interp.register['R5'], ord('i'))
+        self.assertEqual(self.interp.register['R0'], 0xFFFFFFFF)
+
+    def test_exit(self):
+        for batch_blocks in (False, True):
+            with self.subTest(batch_blocks=batch_blocks):
+                interp = iarm.arm.Arm(1024, False, batch_blocks=batch_blocks)
+                interp.evaluate("""
+ MOVS R0, #0x18
+ MOVS R1, #1
+ BKPT #0xAB
+ MOVS R2, #1
+""")
+                interp.run()
+                self.assertTrue(interp.semihosting.exited)
+                self.assertEqual(interp.semihosting.exit_reason, 1)
+                self.assertEqual(interp.register['R2'], 0)
+                self.assertEqual(interp.register['PC'], len(interp.program) + 1)
+
+    def test_clock(self):
+        self.interp.semihosting.frequency = 100
+        self.interp.evaluate("""
+ MOVS R2, #10
+loop SUBS R2, R2, #1
+ BNE loop
+ MOVS R0, #0x10
+ BKPT #0xAB
+""")
+        self.interp.run()
+        self.assertEqual(self.interp.register['R0'], 22)  # Instructions before the call, in hundredths
+
+    def test_svc(self):
+        self.put_string(0x80, "!")
+        self.interp.evaluate("""
+ MOVS R0, #3
+ MOVS R1, #0x80
+ SVC #0xAB
+""")
+        self.interp.run()
+        self.assertEqual(self.written, [('stdout', "!")])
+
+    def test_svc_with_nvic(self):
+        interp = iarm.arm.Arm(2**32, False)
+        interp.attach(iarm.peripherals.NVIC())
+        interp.evaluate(" SVC #0xAB")
+        with self.assertRaises(iarm.exceptions.HardFault):
+            interp.run()  # An SVC exception, and there is no handler
+
+    def test_other_breakpoints(self):
+        self.interp.evaluate(" BKPT #1")
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.interp.run()
+
+    def test_unsupported(self):
+        self.interp.evaluate(" MOVS R0, #0x40\n BKPT #0xAB")
+        with self.assertRaises(iarm.exceptions.NotImplementedError):
+            self.interp.run()
+
+    def test_flushed_on_error(self):
+        self.put_string(0x80, "before")
+        self.interp.evaluate(" MOVS R0, #4\n MOVS R1, #0x80\n BKPT #0xAB\n BKPT #1")
+        with self.assertRaises(iarm.exceptions.HardFault):
+            self.interp.run()
+        self.assertEqual(self.written, [('stdout', "before")])
+
+    def test_reset(self):
+        self.interp.evaluate(" MOVS R0, #0x18\n BKPT #0xAB")
+        self.interp.run()
+        self.interp.reset()
+        self.assertFalse(self.interp.semihosting.exited)
+
+if __name__ == '__main__':
+    unittest.main()